@@ -0,0 +1,14 @@
+import os
+import sys
+
+if __package__:
+    from .cli import main
+else:
+    # run as `python path/to/ffpreader`, import the directory as a package so the relative
+    # imports between its modules resolve
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(package_dir))
+    main = __import__(os.path.basename(package_dir) + ".cli", fromlist=["main"]).main
+
+if __name__ == "__main__":
+    sys.exit(main())
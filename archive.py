@@ -0,0 +1,326 @@
+import glob
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# bumped when the entries of a file change, an index of an older version is emptied and rebuilt by
+# the next update, eg version 2 added the loops
+_INDEX_VERSION = 2
+
+# one row per indexed file, entries hold the searchable devices, zones, nodes and loops of each file
+# and entries_fts is an external content FTS5 index over their text columns kept in sync by triggers
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    site TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    kind TEXT NOT NULL,
+    node INTEGER,
+    loop INTEGER,
+    device INTEGER,
+    zone INTEGER,
+    description TEXT,
+    type TEXT,
+    subtype TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_file_id ON entries(file_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    description, type, subtype, content='entries', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, description, type, subtype)
+    VALUES (new.id, new.description, new.type, new.subtype);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, description, type, subtype)
+    VALUES ('delete', old.id, old.description, old.type, old.subtype);
+END;
+"""
+
+_ENTRY_COLUMNS = ("kind", "node", "loop", "device", "zone", "description", "type", "subtype")
+
+
+def _file_signature(path):
+    """(mtime_ns, size) of a file, a file is re-indexed when this changes"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _index_entries(path):
+    """
+    Parse one file and return its searchable entries as tuples of _ENTRY_COLUMNS,
+    runs in a worker process. Placeholder descriptions (see FFPReader.DEFAULT_CLEANING_RULES)
+    are skipped as they are never searched for.
+    """
+    from .ffpreader import FFPReader
+
+    reader = FFPReader(path)
+    placeholders = set(reader.cleaning_rules["placeholder_descriptions"])
+    node_by_loop = dict(zip(reader.loops["loop"], reader.loops["node"]))
+
+    entries = []
+    for zone, description in zip(reader.zones["zone"], reader.zones["description"]):
+        description = (description or "").strip()
+        if description not in placeholders:
+            entries.append(("zone", None, None, None, int(zone), description, None, None))
+    for node, description in zip(reader.nodes["node"], reader.nodes["description"]):
+        description = (description or "").strip()
+        if description not in placeholders:
+            entries.append(("node", int(node), None, None, None, description, None, None))
+    # the loop description names the protocol of its loop card, eg 'Apollo Loop No: 23'
+    for loop, node, description in zip(reader.loops["loop"], reader.loops["node"], reader.loops["description"]):
+        description = description.strip() if isinstance(description, str) else ""
+        if description not in placeholders:
+            entries.append(("loop", int(node), int(loop), None, None, description, None, None))
+    devices = reader.devices
+    for loop, device, zone, description, device_type, subtype in zip(
+        devices["loop"],
+        devices["device"],
+        devices["zone"],
+        devices["description"],
+        devices["type"],
+        devices["subtype"],
+    ):
+        description = description.strip() if isinstance(description, str) else ""
+        if description in placeholders:
+            continue
+        loop = _int_or_none(loop)
+        entries.append(
+            (
+                "device",
+                _int_or_none(node_by_loop.get(loop)),
+                loop,
+                _int_or_none(device),
+                _int_or_none(zone),
+                description,
+                device_type if isinstance(device_type, str) else None,
+                subtype if isinstance(subtype, str) else None,
+            )
+        )
+    return entries
+
+
+class ArchiveIndex:
+    """
+    Persistent search index over the devices, zones, nodes and loops of every .ffp file in a directory tree,
+    stored in a SQLite database with an FTS5 full text index so searches across sites don't re-parse files.
+
+    - update() parses new and changed files in a process pool and removes deleted ones, files are
+      compared by (mtime, size) so an unchanged archive is re-checked without parsing anything.
+    - search() matches descriptions, types and subtypes, eg every panel with a 'FIRE CUPBOARD'.
+    - The site of a file is its first directory below the archive root, or the file name for files
+      directly in the root, eg 'archive/QWP/2025/site.ffp' is site 'QWP'.
+
+    Example:
+        index = ArchiveIndex("archive.sqlite")
+        index.update("./archive", jobs=8)
+        index.search("FIRE CUPBOARD")
+        index.search("IRD-ICG-L05M*", kind="device")
+        index.search("HYD", column="type")
+    """
+
+    _SUFFIX = ".ffp"
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str): The SQLite database file, created if it does not exist.
+        """
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(_SCHEMA)
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != _INDEX_VERSION:
+            with self.connection:
+                self.connection.execute("DELETE FROM entries")
+                self.connection.execute("DELETE FROM files")
+                self.connection.execute(f"PRAGMA user_version = {_INDEX_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _site(root, path):
+        relative = os.path.relpath(path, root)
+        parts = relative.split(os.sep)
+        return parts[0] if len(parts) > 1 else os.path.splitext(parts[0])[0]
+
+    def update(self, root, jobs=None):
+        """
+        Bring the index up to date with the .ffp files below root.
+
+        Args:
+            root (str): Archive directory, searched recursively.
+            jobs (int, optional): Number of worker processes, defaults to the number of CPUs.
+                1 parses in this process.
+
+        Returns:
+            dict: Counts of the files {'indexed': ..., 'unchanged': ..., 'removed': ..., 'failed': ...}.
+        """
+        root = os.path.abspath(root)
+        paths = sorted(
+            os.path.abspath(path)
+            for path in glob.glob(os.path.join(glob.escape(root), "**", "*"), recursive=True)
+            if path.lower().endswith(self._SUFFIX) and os.path.isfile(path)
+        )
+        indexed = {
+            path: (file_id, (mtime_ns, size))
+            for file_id, path, mtime_ns, size in self.connection.execute(
+                "SELECT id, path, mtime_ns, size FROM files"
+            )
+        }
+        in_root = {
+            path for path in indexed if os.path.commonpath([root, path]) == root
+        }
+
+        changed = []
+        signatures = {}
+        for path in paths:
+            signatures[path] = _file_signature(path)
+            if path not in indexed or indexed[path][1] != signatures[path]:
+                changed.append(path)
+        removed = in_root - set(paths)
+        counts = {
+            "indexed": 0,
+            "unchanged": len(paths) - len(changed),
+            "removed": len(removed),
+            "failed": 0,
+        }
+
+        with self.connection:
+            for path in removed:
+                self._delete_file(indexed[path][0])
+        for path, entries, error in self._parse_all(changed, jobs):
+            if error is not None:
+                counts["failed"] += 1
+                logger.warning(f"Failed to index '{path}': {error}")
+                continue
+            with self.connection:
+                if path in indexed:
+                    self._delete_file(indexed[path][0])
+                self._insert_file(path, self._site(root, path), signatures[path], entries)
+            counts["indexed"] += 1
+            logger.debug(f"Indexed {len(entries)} entries from '{path}'.")
+        return counts
+
+    def _parse_all(self, paths, jobs):
+        """yield (path, entries, error) for each path, in a process pool when there are several files"""
+        jobs = jobs or os.cpu_count() or 1
+        if jobs <= 1 or len(paths) <= 1:
+            for path in paths:
+                try:
+                    yield path, _index_entries(path), None
+                except Exception as error:
+                    yield path, None, error
+            return
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(_index_entries, path): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as error:
+                    yield futures[future], None, error
+
+    def _delete_file(self, file_id):
+        self.connection.execute("DELETE FROM entries WHERE file_id = ?", (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _insert_file(self, path, site, signature, entries):
+        cursor = self.connection.execute(
+            "INSERT INTO files (path, site, mtime_ns, size, indexed_at) VALUES (?, ?, ?, ?, ?)",
+            (path, site, signature[0], signature[1], time.time()),
+        )
+        file_id = cursor.lastrowid
+        self.connection.executemany(
+            f"INSERT INTO entries (file_id, {', '.join(_ENTRY_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' * len(_ENTRY_COLUMNS))})",
+            [(file_id,) + entry for entry in entries],
+        )
+
+    @staticmethod
+    def _match_expression(text, column=None):
+        """
+        Build an FTS5 query matching text as a phrase, eg 'FIRE CUPBOARD' only matches the two words
+        together and in order. A trailing '*' matches the last word as a prefix, eg 'IRD-ICG-L05M*'.
+        """
+        prefix = text.endswith("*")
+        phrase = '"' + text.rstrip("*").replace('"', '""') + '"'
+        if prefix:
+            phrase += " *"
+        return f"{column} : {phrase}" if column else phrase
+
+    def search(self, text, kind=None, column=None, site=None, limit=1000, raw=False):
+        """
+        Search the index.
+
+        Args:
+            text (str): Words to find, matched as a phrase, case insensitive. A trailing '*' matches
+                the last word as a prefix.
+            kind (str, optional): Only 'device', 'zone', 'node' or 'loop' entries.
+            column (str, optional): Only match 'description', 'type' or 'subtype'.
+            site (str, optional): Only entries from this site.
+            limit (int, optional): Maximum number of rows returned.
+            raw (bool, optional): Pass text to FTS5 unchanged to use its query syntax, eg 'FIRE NOT PUMP'.
+
+        Returns:
+            pd.DataFrame: Matching entries with columns
+            ['site', 'path', 'kind', 'node', 'loop', 'device', 'zone', 'description', 'type', 'subtype'].
+        """
+        import pandas as pd
+
+        query = text if raw else self._match_expression(text, column)
+        sql = (
+            "SELECT files.site, files.path, "
+            + ", ".join(f"entries.{c}" for c in _ENTRY_COLUMNS)
+            + " FROM entries_fts"
+            " JOIN entries ON entries.id = entries_fts.rowid"
+            " JOIN files ON files.id = entries.file_id"
+            " WHERE entries_fts MATCH ?"
+        )
+        parameters = [query]
+        if kind is not None:
+            sql += " AND entries.kind = ?"
+            parameters.append(kind)
+        if site is not None:
+            sql += " AND files.site = ?"
+            parameters.append(site)
+        sql += " ORDER BY files.site, files.path, entries.id LIMIT ?"
+        parameters.append(limit)
+        rows = self.connection.execute(sql, parameters).fetchall()
+        return pd.DataFrame(rows, columns=["site", "path", *_ENTRY_COLUMNS])
+
+    def files(self):
+        """Returns a DataFrame of the indexed files with their site and entry count"""
+        import pandas as pd
+
+        rows = self.connection.execute(
+            "SELECT files.site, files.path, files.indexed_at, COUNT(entries.id)"
+            " FROM files LEFT JOIN entries ON entries.file_id = files.id"
+            " GROUP BY files.id ORDER BY files.site, files.path"
+        ).fetchall()
+        return pd.DataFrame(rows, columns=["site", "path", "indexed_at", "entries"])
@@ -0,0 +1,387 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from .exports import EXPORTERS
+from .ffpreader import FFPReader
+from .modbusmapper import ModbusMapper
+from .utils import map_file, detect_encoding, find_section_spans, section_header
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# size presets for the synthetic panel, "large" is the biggest panel the modbus layout can address
+PRESETS = {
+    "small": {"nodes": 4, "loops": 12, "devices_per_loop": 126, "zones": 500},
+    "site": {"nodes": 26, "loops": 100, "devices_per_loop": 126, "zones": 5000},
+    "large": {"nodes": 100, "loops": 250, "devices_per_loop": 128, "zones": 5000},
+}
+
+_BUILDINGS = ["ICG", "IT1", "IT2", "IT3", "IT4", "CP1"]
+_SYSTEMS = ["FCG", "SFS", "SEL", "CSV", "CGL", "FCF", "SIC"]
+_ROOMS = ["CORRIDOR", "FIRE CUPBOARD", "ELEC CUPBOARD", "MGF OVERFLOW", "FOOD QUARTER"]
+_DEVICE_TYPES = [("x02", "OPT"), ("x02", "HEAT"), ("x05", "MCP"), ("x10", "I/O")]
+
+
+def _loop_section_id(node, index_in_node):
+    """eg node 9, second loop on the node -> '90102' (card 01, loop 02)"""
+    card = index_in_node // 2 + 1
+    loop_on_card = index_in_node % 2 + 1
+    return f"{node}{card:02d}{loop_on_card:02d}"
+
+
+def write_synthetic_ffp(
+    filepath,
+    nodes=26,
+    loops=100,
+    devices_per_loop=126,
+    zones=5000,
+    cause_effects=500,
+    spare_fraction=0.2,
+    seed=0,
+):
+    """
+    Write a synthetic FireFinder PLUS .ffp file with the same section layout as a Config Manager PLUS
+    export (see FFPReader._load_and_separate_sections), for benchmarking.
+
+    Args:
+        filepath (str): Where to write the file.
+        nodes (int): Number of nodes/panels, 1 to 100.
+        loops (int): Number of loops, spread evenly over the nodes, 1 to 250. With fewer loops than
+            nodes some nodes have no loops.
+        devices_per_loop (int): Device addresses per loop, 1 to 128.
+        zones (int): Number of rows in the zones section, 1 to 5000.
+        cause_effects (int): Number of cause/effect ('F') function groups.
+        spare_fraction (float): Fraction of device addresses and zones left unassigned.
+        seed (int): Random seed, the same arguments always produce the same file.
+
+    Returns:
+        dict: The arguments used, for recording alongside benchmark results.
+    """
+    for name, value, maximum in [
+        ("nodes", nodes, 100),
+        ("loops", loops, 250),
+        ("devices_per_loop", devices_per_loop, 128),
+        ("zones", zones, 5000),
+    ]:
+        if not 1 <= value <= maximum:
+            raise ValueError(f"{name} must be between 1 and {maximum}, got {value}.")
+
+    rng = random.Random(seed)
+    lines = [
+        "Fire Finder Plus Configuration File",
+        "",
+        "File Version: 1000",
+        "Project: Synthetic",
+        "Date : 01/01/2025 00:00:00",
+        "Configuration Version: 255\t0",
+        "ConfigManagerPlus Version: 2.9.2.2",
+        "[ S 0 S 1",
+        "Synthetic",
+        "AUS\tAS7240\tENG",
+        "A\tN\t1",
+        "]",
+    ]
+
+    # cause/effect function groups
+    for group in range(1, cause_effects + 1):
+        lines += [
+            f"[ F {group} 0 1",
+            f"SYNTHETIC FUNCTION {group}",
+            "1\t1\t2",
+            "Y\tY\tY\tY\tY\tY\tY\t",
+            "N\tY\tN\tY\tY\tY\t",
+            "Y\tN\tY\tY\tY\tY\tY\tY\tY\tY\tY\tY\tY\tY\tN\tN\t",
+            "\t".join(["0"] * 17),
+            "",
+            "]",
+        ]
+        for subsection in [10, 11, 12, 13, 14, 15, 40]:
+            lines.append(f"[ F {group} 0 {subsection}")
+            if subsection == 13:
+                loop = rng.randint(1, loops)
+                lines += [f"S\t{loop}\t{rng.randint(1, devices_per_loop)}"] * 2
+            elif subsection == 40:
+                lines.append(
+                    f"OL\t{rng.randint(1, loops)}\t{rng.randint(1, devices_per_loop)}\t1"
+                )
+            lines.append("]")
+
+    # nodes
+    for node in range(1, nodes + 1):
+        lines += [
+            f"[ P {node}0000 P 1",
+            f"MASD-FIP-{rng.choice(_BUILDINGS)}-L{node:02d}-01 SYNTHETIC NODE {node}\t{node}",
+            "\t\t\t",
+            "]",
+        ]
+
+    # loops, spread over the nodes in order, the nodes differ by at most one loop
+    first_loop_of_node = {}
+    for loop in range(1, loops + 1):
+        node = (loop - 1) * nodes // loops + 1
+        first_loop_of_node.setdefault(node, loop)
+        section_id = _loop_section_id(node, loop - first_loop_of_node[node])
+        lines += [
+            f"[ M {section_id} X 1",
+            f"{loop}\tApollo Loop No: {loop}\t0\t0\t0\t0\t0\t0\t550\t2500\t1\tR",
+            "]",
+            f"[ M {section_id} X 2",
+        ]
+        for _ in range(devices_per_loop):
+            if rng.random() < spare_fraction:
+                lines.append(
+                    "0\t\t0\t\t0\t0\tN\tY\tY\tY\tY\tY\tN\tY\t0\t0\t0\t0\t0\t0\tN\t100\t80\t0\t0\t0\t0\t0\t\t"
+                )
+                continue
+            subtype, device_type = rng.choice(_DEVICE_TYPES)
+            description = (
+                f"IRD-{rng.choice(_BUILDINGS)}-L{rng.randint(0, 40):02d}-"
+                f"{rng.choice(_SYSTEMS)}-{rng.randint(1, 150):02d} {rng.choice(_ROOMS)}"
+            )
+            lines.append(
+                f"{rng.randint(1, zones)}\t{description}\t{subtype}\t{device_type}\t0\t0\tN\tY\tY\tN\tN\tN\tN\tY"
+                "\t0\t0\t0\t0\t0\t179\tN\t80\t80\t0\t0\t0\t0\t0\tNA\t"
+            )
+        lines.append("]")
+
+    # zones
+    lines.append("[ Z 1 Z 1")
+    for zone in range(1, zones + 1):
+        if rng.random() < spare_fraction:
+            description = "Unassigned Text"
+        else:
+            description = f"TOWER {rng.randint(1, 4)} LEVEL {rng.randint(0, 40)} ZONE {zone}"
+        lines.append(
+            f"Y\t{description}\tN\tN\t0\t0\tN\tN\tN\tN\t0\t0\tN\tN\tN\t"
+        )
+    lines.append("]")
+
+    with open(filepath, "w", newline="\n") as file:
+        file.write("\n".join(lines) + "\n")
+
+    return {
+        "nodes": nodes,
+        "loops": loops,
+        "devices_per_loop": devices_per_loop,
+        "zones": zones,
+        "cause_effects": cause_effects,
+        "spare_fraction": spare_fraction,
+        "seed": seed,
+    }
+
+
+def _peak_rss_mb():
+    """peak resident set size of this process so far in MB, None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+class _Recorder:
+    """collects one result per benchmark stage"""
+
+    def __init__(self):
+        self.results = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        time the body of a with block as a stage, rows is the number of rows the stage produced,
+        either an int or a callable evaluated after the stage has run
+        """
+        started = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - started
+        self.add(name, seconds, rows() if callable(rows) else rows)
+
+    def add(self, name, seconds, rows=None):
+        """record a stage timed elsewhere"""
+        self.results.append(
+            {
+                "stage": name,
+                "seconds": seconds,
+                "rows": rows,
+                "rows_per_second": rows / seconds if rows and seconds > 0 else None,
+                "peak_rss_mb": _peak_rss_mb(),
+            }
+        )
+        logger.info(f"{name:<24}{seconds:>10.3f}s  rows={rows}")
+
+
+def run_benchmark(ffp_filepath, output_dir, formats=tuple(EXPORTERS), workers=None):
+    """
+    Time each stage of processing one .ffp file: the pandas import, tokenization, each table parse,
+    a no-op refresh, cleaning, modbus mapping, splitting by gateway and each export format.
+    Exports are written to output_dir. workers is passed to FFPReader to time the parallel parse.
+
+    Returns:
+        list[dict]: One dict per stage with keys 'stage', 'seconds', 'rows', 'rows_per_second'
+        and 'peak_rss_mb' (the process high-water mark after the stage).
+    """
+    recorder = _Recorder()
+    sections = []
+
+    # the reader imports pandas lazily, timed here so that the first table parse does not pay for it
+    with recorder.stage("import"):
+        import numpy
+        import pandas
+
+    with recorder.stage("tokenize", rows=lambda: len(sections)):
+        with map_file(ffp_filepath) as buffer:
+            encoding = detect_encoding(buffer)
+            sections = [
+                section_header(buffer, span, encoding)
+                for span in find_section_spans(buffer)
+            ]
+
+    reader = None
+    with recorder.stage("parse", rows=lambda: len(reader.devices)):
+        reader = FFPReader(ffp_filepath, workers=workers)
+    # each table parse, as timed by the reader itself
+    for table in ["zones", "nodes", "loops", "devices"]:
+        recorder.add(
+            f"parse_{table}",
+            reader.stats.stages[f"parse_{table}"]["seconds"],
+            reader.stats.counters[f"{table}_rows"],
+        )
+    with recorder.stage("refresh_unchanged", rows=lambda: len(reader.devices)):
+        reader.refresh()
+
+    cleaned = {}
+    with recorder.stage("clean_zones", rows=lambda: len(cleaned["zones"])):
+        cleaned["zones"] = reader.cleaned_zones
+    with recorder.stage("clean_devices", rows=lambda: len(cleaned["devices"])):
+        cleaned["devices"] = reader.cleaned_devices
+
+    mapper = None
+    with recorder.stage("modbus_map", rows=lambda: len(mapper.devices)):
+        mapper = ModbusMapper(configuration=reader.configuration)
+    with recorder.stage("modbus_split", rows=lambda: len(mapper.devices)):
+        mapper.modbus_configuration
+
+    basename = os.path.basename(ffp_filepath)
+    for export_format in formats:
+        with recorder.stage(f"export_{export_format}", rows=len(reader.devices)):
+            EXPORTERS[export_format](reader, output_dir, basename)
+
+    return recorder.results
+
+
+def print_results(results):
+    """print one line per stage of run_benchmark results"""
+    for result in results:
+        print(f"{result['stage']:<24}{result['seconds']:>10.3f}s  rows={result['rows']}")
+
+
+def _git_commit():
+    """the current git commit of the source tree, None if not in a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results, filepath, parameters=None):
+    """write benchmark results with the commit and environment they were produced on as JSON"""
+    import pandas as pd
+
+    document = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "parameters": parameters or {},
+        "results": results,
+    }
+    with open(filepath, "w") as file:
+        json.dump(document, file, indent=2)
+    return document
+
+
+def compare_results(baseline_filepath, filepath):
+    """
+    Compare two benchmark result files stage by stage.
+    Returns a DataFrame with columns ['stage', 'baseline_seconds', 'seconds', 'ratio'],
+    a ratio above 1 means the stage got slower.
+    """
+    import pandas as pd
+
+    with open(baseline_filepath) as file:
+        baseline = {r["stage"]: r["seconds"] for r in json.load(file)["results"]}
+    with open(filepath) as file:
+        current = {r["stage"]: r["seconds"] for r in json.load(file)["results"]}
+    rows = [
+        {
+            "stage": stage,
+            "baseline_seconds": baseline.get(stage),
+            "seconds": seconds,
+            "ratio": seconds / baseline[stage] if baseline.get(stage) else None,
+        }
+        for stage, seconds in current.items()
+    ]
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark FFPReader and ModbusMapper on a synthetic panel."
+    )
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="site")
+    parser.add_argument("--nodes", type=int)
+    parser.add_argument("--loops", type=int)
+    parser.add_argument("--devices-per-loop", type=int)
+    parser.add_argument("--zones", type=int)
+    parser.add_argument("--cause-effects", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--formats", nargs="*", default=list(EXPORTERS), choices=list(EXPORTERS)
+    )
+    parser.add_argument("--workers", type=int, help="parse the file in this many processes")
+    parser.add_argument("--output", help="JSON results file, default bench-<commit>.json")
+    parser.add_argument("--compare", help="baseline JSON results file to compare with")
+    args = parser.parse_args()
+
+    sizes = dict(PRESETS[args.preset])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        ffp_filepath = os.path.join(workdir, "synthetic.ffp")
+        parameters = write_synthetic_ffp(
+            ffp_filepath, cause_effects=args.cause_effects, seed=args.seed, **sizes
+        )
+        parameters["file_bytes"] = os.path.getsize(ffp_filepath)
+        results = run_benchmark(
+            ffp_filepath, workdir, formats=args.formats, workers=args.workers
+        )
+
+    print_results(results)
+    output = args.output or f"bench-{_git_commit() or 'local'}.json"
+    write_results(results, output, parameters)
+    print(f"Results written to '{output}'.")
+    if args.compare:
+        print(compare_results(args.compare, output).to_string(index=False))
@@ -0,0 +1,530 @@
+"""
+Command line interface, run with `python -m ffpreader <command>`:
+
+    info     print the file header and section counts of .ffp files, without parsing them
+    parse    parse .ffp files and print a summary of each table
+    validate check .ffp files for consistency issues, exits with 1 if any file has errors
+    export   write csv, Excel and Modbus exports for .ffp files
+    modbus   write only the Modbus register map workbook for .ffp files
+    pollplan plan the Modbus read requests covering the configured registers of .ffp files
+    diff     compare two revisions of a .ffp file
+    index    build or update a search index over an archive of .ffp files
+    search   search an archive index for devices, zones and nodes
+    serve    serve parsed configurations over a local HTTP/JSON API
+    watch    keep the exports of a directory of .ffp files up to date as the files change
+    bench    benchmark parsing, mapping and exports on a synthetic panel
+
+Files can be given as paths, glob patterns or directories (searched recursively for .ffp files).
+pandas and openpyxl are only imported once a command needs them, so --help, argument errors
+and info return immediately.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+_TABLES = ("zones", "nodes", "loops", "devices")
+_FORMATS = ("csv", "xlsx", "modbus", "sqlite")
+# formats written by export when --formats is not given
+_DEFAULT_FORMATS = ("csv", "xlsx", "modbus")
+
+
+def expand_paths(patterns):
+    """
+    Expand a list of paths, glob patterns and directories into a sorted list of .ffp files.
+    eg ['data/input', 'archive/**/*.ffp'] -> ['archive/2024/site.ffp', 'data/input/QWP 16.02.24.ffp', ...]
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(glob.escape(pattern), "**", "*.ffp"), recursive=True)
+        elif glob.has_magic(pattern):
+            matches = glob.glob(pattern, recursive=True)
+        else:
+            matches = [pattern]
+        paths.update(os.path.normpath(path) for path in matches)
+    return sorted(paths)
+
+
+def _parse_file(path, tables):
+    """parse one file and return a summary dict, runs in a worker process when --jobs > 1"""
+    from .ffpreader import FFPReader
+
+    reader = FFPReader(path, tables=tables)
+    return {
+        "path": path,
+        "seconds": reader.stats.stages["parse"]["seconds"],
+        "rows": {
+            table: len(getattr(reader, table))
+            for table in reader.TABLES
+            if getattr(reader, table) is not None
+        },
+        "encoding": reader.encoding,
+        "non_ascii_fields": reader.non_ascii_field_count,
+    }
+
+
+def _validate_file(path, tables):
+    """parse one file and return its consistency issues, runs in a worker process when --jobs > 1"""
+    from .ffpreader import FFPReader
+
+    issues = FFPReader(path, tables=tables).issues
+    return {
+        "path": path,
+        "errors": int((issues["severity"] == "error").sum()),
+        "warnings": int((issues["severity"] == "warning").sum()),
+        "issues": issues.to_dict("records"),
+    }
+
+
+def _export_file(path, tables, output_dir, formats, force=False):
+    """parse one file and write its exports, runs in a worker process when --jobs > 1"""
+    from .exports import EXPORTERS
+    from .ffpreader import FFPReader
+
+    started = time.perf_counter()
+    reader = FFPReader(path, tables=tables)
+    written = []
+    for export_format in formats:
+        written += EXPORTERS[export_format](reader, output_dir, force=force)
+    return {"path": path, "seconds": time.perf_counter() - started, "written": written}
+
+
+def _poll_plan_file(path, tables, max_registers, gap_tolerance):
+    """parse one file and plan the reads of its configured registers, runs in a worker process when --jobs > 1"""
+    from .ffpreader import FFPReader
+    from .pollplan import build_poll_plan, full_range_plan, summarize
+
+    plan = build_poll_plan(
+        FFPReader(path, tables=tables).cleaned_configuration, max_registers, gap_tolerance
+    )
+    return {
+        "path": path,
+        "summary": summarize(plan),
+        "full_range": summarize(full_range_plan(max_registers)),
+        "requests": plan.to_dict("records"),
+    }
+
+
+def _run_jobs(function, paths, jobs, *args):
+    """
+    Call function(path, *args) for each path, in a process pool when jobs > 1.
+    Yields (path, result, error) in the order the files complete.
+    """
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            try:
+                yield path, function(path, *args), None
+            except Exception as error:
+                yield path, None, error
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(function, path, *args): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as error:
+                yield futures[future], None, error
+
+
+def _report(results, as_json, describe):
+    """print each result as it completes, returns the exit code (1 if any file failed)"""
+    failed = False
+    for path, result, error in results:
+        if error is not None:
+            failed = True
+            print(f"{path}: error: {error}", file=sys.stderr)
+        elif as_json:
+            print(json.dumps(result))
+        else:
+            print(describe(result))
+    return 1 if failed else 0
+
+
+def _file_info(path):
+    """read the header and count the sections of one file, uses only the pure Python sections module"""
+    from .sections import count_sections, read_file_header
+
+    return {
+        "path": path,
+        "header": read_file_header(path),
+        "sections": count_sections(path),
+    }
+
+
+def _command_info(args):
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No .ffp files found.", file=sys.stderr)
+        return 1
+    return _report(
+        _run_jobs(_file_info, paths, args.jobs),
+        args.json,
+        lambda result: f"{result['path']}: "
+        + f"project={result['header'].get('Project', '')} date={result['header'].get('Date', '')} "
+        + " ".join(f"{flag}={count}" for flag, count in result["sections"].items()),
+    )
+
+
+def _command_parse(args):
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No .ffp files found.", file=sys.stderr)
+        return 1
+    return _report(
+        _run_jobs(_parse_file, paths, args.jobs, args.tables),
+        args.json,
+        lambda result: f"{result['path']}: "
+        + " ".join(f"{table}={rows}" for table, rows in result["rows"].items())
+        + f" ({result['seconds']:.2f}s)",
+    )
+
+
+def _command_validate(args):
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No .ffp files found.", file=sys.stderr)
+        return 1
+    errors = False
+
+    def describe(result):
+        nonlocal errors
+        errors = errors or result["errors"] > 0
+        lines = [f"{result['path']}: {result['errors']} errors, {result['warnings']} warnings"]
+        for issue in result["issues"]:
+            if args.warnings or issue["severity"] == "error":
+                lines.append(f"  {issue['severity']}: {issue['check']}: {issue['message']}")
+        return "\n".join(lines)
+
+    def track(result):
+        nonlocal errors
+        errors = errors or result["errors"] > 0
+        return json.dumps(result, default=str)
+
+    failed = _report(
+        _run_jobs(_validate_file, paths, args.jobs, args.tables),
+        False,
+        track if args.json else describe,
+    )
+    return 1 if failed or errors else 0
+
+
+def _command_export(args, formats=None):
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No .ffp files found.", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+    return _report(
+        _run_jobs(
+            _export_file,
+            paths,
+            args.jobs,
+            args.tables,
+            args.output_dir,
+            formats or args.formats,
+            args.force,
+        ),
+        args.json,
+        lambda result: f"{result['path']}: wrote {len(result['written'])} files ({result['seconds']:.2f}s)",
+    )
+
+
+def _command_modbus(args):
+    return _command_export(args, formats=["modbus"])
+
+
+def _command_pollplan(args):
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("No .ffp files found.", file=sys.stderr)
+        return 1
+
+    def describe(result):
+        summary, full_range = result["summary"], result["full_range"]
+        lines = [
+            f"{result['path']}: {summary['requests']} requests reading {summary['registers_read']} "
+            + f"registers ({summary['used_registers']} used), whole ranges take "
+            + f"{full_range['requests']} requests reading {full_range['registers_read']} registers"
+        ]
+        if args.verbose:
+            lines += [
+                f"  gateway {request['gateway']}: {request['start_register']} x {request['count']} "
+                + f"({request['used_registers']} used, {request['tables']})"
+                for request in result["requests"]
+            ]
+        return "\n".join(lines)
+
+    return _report(
+        _run_jobs(
+            _poll_plan_file, paths, args.jobs, args.tables, args.max_registers, args.gap
+        ),
+        args.json,
+        describe,
+    )
+
+
+def _command_diff(args):
+    from .diff import diff_configurations
+    from .ffpreader import FFPReader
+
+    old = FFPReader(args.old, tables=args.tables)
+    new = FFPReader(args.new, tables=args.tables)
+    differences = diff_configurations(old, new, args.tables)
+
+    for table, df in differences.items():
+        counts = df["change"].value_counts()
+        print(
+            f"{table}: "
+            + ", ".join(
+                f"{counts.get(change, 0)} {change}"
+                for change in ["added", "removed", "changed"]
+            )
+        )
+        if args.verbose and not df.empty:
+            print(df.to_string(index=False))
+
+    if args.output:
+        if args.output.lower().endswith(".xlsx"):
+            from .utils import write_dfs_to_excel_and_format
+
+            write_dfs_to_excel_and_format(differences, args.output)
+        else:
+            os.makedirs(args.output, exist_ok=True)
+            for table, df in differences.items():
+                df.to_csv(os.path.join(args.output, f"{table}.diff.csv"), index=False)
+    return 0
+
+
+def _command_index(args):
+    from .archive import ArchiveIndex
+
+    with ArchiveIndex(args.database) as index:
+        counts = index.update(args.root, jobs=args.jobs)
+    print(", ".join(f"{count} {name}" for name, count in counts.items()))
+    return 1 if counts["failed"] else 0
+
+
+def _command_search(args):
+    from .archive import ArchiveIndex
+
+    with ArchiveIndex(args.database) as index:
+        df = index.search(
+            args.text, kind=args.kind, column=args.column, site=args.site, limit=args.limit
+        )
+    if args.json:
+        print(df.to_json(orient="records"))
+    elif df.empty:
+        print("No matches.")
+    else:
+        print(df.to_string(index=False))
+    return 0
+
+
+def _command_serve(args):
+    import logging
+    from .server import ConfigurationServer
+
+    logging.basicConfig(level=logging.INFO)
+    ConfigurationServer(
+        args.data_dir,
+        host=args.host,
+        port=args.port,
+        max_cache_bytes=args.cache_mb * 1024**2,
+        workers=args.workers,
+    ).run()
+    return 0
+
+
+def _command_watch(args):
+    import logging
+    from .watcher import FFPWatcher
+
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(args.output_dir, exist_ok=True)
+    watcher = FFPWatcher(
+        args.watch_dir,
+        args.output_dir,
+        formats=args.formats,
+        debounce=args.debounce,
+        workers=args.workers,
+        poll_interval=args.poll_interval,
+        use_inotify=False if args.poll else None,
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    if args.json:
+        print(json.dumps(watcher.metrics))
+    return 0
+
+
+def _command_bench(args):
+    import tempfile
+    from .benchmark import PRESETS, print_results, run_benchmark, write_results, write_synthetic_ffp
+
+    with tempfile.TemporaryDirectory() as workdir:
+        ffp_filepath = os.path.join(workdir, "synthetic.ffp")
+        parameters = write_synthetic_ffp(ffp_filepath, **PRESETS[args.preset])
+        parameters["file_bytes"] = os.path.getsize(ffp_filepath)
+        results = run_benchmark(ffp_filepath, workdir, formats=args.formats, workers=args.workers)
+    print_results(results)
+    if args.output:
+        write_results(results, args.output, parameters)
+        print(f"Results written to '{args.output}'.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="ffpreader",
+        description="Read Ampac FireFinder PLUS .ffp configuration files.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # options shared by the commands that process many files
+    files = argparse.ArgumentParser(add_help=False)
+    files.add_argument(
+        "paths", nargs="+", help=".ffp files, glob patterns or directories"
+    )
+    files.add_argument(
+        "-j", "--jobs", type=int, default=1, help="number of files processed in parallel"
+    )
+    files.add_argument(
+        "--tables", nargs="+", choices=_TABLES, help="only parse these tables"
+    )
+    files.add_argument(
+        "--json", action="store_true", help="print one JSON object per file"
+    )
+
+    info = commands.add_parser(
+        "info", parents=[files], help="print the file header and section counts"
+    )
+    info.set_defaults(handler=_command_info)
+
+    parse = commands.add_parser(
+        "parse", parents=[files], help="parse files and print a summary of each table"
+    )
+    parse.set_defaults(handler=_command_parse)
+
+    validate = commands.add_parser(
+        "validate", parents=[files], help="check files for consistency issues"
+    )
+    validate.add_argument("--warnings", action="store_true", help="also print warnings")
+    validate.set_defaults(handler=_command_validate)
+
+    export = commands.add_parser(
+        "export", parents=[files], help="write csv, Excel and Modbus exports"
+    )
+    export.add_argument("-o", "--output-dir", default=".")
+    export.add_argument(
+        "--formats", nargs="+", choices=_FORMATS, default=list(_DEFAULT_FORMATS)
+    )
+    export.add_argument(
+        "--force", action="store_true", help="rewrite exports whose tables are unchanged"
+    )
+    export.set_defaults(handler=_command_export)
+
+    modbus = commands.add_parser(
+        "modbus", parents=[files], help="write the Modbus register map workbook"
+    )
+    modbus.add_argument("-o", "--output-dir", default=".")
+    modbus.add_argument(
+        "--force", action="store_true", help="rewrite the workbook if its tables are unchanged"
+    )
+    modbus.set_defaults(handler=_command_modbus)
+
+    pollplan = commands.add_parser(
+        "pollplan",
+        parents=[files],
+        help="plan the Modbus read requests covering the configured registers",
+    )
+    pollplan.add_argument(
+        "--max-registers", type=int, default=125, help="most registers per request (1-125)"
+    )
+    pollplan.add_argument(
+        "--gap", type=int, default=0, help="most unused registers read through to save a request"
+    )
+    pollplan.add_argument("-v", "--verbose", action="store_true", help="print every request")
+    pollplan.set_defaults(handler=_command_pollplan)
+
+    diff = commands.add_parser("diff", help="compare two revisions of a .ffp file")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--tables", nargs="+", choices=_TABLES)
+    diff.add_argument(
+        "-o", "--output", help="write the differences to an .xlsx file or a directory of csv files"
+    )
+    diff.add_argument("-v", "--verbose", action="store_true", help="print every difference")
+    diff.set_defaults(handler=_command_diff)
+
+    index = commands.add_parser(
+        "index", help="build or update a search index over an archive of .ffp files"
+    )
+    index.add_argument("root", help="archive directory, searched recursively")
+    index.add_argument("-d", "--database", default="archive.sqlite")
+    index.add_argument(
+        "-j", "--jobs", type=int, default=None, help="number of files parsed in parallel"
+    )
+    index.set_defaults(handler=_command_index)
+
+    search = commands.add_parser("search", help="search an archive index")
+    search.add_argument("text", help="words to find, a trailing * matches a prefix")
+    search.add_argument("-d", "--database", default="archive.sqlite")
+    search.add_argument("--kind", choices=["device", "zone", "node", "loop"])
+    search.add_argument("--column", choices=["description", "type", "subtype"])
+    search.add_argument("--site")
+    search.add_argument("--limit", type=int, default=1000)
+    search.add_argument("--json", action="store_true", help="print the matches as JSON")
+    search.set_defaults(handler=_command_search)
+
+    serve = commands.add_parser("serve", help="serve configurations over HTTP/JSON")
+    serve.add_argument("data_dir", help="directory of .ffp files to serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--cache-mb", type=int, default=1024, help="approximate cache size")
+    serve.add_argument("--workers", type=int, default=4, help="parsing and rendering threads")
+    serve.set_defaults(handler=_command_serve)
+
+    watch = commands.add_parser(
+        "watch", help="keep the exports of a directory of .ffp files up to date"
+    )
+    watch.add_argument("watch_dir", help="directory of .ffp files to watch")
+    watch.add_argument("-o", "--output-dir", default=".")
+    watch.add_argument(
+        "--formats", nargs="+", choices=_FORMATS, default=list(_DEFAULT_FORMATS)
+    )
+    watch.add_argument(
+        "--debounce", type=float, default=2.0, help="seconds a file must be unchanged before it is processed"
+    )
+    watch.add_argument("--workers", type=int, default=4, help="number of files processed in parallel")
+    watch.add_argument(
+        "--poll", action="store_true", help="poll the directory instead of using inotify"
+    )
+    watch.add_argument(
+        "--poll-interval", type=float, default=1.0, help="seconds between directory scans when polling"
+    )
+    watch.add_argument(
+        "--json", action="store_true", help="print the per-file metrics as JSON on exit"
+    )
+    watch.set_defaults(handler=_command_watch)
+
+    bench = commands.add_parser("bench", help="benchmark on a synthetic panel")
+    bench.add_argument("--preset", choices=["small", "site", "large"], default="site")
+    bench.add_argument("--formats", nargs="*", choices=_FORMATS, default=list(_FORMATS))
+    bench.add_argument("--workers", type=int, help="parse the file in this many processes")
+    bench.add_argument("-o", "--output", help="JSON results file")
+    bench.set_defaults(handler=_command_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+import time
+
+# schema version stored in the metadata table, bump when the layout below changes
+_FORMAT_VERSION = 1
+
+# primary key or natural key columns of each table, registers tables repeat them for querying
+_KEYS = {
+    "zones": ["zone"],
+    "nodes": ["node"],
+    "loops": ["loop"],
+    "devices": ["loop", "device"],
+}
+# indexes created on each table after loading, eg devices by loop/device, zone and register
+_INDEXES = {
+    "zones": [["zone"]],
+    "nodes": [["node"]],
+    "loops": [["loop"], ["node"]],
+    "devices": [["loop", "device"], ["zone"]],
+    "zone_registers": [["zone"], ["gateway", "holding_register"]],
+    "node_registers": [["node"], ["gateway", "holding_register"]],
+    "loop_registers": [["loop"], ["gateway", "holding_register"]],
+    "device_registers": [["loop", "device"], ["gateway", "holding_register"]],
+}
+_SQL_TYPES = {"i": "INTEGER", "u": "INTEGER", "f": "REAL", "b": "INTEGER"}
+
+
+def _registers_table(table):
+    """name of the table holding the ModbusMapper columns of a table, eg 'devices' -> 'device_registers'"""
+    return table[:-1] + "_registers"
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _column_layout(df):
+    """
+    Describe the columns of a DataFrame for writing and reconstructing it.
+    Returns {'columns': [[name, dtype, encoding], ...], 'columns_dtype': ...} where encoding is 'json'
+    for columns of lists (eg ModbusMapper's loop_down_bit_offset) and None otherwise. Names keep
+    their type in JSON, so the numbered raw device columns (4, 5, ...) come back as ints.
+    """
+    columns = []
+    for name, dtype in df.dtypes.items():
+        encoding = None
+        if dtype == object:
+            sample = df[name].dropna()
+            if len(sample) and isinstance(sample.iloc[0], (list, tuple)):
+                encoding = "json"
+        columns.append([name, str(dtype), encoding])
+    return {"columns": columns, "columns_dtype": str(df.columns.dtype)}
+
+
+def _records(df, layout):
+    """the rows of df as tuples of python values sqlite accepts, with 'position' (the index) first"""
+    import pandas as pd
+
+    values = df.astype(object).where(pd.notna(df), None)
+    for name, _, encoding in layout["columns"]:
+        if encoding == "json":
+            values[name] = [
+                None if value is None else json.dumps(list(value)) for value in values[name]
+            ]
+    return list(values.itertuples(index=True, name=None))
+
+
+def _create_table(connection, name, df, layout):
+    """create a table for df keyed by its index as 'position' and insert its rows"""
+    columns = ["position INTEGER PRIMARY KEY"]
+    for column, _, encoding in layout["columns"]:
+        sql_type = "TEXT" if encoding else _SQL_TYPES.get(df[column].dtype.kind, "TEXT")
+        columns.append(f"{_quote(column)} {sql_type}")
+    connection.execute(f"CREATE TABLE {_quote(name)} ({', '.join(columns)})")
+    rows = _records(df, layout)
+    connection.executemany(
+        f"INSERT INTO {_quote(name)} VALUES ({', '.join('?' * (len(columns)))})", rows
+    )
+    return len(rows)
+
+
+def write_database(reader, db_path, modbus=True):
+    """
+    Write the zones, nodes, loops and devices of an FFPReader to a SQLite database, one table each
+    keyed by their row position, with indexes on loop/device, zone and node. With modbus=True the
+    ModbusMapper columns of each table are written to zone_registers, node_registers, loop_registers
+    and device_registers, which repeat the table's key columns and are indexed on gateway/register, eg
+        SELECT d.* FROM devices d JOIN device_registers r USING (position)
+        WHERE r.gateway = 1 AND r.holding_register BETWEEN 242 AND 273
+
+    All rows are inserted with executemany in one transaction into a temporary file that replaces
+    db_path once complete, so readers never see a partly written database.
+    The column names and dtypes are stored in the metadata table for read_configuration.
+    Returns the number of rows written per table.
+    """
+    from .modbusmapper import ModbusMapper
+
+    configuration = {
+        table: getattr(reader, table)
+        for table in reader.TABLES
+        if getattr(reader, table) is not None
+    }
+    mapped = {}
+    if modbus:
+        mapper = ModbusMapper(configuration=configuration)
+        mapped = {table: getattr(mapper, table) for table in configuration}
+
+    temporary_path = db_path + ".tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    counts = {}
+    layouts = {}
+    connection = sqlite3.connect(temporary_path)
+    try:
+        with connection:
+            connection.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+            for table, df in configuration.items():
+                layouts[table] = _column_layout(df)
+                counts[table] = _create_table(connection, table, df, layouts[table])
+                if table in mapped:
+                    registers = _registers_table(table)
+                    added = [c for c in mapped[table].columns if c not in df.columns]
+                    registers_df = mapped[table][_KEYS[table] + added]
+                    layouts[registers] = _column_layout(registers_df)
+                    # the dtype of the column labels once the register columns are joined on
+                    layouts[registers]["joined_columns_dtype"] = str(mapped[table].columns.dtype)
+                    counts[registers] = _create_table(
+                        connection, registers, registers_df, layouts[registers]
+                    )
+            for table in layouts:
+                for columns in _INDEXES.get(table, []):
+                    connection.execute(
+                        f"CREATE INDEX {_quote(table + '_' + '_'.join(columns))} "
+                        f"ON {_quote(table)} ({', '.join(_quote(c) for c in columns)})"
+                    )
+            metadata = {
+                "format_version": _FORMAT_VERSION,
+                "source": os.path.abspath(reader.ffp_filepath),
+                "encoding": reader.encoding,
+                "non_ascii_field_count": reader.non_ascii_field_count,
+                "written_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "tables": list(configuration),
+                "layouts": layouts,
+            }
+            connection.executemany(
+                "INSERT INTO metadata VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in metadata.items()],
+            )
+    finally:
+        connection.close()
+    os.replace(temporary_path, db_path)
+    return counts
+
+
+def read_metadata(db_path):
+    """Returns the metadata dict of a database written by write_database"""
+    connection = sqlite3.connect(db_path)
+    try:
+        metadata = {
+            key: json.loads(value)
+            for key, value in connection.execute("SELECT key, value FROM metadata")
+        }
+    finally:
+        connection.close()
+    if metadata.get("format_version") != _FORMAT_VERSION:
+        raise ValueError(
+            f"'{db_path}' has format version {metadata.get('format_version')}, expected {_FORMAT_VERSION}."
+        )
+    return metadata
+
+
+def _read_table(connection, table, layout):
+    """read a table written by _create_table back into a DataFrame with its original columns and dtypes"""
+    import pandas as pd
+
+    rows = connection.execute(f"SELECT * FROM {_quote(table)} ORDER BY position").fetchall()
+    names = [name for name, _, _ in layout["columns"]]
+    df = pd.DataFrame.from_records(rows, columns=["position"] + names)
+    df = df.set_index("position")
+    df.index.name = None
+    df.columns = pd.Index(names, dtype=layout["columns_dtype"])
+    for name, dtype, encoding in layout["columns"]:
+        if encoding == "json":
+            df[name] = [None if value is None else json.loads(value) for value in df[name]]
+        elif str(df[name].dtype) != dtype:
+            df[name] = df[name].astype(dtype)
+    if df.index.equals(pd.RangeIndex(len(df))):
+        df.index = pd.RangeIndex(len(df))
+    return df
+
+
+def read_configuration(db_path, tables=None, modbus=False):
+    """
+    Read the tables written by write_database, equal to the FFPReader frames they were written from.
+    With modbus=True the register columns are joined on, giving the ModbusMapper frames instead.
+
+    Args:
+        db_path (str): Database written by write_database.
+        tables (list[str], optional): Only read these tables, defaults to every table in the database.
+        modbus (bool, optional): Include the ModbusMapper columns.
+
+    Returns:
+        dict: {table: pd.DataFrame}, eg {'zones': ..., 'nodes': ..., 'loops': ..., 'devices': ...}
+    """
+    import pandas as pd
+
+    metadata = read_metadata(db_path)
+    layouts = metadata["layouts"]
+    connection = sqlite3.connect(db_path)
+    try:
+        configuration = {}
+        for table in tables or metadata["tables"]:
+            if table not in metadata["tables"]:
+                raise ValueError(f"'{db_path}' has no '{table}' table.")
+            df = _read_table(connection, table, layouts[table])
+            registers = _registers_table(table)
+            if modbus:
+                if registers not in layouts:
+                    raise ValueError(f"'{db_path}' was written without Modbus registers.")
+                registers_df = _read_table(connection, registers, layouts[registers])
+                df = pd.concat([df, registers_df.drop(columns=_KEYS[table])], axis=1)
+                df.columns = df.columns.astype(layouts[registers]["joined_columns_dtype"])
+            configuration[table] = df
+    finally:
+        connection.close()
+    return configuration
@@ -0,0 +1,86 @@
+# columns identifying a row, and the columns compared between revisions, for each table
+DIFF_KEYS = {
+    "zones": ["zone"],
+    "nodes": ["node"],
+    "loops": ["loop"],
+    "devices": ["loop", "device"],
+}
+DIFF_COLUMNS = {
+    "zones": ["description"],
+    "nodes": ["description"],
+    "loops": ["description", "id", "node"],
+    "devices": ["zone", "description", "subtype", "type"],
+}
+
+
+def diff_tables(old, new, keys, columns):
+    """
+    Compare two revisions of a table, matching rows on the key columns. Rows sharing a key, eg the
+    'P 1' and 'P 2' sections of a node, are matched in order of appearance, the n-th to the n-th.
+
+    Args:
+        old (pd.DataFrame): The table from the earlier revision.
+        new (pd.DataFrame): The table from the later revision.
+        keys (list[str]): Columns identifying a row, eg ['loop', 'device'].
+        columns (list[str]): Columns compared between revisions, eg ['zone', 'description'].
+
+    Returns:
+        pd.DataFrame: One row per added, removed or changed row with columns
+        keys + ['change'] + ['{column}_old', '{column}_new' for each column], where change is
+        'added', 'removed' or 'changed'. eg a device moved to a new zone:
+            loop  device  change   zone_old  zone_new  description_old  description_new ...
+            12    90      changed  179       180       IRD-ICG-...      IRD-ICG-...
+    """
+    import pandas as pd
+
+    columns = [c for c in columns if c in old.columns and c in new.columns]
+    # occurrence numbers the rows of each key, so repeated keys don't match every row of the other side
+    old = old[keys + columns].assign(occurrence=old.groupby(keys, dropna=False).cumcount())
+    new = new[keys + columns].assign(occurrence=new.groupby(keys, dropna=False).cumcount())
+    merged = pd.merge(
+        old,
+        new,
+        on=keys + ["occurrence"],
+        how="outer",
+        suffixes=("_old", "_new"),
+        indicator=True,
+        validate="one_to_one",
+    )
+    changed = pd.Series(False, index=merged.index)
+    for column in columns:
+        old_values = merged[f"{column}_old"].astype(str)
+        new_values = merged[f"{column}_new"].astype(str)
+        changed |= old_values != new_values
+    merged["change"] = merged["_merge"].map(
+        {"left_only": "removed", "right_only": "added", "both": "changed"}
+    )
+    merged = merged[(merged["_merge"] != "both") | changed]
+    ordered = keys + ["change"]
+    for column in columns:
+        ordered += [f"{column}_old", f"{column}_new"]
+    return merged.sort_values(keys + ["occurrence"])[ordered].reset_index(drop=True)
+
+
+def diff_configurations(old, new, tables=None):
+    """
+    Compare the configuration of two FFPReaders, eg two revisions of a site's .ffp file.
+
+    Args:
+        old (FFPReader): The earlier revision.
+        new (FFPReader): The later revision.
+        tables (list[str], optional): Tables to compare, defaults to every table parsed by both readers.
+
+    Returns:
+        dict: {table: pd.DataFrame} of the differences in each table, see diff_tables.
+    """
+    tables = tables or list(DIFF_KEYS)
+    differences = {}
+    for table in tables:
+        old_df = getattr(old, table)
+        new_df = getattr(new, table)
+        if old_df is None or new_df is None:
+            continue
+        differences[table] = diff_tables(
+            old_df, new_df, DIFF_KEYS[table], DIFF_COLUMNS[table]
+        )
+    return differences
@@ -0,0 +1,320 @@
+"""
+Append-only log of the status changes of the zones, nodes, loops and devices addressed by
+ModbusMapper, for keeping months of alarm, fault and isolate history.
+
+Events are fixed-width binary records (EVENT_DTYPE, 16 bytes: time, object type, number, device,
+status bits and the previous status bits) appended in time order to one file. Reads memory-map the
+file, and a sparse index of the time of every index_interval'th record, kept in '{path}.idx', narrows
+a time range to a few blocks before searching the records themselves.
+
+    log = EventLog("site.events")
+    log.record(store)                                    # append the objects whose bits changed, see state.StateStore
+    log.query(start, end, table="zones", flag="alarm")   # zone alarm events in a time range
+    log.history("devices", 12, device=90)                # every event of loop 12 device 90
+    log.snapshot(time)                                   # status of every object at a time
+    log.compact(before=time)                             # keep only the last event per object before time
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# record layout, time is unix seconds
+EVENT_DTYPE = [
+    ("time", "<f8"),
+    ("number", "<u2"),  # zone, node or loop number
+    ("table", "u1"),  # index of the table in TABLES
+    ("device", "u1"),  # device number within the loop, 0 for other tables
+    ("bits", "u1"),  # status bits of the object, see StateStore.FLAGS
+    ("previous", "u1"),  # status bits before this event
+    ("reserved", "<u2"),
+]
+# sparse index entries, the time of the record at position
+_INDEX_DTYPE = [("time", "<f8"), ("position", "<i8")]
+_MAGIC = b"FFPEVENTS1\0\0\0\0\0\0"
+
+TABLES = ("zones", "nodes", "loops", "devices")
+# column holding the number of each table's objects in query results
+_NUMBER_COLNAME = {"zones": "zone", "nodes": "node", "loops": "loop", "devices": "loop"}
+
+
+class EventLog:
+    def __init__(self, path, index_interval=1024):
+        """
+        Open an event log, creating it if path does not exist.
+
+        Args:
+            path (str): The log file, the sparse index is kept in '{path}.idx'.
+            index_interval (int, optional): Records between sparse index entries. Applies to new
+                logs, an existing log keeps the interval it was written with.
+        """
+        import numpy as np
+
+        self.path = path
+        self._index_path = path + ".idx"
+        self._dtype = np.dtype(EVENT_DTYPE)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(_MAGIC + np.int64(index_interval).tobytes())
+            with open(self._index_path, "wb"):
+                pass
+        with open(path, "rb") as f:
+            header = f.read(len(_MAGIC) + 8)
+        if header[: len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"'{path}' is not an event log.")
+        self._header_size = len(header)
+        self.index_interval = int(np.frombuffer(header[len(_MAGIC) :], dtype="<i8")[0])
+        # a record only partly written, eg by a process killed while appending, is dropped
+        size = os.path.getsize(path)
+        partial = (size - self._header_size) % self._dtype.itemsize
+        if partial:
+            logger.warning(f"Dropping a partial record of {partial} bytes at the end of '{path}'.")
+            os.truncate(path, size - partial)
+        self._records = None
+        self._index = self._load_index()
+        # status bits last recorded per table, aligned with StateStore.keys, see record
+        self._last_bits = {}
+
+    def __len__(self):
+        return (os.path.getsize(self.path) - self._header_size) // self._dtype.itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._records = None
+
+    def _load_index(self):
+        """read the sparse index, rebuilding it from the records if it is missing or out of date"""
+        import numpy as np
+
+        index = np.zeros(0, dtype=_INDEX_DTYPE)
+        if os.path.exists(self._index_path):
+            index = np.fromfile(self._index_path, dtype=_INDEX_DTYPE)
+        expected = -(-len(self) // self.index_interval)
+        if len(index) != expected:
+            positions = np.arange(0, len(self), self.index_interval)
+            index = np.zeros(len(positions), dtype=_INDEX_DTYPE)
+            index["time"] = self.records()["time"][positions]
+            index["position"] = positions
+            index.tofile(self._index_path)
+        return index
+
+    def records(self):
+        """all records as a read-only memory-mapped structured array of EVENT_DTYPE"""
+        import numpy as np
+
+        count = len(self)
+        if self._records is None or len(self._records) != count:
+            if count == 0:
+                self._records = np.zeros(0, dtype=self._dtype)
+            else:
+                self._records = np.memmap(
+                    self.path, dtype=self._dtype, mode="r", offset=self._header_size, shape=(count,)
+                )
+        return self._records
+
+    def append(self, table, numbers, bits, previous=None, devices=None, time=None):
+        """
+        Append events for objects of one table, all at the same time.
+
+        Args:
+            table (str): 'zones', 'nodes', 'loops' or 'devices'.
+            numbers (array-like): Zone, node or loop number of each object (the loop for devices).
+            bits (array-like): New status bits of each object.
+            previous (array-like, optional): Status bits before the event, defaults to 0.
+            devices (array-like, optional): Device number of each object, for devices.
+            time (float, optional): Unix time of the events, defaults to now. Must not be earlier
+                than the last event in the log.
+        Returns the number of events appended.
+        """
+        import time as clock
+        import numpy as np
+
+        time = clock.time() if time is None else float(time)
+        records = self.records()
+        if len(records) and time < records["time"][-1]:
+            raise ValueError(f"Events must be appended in time order, {time} is before the last event.")
+        numbers = np.asarray(numbers)
+        events = np.zeros(len(numbers), dtype=self._dtype)
+        events["time"] = time
+        events["table"] = TABLES.index(table)
+        events["number"] = numbers
+        events["bits"] = bits
+        if previous is not None:
+            events["previous"] = previous
+        if devices is not None:
+            events["device"] = devices
+
+        start = len(records)
+        with open(self.path, "ab") as f:
+            f.write(events.tobytes())
+        # index the records falling on the interval
+        positions = np.arange(-(-start // self.index_interval) * self.index_interval, start + len(events), self.index_interval)
+        if len(positions):
+            entries = np.zeros(len(positions), dtype=_INDEX_DTYPE)
+            entries["time"] = time
+            entries["position"] = positions
+            with open(self._index_path, "ab") as f:
+                f.write(entries.tobytes())
+            self._index = np.concatenate([self._index, entries])
+        return len(events)
+
+    def record(self, store, time=None):
+        """
+        Append an event for every object of a state.StateStore whose status bits changed since the
+        last call, or since the last event in the log for the first call. Returns the number of events
+        appended.
+        """
+        import numpy as np
+
+        appended = 0
+        for table in TABLES:
+            bits = store.bits(table).astype(np.uint8)
+            keys = store.keys(table)
+            if table not in self._last_bits:
+                self._last_bits[table] = self._latest_bits(table, keys)
+            last = self._last_bits[table]
+            changed = np.flatnonzero(bits != last)
+            if len(changed):
+                appended += self.append(
+                    table,
+                    keys[_NUMBER_COLNAME[table]][changed],
+                    bits[changed],
+                    previous=last[changed],
+                    devices=keys["device"][changed] if table == "devices" else None,
+                    time=time,
+                )
+            self._last_bits[table] = bits
+        return appended
+
+    def _latest_bits(self, table, keys):
+        """the last status bits logged for each object of keys (see StateStore.keys), 0 if none"""
+        import numpy as np
+        import pandas as pd
+
+        bits = np.zeros(len(next(iter(keys.values()))), dtype=np.uint8)
+        latest = self.snapshot(table=table)
+        if latest.empty:
+            return bits
+        on = list(keys)
+        positions = pd.DataFrame(keys).reset_index().merge(latest, on=on)
+        bits[positions["index"].to_numpy()] = positions["bits"].to_numpy()
+        return bits
+
+    def _range(self, start, end):
+        """(first, last) record positions of the time range [start, end], using the sparse index"""
+        import numpy as np
+
+        records = self.records()
+        lower, upper = 0, len(records)
+        if start is not None:
+            block = np.searchsorted(self._index["time"], start, side="left") - 1
+            lower = int(self._index["position"][block]) if block >= 0 else 0
+        if end is not None:
+            block = np.searchsorted(self._index["time"], end, side="right")
+            upper = int(self._index["position"][block]) if block < len(self._index) else len(records)
+        times = records["time"][lower:upper]
+        first = lower + (np.searchsorted(times, start, side="left") if start is not None else 0)
+        last = lower + (np.searchsorted(times, end, side="right") if end is not None else len(times))
+        return first, last
+
+    def query(self, start=None, end=None, table=None, number=None, device=None, flag=None):
+        """
+        Events in the time range [start, end] (unix seconds, open ended when None), optionally of
+        one table, object number (zone, node or loop), device, or only events where flag (see
+        StateStore.FLAGS, eg 'alarm') changed.
+
+        Returns:
+            pd.DataFrame: One row per event in time order, eg
+                time                        table  number  device  bits  previous
+                2025-02-17 09:12:44.120000  zones  1234    0       1     0
+        """
+        import numpy as np
+        from .state import StateStore
+
+        first, last = self._range(start, end)
+        records = self.records()[first:last]
+        mask = np.ones(len(records), dtype=bool)
+        if table is not None:
+            mask &= records["table"] == TABLES.index(table)
+        if number is not None:
+            mask &= records["number"] == number
+        if device is not None:
+            mask &= records["device"] == device
+        if flag is not None:
+            if table is None:
+                raise ValueError("A table is needed to query by flag.")
+            bit = 1 << StateStore.FLAGS[table][flag]
+            mask &= (records["bits"] & bit) != (records["previous"] & bit)
+        return self._frame(np.asarray(records[mask]))
+
+    def history(self, table, number, device=None, start=None, end=None):
+        """every event of one object, see query"""
+        if table == "devices" and device is None:
+            raise ValueError("A device number is needed for the history of a device.")
+        return self.query(start, end, table=table, number=number, device=device)
+
+    def snapshot(self, time=None, table=None):
+        """
+        The status bits of every object with an event at or before time (defaults to the end of the
+        log), ie the last event of each object. Returns a DataFrame with columns table, the table's
+        key columns (zone/node/loop, device), bits and time of the last event, one table's objects when
+        table is given.
+        """
+        events = self.query(end=time, table=table)
+        events = events.drop_duplicates(["table", "number", "device"], keep="last")
+        if table is not None:
+            events = events.rename(columns={"number": _NUMBER_COLNAME[table]})
+            if table != "devices":
+                events = events.drop(columns="device")
+        return events.drop(columns="previous").reset_index(drop=True)
+
+    def _frame(self, records):
+        """the records as a DataFrame, see query"""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "time": pd.to_datetime(records["time"], unit="s"),
+                "table": pd.Categorical.from_codes(records["table"], categories=TABLES),
+                "number": records["number"].astype(int),
+                "device": records["device"].astype(int),
+                "bits": records["bits"].astype(int),
+                "previous": records["previous"].astype(int),
+            }
+        )
+
+    def compact(self, before=None):
+        """
+        Rewrite the log keeping, of the events before time before (all events when None), only the last
+        event of each object, so the status of every object (see snapshot) is unchanged. Events whose
+        bits equal their previous bits are dropped. The new log replaces the old one once written.
+        Returns the number of events removed.
+        """
+        import numpy as np
+
+        # a copy, so no view of the memory map of the old file is left when it is replaced
+        records = np.array(self.records())
+        self._records = None
+        split = self._range(None, before)[1] if before is not None else len(records)
+        old, recent = records[:split], records[split:]
+        # last event per object among the old events, in time order
+        keys = old["table"].astype(np.int64) << 24 | old["number"].astype(np.int64) << 8 | old["device"]
+        _, last = np.unique(keys[::-1], return_index=True)
+        old = old[np.sort(len(old) - 1 - last)]
+        kept = np.concatenate([old, recent])
+        kept = kept[kept["bits"] != kept["previous"]]
+
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(_MAGIC + np.int64(self.index_interval).tobytes())
+            f.write(kept.tobytes())
+        os.replace(temporary_path, self.path)
+        if os.path.exists(self._index_path):
+            os.remove(self._index_path)
+        self._index = self._load_index()
+        return len(records) - len(kept)
@@ -0,0 +1,136 @@
+import os
+from .manifest import ExportManifest
+from .modbusmapper import ModbusMapper
+from .utils import write_dfs_to_excel_and_format
+
+
+def write_csv_exports(reader, output_dir, basename=None, force=False):
+    """
+    Write the zones, nodes, loops and devices tables (raw and cleaned) of an FFPReader to csv files
+    named as in data/output, eg '{basename}.zones.csv' and '{basename}.devices (cleaned).csv'.
+    basename defaults to the .ffp filename. Tables the reader did not parse (see FFPReader tables) are skipped.
+    Files whose table is unchanged since it was last written are not rewritten unless force is True,
+    see _manifest. Returns the list of files written.
+    """
+    basename = basename or os.path.basename(reader.ffp_filepath)
+    tables = {
+        ".zones": reader.zones,
+        ".zones (cleaned)": reader.cleaned_zones,
+        ".nodes": reader.nodes,
+        ".loops": reader.loops,
+        ".devices": reader.devices,
+        ".devices (cleaned)": reader.cleaned_devices,
+    }
+    manifest = _manifest(reader, output_dir, basename)
+    written = []
+    with reader.stats.timer("export_csv"):
+        for suffix, df in tables.items():
+            if df is None:
+                continue
+            output_file = os.path.join(output_dir, basename + suffix + ".csv")
+            digests = manifest.digests({suffix: df})
+            if not force and manifest.unchanged(output_file, digests):
+                reader.stats.count("csv_skipped")
+                continue
+            df.to_csv(output_file, index=False)
+            manifest.record(output_file, digests)
+            written.append(output_file)
+        if written:
+            manifest.save()
+    return written
+
+
+def write_excel_exports(reader, output_dir, basename=None, force=False):
+    """
+    Write the configuration and cleaned configuration of an FFPReader to Excel workbooks
+    '{basename}.config.xlsx' and '{basename}.config (cleaned).xlsx', and its rollups (see
+    FFPReader.summary) to '{basename}.summary.xlsx' when the devices were parsed.
+    Workbooks whose sheets are unchanged are not rewritten unless force is True, see _manifest.
+    Returns the list of files written.
+    """
+    basename = basename or os.path.basename(reader.ffp_filepath)
+    workbooks = {
+        ".config": reader.configuration,
+        ".config (cleaned)": reader.cleaned_configuration,
+    }
+    if reader.devices is not None:
+        workbooks[".summary"] = reader.summary.tables()
+    manifest = _manifest(reader, output_dir, basename)
+    written = []
+    for suffix, configuration in workbooks.items():
+        excel_file = os.path.join(output_dir, basename + suffix + ".xlsx")
+        if write_dfs_to_excel_and_format(
+            _parsed_tables(configuration), excel_file, stats=reader.stats, manifest=manifest, force=force
+        ):
+            written.append(excel_file)
+    return written
+
+
+def write_modbus_exports(reader, output_dir, basename=None, force=False):
+    """
+    Map the configuration of an FFPReader to Modbus registers and write the tables, split by
+    gateway, to '{basename}.modbus config.xlsx', unless they are unchanged and force is False.
+    Export timings are recorded in reader.stats (see utils.write_dfs_to_excel_and_format).
+    Returns the list of files written.
+    """
+    basename = basename or os.path.basename(reader.ffp_filepath)
+    configuration = _parsed_tables(reader.configuration)
+    mapper = ModbusMapper(configuration=configuration)
+    modbus_configuration = {
+        table: mapper.split_by_modbus_gateway(equipment_type=table)
+        for table in configuration
+    }
+    excel_file = os.path.join(output_dir, basename + ".modbus config" + ".xlsx")
+    manifest = _manifest(reader, output_dir, basename)
+    if write_dfs_to_excel_and_format(
+        modbus_configuration, excel_file, stats=reader.stats, manifest=manifest, force=force
+    ):
+        return [excel_file]
+    return []
+
+
+def write_sqlite_exports(reader, output_dir, basename=None, force=False):
+    """
+    Write the tables of an FFPReader and their Modbus register mapping to a SQLite database
+    '{basename}.sqlite', see database.write_database, unless the tables are unchanged since it was
+    last written and force is False. Returns the list of files written.
+    """
+    from .database import write_database
+
+    basename = basename or os.path.basename(reader.ffp_filepath)
+    db_path = os.path.join(output_dir, basename + ".sqlite")
+    manifest = _manifest(reader, output_dir, basename)
+    digests = manifest.digests(_parsed_tables(reader.configuration))
+    if not force and manifest.unchanged(db_path, digests):
+        reader.stats.count("sqlite_skipped")
+        return []
+    with reader.stats.timer("export_sqlite"):
+        write_database(reader, db_path)
+    manifest.record(db_path, digests)
+    manifest.save()
+    return [db_path]
+
+
+def _manifest(reader, output_dir, basename):
+    """
+    The manifest of the exports of one file, '{basename}.manifest.json' in output_dir, holding a
+    hash of every table each export was written from and the resolved path of the reader's .ffp
+    file, see manifest.ExportManifest.
+    """
+    return ExportManifest(
+        os.path.join(output_dir, basename + ".manifest.json"), source=reader.ffp_filepath
+    )
+
+
+def _parsed_tables(configuration):
+    """drop the tables of a configuration dict that were not parsed (None)"""
+    return {table: df for table, df in configuration.items() if df is not None}
+
+
+# export formats by name, used where the formats to write are configurable
+EXPORTERS = {
+    "csv": write_csv_exports,
+    "xlsx": write_excel_exports,
+    "modbus": write_modbus_exports,
+    "sqlite": write_sqlite_exports,
+}
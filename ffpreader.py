@@ -1,14 +1,23 @@
+import hashlib
+import logging
 import os
-import pandas as pd
+from contextlib import contextmanager
+from .instrumentation import Stats
+from .query import ConfigurationIndex
 from .utils import (
-    load_text,
-    filter_sections_start,
-    filter_sections_end,
+    map_file,
+    find_section_spans,
+    section_header,
+    decode_span,
+    detect_encoding,
+    count_non_ascii_fields,
     parse_tsv,
     list_to_df,
     write_dfs_to_excel_and_format,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class FFPReader:
     # Internal constants
@@ -23,14 +32,264 @@ class FFPReader:
     _LOOP_INFO_SECTION_SUFFIX = "X 1"
     _DEVICE_SECTION_SUFFIX = "X 2"
 
-    def __init__(self, ffp_filepath):
+    # Default rules used by the cleaned_* properties, override per reader with the `cleaning_rules` argument
+    DEFAULT_CLEANING_RULES = {
+        # characters replaced in 'description', eg '/' becomes '-'
+        "illegal_chars": {"/": "-", "&": "+"},
+        # characters replaced in 'type'
+        "type_illegal_chars": {"/": "-"},
+        # descriptions that mark an empty address, these rows are removed
+        "placeholder_descriptions": ["", "Unassigned Text", "SPARE"],
+        # regex matched at the start of a device description to identify a location id, eg 'IRD-ICG-L05M-FCG-01'
+        "location_prefix": r"IRD-",
+        # regex per table overriding naming.DEFAULT_NAMING_PATTERNS, used by the locations property
+        "naming_patterns": {},
+    }
+
+    # tables parsed from the file, in parse order
+    TABLES = ("zones", "nodes", "loops", "devices")
+    # bytes of sections needing parsing below which a table is parsed serially even with workers
+    _PARALLEL_MIN_BYTES = 256 * 1024
+    # chunks per worker the sections are split into, more chunks balance uneven sections better
+    _CHUNKS_PER_WORKER = 4
+
+    def __init__(self, ffp_filepath, cleaning_rules=None, tables=None, validate=False, workers=None):
+        """
+        Args:
+            ffp_filepath (str): Path to the .ffp configuration file.
+            cleaning_rules (dict, optional): Overrides for any of the keys in DEFAULT_CLEANING_RULES.
+            tables (list[str], optional): Only parse these of TABLES, the others are set to None.
+                Parsing devices also parses loops, as device loop numbers come from the loop info sections.
+            validate (bool, optional): Run the consistency checks after every parse and log a warning
+                if any issue is found, see issues.
+            workers (int, optional): Parse the sections of a large file in a pool of this many processes,
+                see parallel.py. Tables with less than _PARALLEL_MIN_BYTES of sections to parse,
+                eg on a refresh with few changes, are parsed serially.
+        """
+        tables = tuple(tables) if tables else self.TABLES
+        unknown = set(tables) - set(self.TABLES)
+        if unknown:
+            raise ValueError(
+                f"Unknown tables {sorted(unknown)}, expected some of {list(self.TABLES)}."
+            )
+        self._setup(ffp_filepath, cleaning_rules, tables)
+        self.validate = validate
+        self.workers = workers
+        self._parse()
+
+    def _setup(self, ffp_filepath, cleaning_rules, tables):
+        """set the state shared by __init__ and from_database"""
+        self.tables = tables
         self.ffp_filepath = ffp_filepath
-        # self.raw_text = None
-        self.sections = self._load_and_separate_sections()
-        self.zones = self._filter_parse_load_zone_section_to_df()
-        self.nodes = self._filter_parse_load_node_sections_to_df()
-        self.loops = self._filter_parse_load_loop_info_sections_to_df()
-        self.devices = self._filter_parse_and_load_loop_devices_sections_to_df()
+        self.cleaning_rules = {**self.DEFAULT_CLEANING_RULES, **(cleaning_rules or {})}
+        # parsed result of each section keyed by (parse function, header, occurrence), see refresh
+        self._section_cache = {}
+        # stage timings and section/row/byte counters, see instrumentation.Stats
+        self.stats = Stats("ffpreader")
+        self._query = None
+        self._issues = None
+        self._occupancy = None
+        self._locations = None
+        self._summary = None
+        self.validate = False
+        self.workers = None
+        # process pool of the current parse, created when first needed, see _parse_spans
+        self._pool = None
+
+    @classmethod
+    def from_database(cls, db_path, cleaning_rules=None):
+        """
+        Load a reader from a SQLite database written by database.write_database instead of parsing
+        the .ffp file, the tables are equal to those of the reader that was written.
+        refresh() re-parses the original .ffp file the database was written from.
+
+        Args:
+            db_path (str): Path to the database.
+            cleaning_rules (dict, optional): Overrides for any of the keys in DEFAULT_CLEANING_RULES.
+        """
+        from .database import read_configuration, read_metadata
+
+        metadata = read_metadata(db_path)
+        reader = cls.__new__(cls)
+        reader._setup(metadata["source"], cleaning_rules, tuple(metadata["tables"]))
+        with reader.stats.timer("load_database"):
+            configuration = read_configuration(db_path)
+        for table in cls.TABLES:
+            setattr(reader, table, configuration.get(table))
+        reader.encoding = metadata["encoding"]
+        reader.non_ascii_field_count = metadata["non_ascii_field_count"]
+        return reader
+
+    def refresh(self):
+        """
+        Re-read the file after it has been re-exported and update zones, nodes, loops and devices.
+        Every section is re-located and hashed, but only sections whose bytes changed since the
+        previous parse are decoded and parsed again; unchanged sections reuse their parsed rows.
+
+        Returns:
+            list[str]: The headers of the sections that were re-parsed, eg ['M 90102 X 2'].
+        """
+        return self._parse()
+
+    def _parse(self):
+        """
+        Parse the file into the zones, nodes, loops and devices DataFrames, reusing cached results
+        for unchanged sections. Returns the headers of the sections that were parsed.
+        """
+        self._previous_section_cache = self._section_cache
+        self._section_cache = {}
+        self._parsed_headers = []
+        self._decoded_bytes = 0
+        # The file is memory-mapped for the duration of the parse, only the section headers
+        # and the sections materialised into tables are decoded
+        with self.stats.timer("parse"), map_file(self.ffp_filepath) as buffer, self._pool_scope():
+            self._buffer = buffer
+            with self.stats.timer("tokenize"):
+                # detected once on the raw bytes, 'ascii' for most files
+                self.encoding = detect_encoding(buffer)
+                # number of fields containing non-ASCII characters, for reporting
+                self.non_ascii_field_count = (
+                    0 if self.encoding == "ascii" else count_non_ascii_fields(buffer)
+                )
+                self.section_spans = find_section_spans(buffer)
+                self.section_headers = [
+                    section_header(buffer, span, self.encoding)
+                    for span in self.section_spans
+                ]
+            tables = set(self.tables)
+            if "devices" in tables:
+                tables.add("loops")
+            for table, parse in [
+                ("zones", self._filter_parse_load_zone_section_to_df),
+                ("nodes", self._filter_parse_load_node_sections_to_df),
+                ("loops", self._filter_parse_load_loop_info_sections_to_df),
+                ("devices", self._filter_parse_and_load_loop_devices_sections_to_df),
+            ]:
+                if table in tables:
+                    with self.stats.timer(f"parse_{table}"):
+                        setattr(self, table, parse())
+                else:
+                    setattr(self, table, None)
+            self.stats.set("bytes", len(buffer))
+        self._buffer = None
+        self._previous_section_cache = None
+
+        self.stats.count("parses")
+        self.stats.set("sections", len(self.section_spans))
+        self.stats.set("sections_parsed", len(self._parsed_headers))
+        self.stats.set(
+            "sections_reused", len(self._section_cache) - len(self._parsed_headers)
+        )
+        self.stats.set("bytes_decoded", self._decoded_bytes)
+        # rebuilt from the new tables on next access
+        self._query = None
+        self._issues = None
+        self._occupancy = None
+        self._locations = None
+        self._summary = None
+        for table in self.TABLES:
+            if getattr(self, table) is not None:
+                self.stats.set(f"{table}_rows", len(getattr(self, table)))
+        if self.validate:
+            issues = self.issues
+            if len(issues):
+                logger.warning(
+                    f"'{self.ffp_filepath}' has {len(issues)} configuration issues: "
+                    + ", ".join(
+                        f"{count} {check}"
+                        for check, count in issues["check"].value_counts().items()
+                    )
+                )
+        return self._parsed_headers
+
+    @property
+    def sections(self):
+        """
+        Returns every section in the file as a list of strings, see _load_and_separate_sections.
+        The sections are not kept in memory after parsing, so this re-reads the file on each access.
+        """
+        return self._load_and_separate_sections()
+
+    @property
+    def query(self):
+        """
+        Returns a ConfigurationIndex over the devices and loops for fast lookups by zone, node,
+        loop and description, see query.ConfigurationIndex. Built on first access after each parse.
+        """
+        if self.devices is None:
+            raise ValueError("The query index needs the devices table, include 'devices' in tables.")
+        if self._query is None:
+            with self.stats.timer("build_query_index"):
+                self._query = ConfigurationIndex(self.devices, self.loops)
+        return self._query
+
+    @property
+    def occupancy(self):
+        """
+        Returns the device address and zone occupancy bitmaps of the configuration, for free address
+        searches and comparing revisions, see occupancy.Occupancy. Built on first access after each parse.
+        """
+        from .occupancy import Occupancy
+
+        if self.devices is None:
+            raise ValueError("Occupancy needs the devices table, include 'devices' in tables.")
+        if self._occupancy is None:
+            with self.stats.timer("build_occupancy"):
+                self._occupancy = Occupancy(
+                    self.devices,
+                    self.zones,
+                    self.loops,
+                    self.cleaning_rules["placeholder_descriptions"],
+                )
+        return self._occupancy
+
+    @property
+    def summary(self):
+        """
+        Returns the rollups of the devices per zone, node, loop and type, with spare addresses and loop
+        utilization, see summary.Summary. Built on first access after each parse.
+        """
+        from .summary import Summary
+
+        if self.devices is None:
+            raise ValueError("The summary needs the devices table, include 'devices' in tables.")
+        if self._summary is None:
+            with self.stats.timer("build_summary"):
+                self._summary = Summary(
+                    self.devices,
+                    self.zones,
+                    self.loops,
+                    self.cleaning_rules["placeholder_descriptions"],
+                    self.occupancy,
+                )
+        return self._summary
+
+    @property
+    def locations(self):
+        """
+        Returns the cleaned devices, zones and nodes with system, building, level and room columns
+        parsed from their descriptions, see naming.Locations. Built on first access after each parse.
+        """
+        from .naming import Locations
+
+        if self._locations is None:
+            with self.stats.timer("parse_locations"):
+                self._locations = Locations(self, self.cleaning_rules["naming_patterns"])
+        return self._locations
+
+    @property
+    def issues(self):
+        """
+        Returns a DataFrame of the consistency issues in the parsed tables, eg devices in unconfigured
+        zones or duplicated loop numbers, see validation.validate. Checked on first access after each parse.
+        """
+        from .validation import validate
+
+        if self._issues is None:
+            with self.stats.timer("validate"):
+                self._issues = validate(self)
+            self.stats.set("issues", len(self._issues))
+        return self._issues
 
     @property
     def configuration(self):
@@ -60,36 +319,38 @@ class FFPReader:
     def cleaned_zones(self):
         """Return a cleaned version of the zones DataFrame."""
         if self.zones is not None:
-            return self._clean_df(self.zones)
+            with self.stats.timer("clean_zones"):
+                df = self._clean_df(self.zones)
+            self.stats.set("cleaned_zones_rows", len(df))
+            return df
         return None
 
     @property
     def cleaned_devices(self):
+        """Return a cleaned version of the devices DataFrame with 'name' and 'locationId' columns."""
+        if self.devices is None:
+            return None
+        with self.stats.timer("clean_devices"):
+            df = self._cleaned_devices()
+        self.stats.set("cleaned_devices_rows", len(df))
+        return df
+
+    def _cleaned_devices(self):
+        """Returns the cleaned devices DataFrame with 'name' and 'locationId' columns added, see cleaned_devices"""
         # initial clean
         df = self._clean_df(self.devices)
 
         # Select all columns up to and including 'type'
         df = df.loc[:, :"type"]
 
-        # Add 'name' column
-        df["name"] = (
-            "L"
-            + df["loop"].astype(str)
-            + " - "
-            + "D"
-            + df["device"].astype(str)
-            + " - "
-            + "Z"
-            + df["zone"].astype(str)
-            + " - "
-            + df["description"]
-            + " - "
-            + df["type"]
-        )
-
-        # Try and determine location assuming programmer has set device description in format '{location} {device details}'
-        df["locationId"] = df["description"].apply(
-            lambda x: x.split(" ")[0] if x.startswith("IRD-") else ""
+        # Build 'name' and 'locationId' in one vectorized pass over the frame
+        rules = self.cleaning_rules
+        df = df.assign(
+            name=self._build_device_names(df),
+            # Try and determine location assuming programmer has set device description in format '{location} {device details}'
+            locationId=df["description"]
+            .str.extract(f"^((?:{rules['location_prefix']})[^ ]*)", expand=False)
+            .fillna(""),
         )
 
         # Sort by 'loop'
@@ -97,6 +358,21 @@ class FFPReader:
 
         return df
 
+    def _build_device_names(self, df):
+        """
+        Returns a Series of device names in the format 'L{loop} - D{device} - Z{zone} - {description} - {type}'
+        eg 'L12 - D90 - Z179 - IRD-ICG-L05M-FCG-01 MGF OVERFLOW - OPT'
+        """
+        return ("L" + df["loop"].astype(str)).str.cat(
+            [
+                "D" + df["device"].astype(str),
+                "Z" + df["zone"].astype(str),
+                df["description"],
+                df["type"],
+            ],
+            sep=" - ",
+        )
+
     def _load_and_separate_sections(self):
         """
         The FFP system configuration is described in "sections" seperated by square brackets [ ]
@@ -146,21 +422,113 @@ class FFPReader:
             MASD-FIP-ICG-L02-01 T4 L02 MFIP	1"
         ]
         """
-        text = load_text(self.ffp_filepath)
-        sections = []
-        start = 0
-        while True:
-            start = text.find("[", start)
-            if start == -1:
-                break
-            end = text.find("]", start)
-            if end == -1:
-                break
-            # trim leading and trailing white space
-            trimmed = text[start + 1 : end].strip()
-            sections.append(trimmed)
-            start = end + 1
-        return sections
+        with map_file(self.ffp_filepath) as buffer:
+            encoding = detect_encoding(buffer)
+            return [
+                decode_span(buffer, span, encoding)
+                for span in find_section_spans(buffer)
+            ]
+
+    def _parse_matching_sections(
+        self, parse_func, start_flag, end_suffix=None, context=None
+    ):
+        """
+        Apply parse_func to each section whose first line starts with start_flag (and ends with
+        end_suffix if given) and return the list of results in file order.
+        Sections are filtered on their already decoded headers so only the matching byte ranges of
+        the mapped file are decoded.
+
+        The result for each section is cached against a hash of its bytes. When the same section
+        is unchanged on the next parse (see refresh) the cached result is returned without decoding.
+
+        Args:
+            parse_func (callable): Takes a section string, eg self._parse_loop_info_section_to_dict.
+                Results are shared with the cache so must not be modified by the caller.
+            start_flag (str): eg "M"
+            end_suffix (str, optional): eg "X 1"
+            context (callable, optional): Takes the section header and returns any other state the
+                result depends on, eg the loop number of a device section. A change invalidates the cache.
+        """
+        results = []
+        # positions in results of the sections that were not cached, and their spans
+        missing = []
+        occurrences = {}
+        for span, header in zip(self.section_spans, self.section_headers):
+            if not header.startswith(start_flag):
+                continue
+            if end_suffix is not None and not header.endswith(end_suffix):
+                continue
+            occurrences[header] = occurrences.get(header, 0) + 1
+            key = (parse_func.__name__, header, occurrences[header])
+            start, end = span
+            section_digest = hashlib.blake2b(self._buffer[start:end], digest_size=16).digest()
+            digest = section_digest
+            if context is not None:
+                digest += repr(context(header)).encode()
+            cached = self._previous_section_cache.get(key)
+            if cached is not None and cached[0] == digest:
+                self._section_cache[key] = cached
+                results.append(cached[1])
+            else:
+                missing.append((len(results), key, digest, span, section_digest))
+                self._parsed_headers.append(header)
+                self._decoded_bytes += end - start
+                results.append(None)
+        parsed = self._parse_spans(
+            parse_func,
+            [span for _, _, _, span, _ in missing],
+            [section_digest for _, _, _, _, section_digest in missing],
+        )
+        for (position, key, digest, _, _), result in zip(missing, parsed):
+            self._section_cache[key] = (digest, result)
+            results[position] = result
+        return results
+
+    @contextmanager
+    def _pool_scope(self):
+        """shut down the process pool of a parse, if one was created, when the parse ends"""
+        try:
+            yield
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _parse_spans(self, parse_func, spans, digests):
+        """
+        Apply parse_func to the sections at spans of the mapped file and return the results in order,
+        in the process pool when workers is set and the sections are large enough, see parallel.py.
+        digests are the blake2b digests of the bytes of each span, checked by the workers so a file
+        replaced since it was mapped here is never parsed by them. The sections are then parsed
+        serially from the mapped file instead.
+        """
+        size = sum(end - start for start, end in spans)
+        if not self.workers or self.workers <= 1 or len(spans) <= 1 or size < self._PARALLEL_MIN_BYTES:
+            return [parse_func(decode_span(self._buffer, span, self.encoding)) for span in spans]
+
+        from concurrent.futures import ProcessPoolExecutor
+        from .parallel import SectionsChanged, parse_spans
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # device sections need the loop number of each loop section id
+        state = {"_loop_by_id": getattr(self, "_loop_by_id", {})}
+        try:
+            with self.stats.timer(f"parallel_{parse_func.__name__}"):
+                return parse_spans(
+                    self._pool,
+                    self.ffp_filepath,
+                    spans,
+                    digests,
+                    self.encoding,
+                    parse_func.__name__,
+                    state,
+                    self.workers * self._CHUNKS_PER_WORKER,
+                )
+        except SectionsChanged as error:
+            logger.warning(f"{error} Parsing its sections serially.")
+            self.stats.count("parallel_fallbacks")
+            return [parse_func(decode_span(self._buffer, span, self.encoding)) for span in spans]
 
     def _parse_section_header_info(self, section):
         """
@@ -214,16 +582,19 @@ class FFPReader:
         N	Unassigned Text	N	N	0	0	N	N	N	N	0	0	N	N	N
         ]
         """
-        filtered = filter_sections_start(self.sections, self._ZONE_SECTION_FLAG)
+        filtered = self._parse_matching_sections(
+            self._parse_zone_section_to_df, self._ZONE_SECTION_FLAG
+        )
         if len(filtered) != 1:
             raise ValueError(
                 f"Expected exactly one zone section, found {len(filtered)}. Cannot re-index zones, check FFP file."
             )
         else:
-            print(f"Found {len(filtered)} zone sections, proceeding with parsing.")
-        # parse first section in list (only one item)
-        filtered = filtered[0]
-        return self._parse_zone_section_to_df(filtered)
+            logger.debug(
+                f"Found {len(filtered)} zone sections, proceeding with parsing."
+            )
+        # first parsed section in list (only one item), copied so the cached result is not shared
+        return filtered[0].copy()
 
     def _parse_zone_section_to_df(self, section):
         """
@@ -271,10 +642,11 @@ class FFPReader:
 
         ]
         """
-        filtered = filter_sections_start(self.sections, self._NODE_SECTION_FLAG)
-        nodes_list_of_dicts = [
-            self._parse_node_section_to_dict(section) for section in filtered
-        ]
+        import pandas as pd
+
+        nodes_list_of_dicts = self._parse_matching_sections(
+            self._parse_node_section_to_dict, self._NODE_SECTION_FLAG
+        )
         return pd.DataFrame(nodes_list_of_dicts)
 
     # function to read a node section and return a dict containing node info
@@ -300,15 +672,18 @@ class FFPReader:
 
     def _filter_parse_load_loop_info_sections_to_df(self):
         """read list of strings from ffp file and only return loop info sections (first line starts with M and ends with 'X 1')"""
-        # filter sections that start with M and end with 'X 1'
-        filtered = filter_sections_start(
-            self.sections, self._LOOP_OR_LOOP_DEVICE_SECTION_FLAG
+        import pandas as pd
+
+        # parse each section that starts with M and ends with 'X 1' into a list of dicts containing loop info
+        loop_info_list_of_dicts = self._parse_matching_sections(
+            self._parse_loop_info_section_to_dict,
+            self._LOOP_OR_LOOP_DEVICE_SECTION_FLAG,
+            self._LOOP_INFO_SECTION_SUFFIX,
         )
-        filtered = filter_sections_end(filtered, self._LOOP_INFO_SECTION_SUFFIX)
-        # parse each section and return a list of dicts containing loop info
-        loop_info_list_of_dicts = [
-            self._parse_loop_info_section_to_dict(section) for section in filtered
-        ]
+        # map each loop section id to its loop number, keeping the first match, eg {'90102': 12}
+        self._loop_by_id = {}
+        for loop_info in loop_info_list_of_dicts:
+            self._loop_by_id.setdefault(loop_info["id"], loop_info["loop"])
         return pd.DataFrame(loop_info_list_of_dicts)
 
     def _parse_loop_info_section_to_dict(self, section):
@@ -319,25 +694,29 @@ class FFPReader:
         23	Apollo Loop No: 23	0	0	0	0	0	0	550	2500	1	R
         ]
         Returns:
-        {'loop': 23, 'node': 11, 'id': '110101', 'raw': 'M 110101 X 1'}
+        {'loop': 23, 'description': 'Apollo Loop No: 23', 'node': 11, 'id': '110101', 'raw': 'M 110101 X 1'}
         """
         table = parse_tsv(section)
         loop_info = {}
         loop_info["loop"] = int(table[0][0])
+        loop_info["description"] = table[0][1] if len(table[0]) > 1 else None
         loop_info.update(self._parse_section_header_info(section))
         return loop_info
 
     def _filter_parse_and_load_loop_devices_sections_to_df(self):
         """read a list of sections and return a list of dicts containing loop info and devices"""
-        # filter sections where the first line starts with M and end with 'X 2'
-        filtered = filter_sections_start(
-            self.sections, self._LOOP_OR_LOOP_DEVICE_SECTION_FLAG
+        import pandas as pd
+
+        # parse sections where the first line starts with M and end with 'X 2'
+        # the loop number comes from self.loops, so a changed loop info section also re-parses its devices
+        loop_devices_list_of_dfs = self._parse_matching_sections(
+            self._parse_loop_device_section_to_df,
+            self._LOOP_OR_LOOP_DEVICE_SECTION_FLAG,
+            self._DEVICE_SECTION_SUFFIX,
+            context=self._get_loop_id_for_loop_device_section,
         )
-        filtered = filter_sections_end(filtered, self._DEVICE_SECTION_SUFFIX)
-        loop_devices_list_of_dfs = [
-            self._parse_loop_device_section_to_df(section) for section in filtered
-        ]
-        # Combine the DataFrames into a single DataFrame
+        # Combine the DataFrames into a new DataFrame, so a frame held by a caller from before a
+        # refresh is never modified. Unchanged loops are the cached DataFrames of the previous parse.
         devices = pd.concat(loop_devices_list_of_dfs, ignore_index=True)
         return devices
 
@@ -414,13 +793,10 @@ class FFPReader:
         if "id" not in loop_info:
             return None
 
-        # Find the row in self.loops where 'id' matches loop_info['id']
-        matching_row = self.loops[self.loops["id"] == loop_info["id"]]
-
+        # Find the first row in self.loops where 'id' matches loop_info['id'], using the lookup
+        # built when self.loops was parsed rather than filtering the DataFrame for every section
         # If a match is found, return the 'loop' value; otherwise, return None
-        if not matching_row.empty:
-            return matching_row.iloc[0]["loop"]
-        return None
+        return self._loop_by_id.get(loop_info["id"])
 
     def _clean_df(self, df):
         """
@@ -428,35 +804,50 @@ class FFPReader:
             - rows representing empty addresses removed
             - string fields trimmed
             - illegal charceters removed from string fields
+
+        All row filters are combined into a single mask and the string fields are
+        rewritten with one translate pass each, so only one new frame is produced.
+        The rules applied are taken from `self.cleaning_rules`.
         """
+        import pandas as pd
+
+        rules = self.cleaning_rules
+        mask = pd.Series(True, index=df.index)
 
         if "zone" in df.columns:
             # Remove rows where 'zone' is 0
-            df = df[df["zone"] != 0]
+            mask &= df["zone"] != 0
 
         if "description" in df.columns:
-            # Remove rows where 'description' is empty or NaN
-            df = df[df["description"].ne("") & df["description"].notna()]
-
-            # Remove rows where 'description' is 'Unassigned Text' or 'SPARE'
-            df = df[df["description"] != "Unassigned Text"]
-            df = df[df["description"] != "SPARE"]
+            # Remove rows where 'description' is NaN or a placeholder, eg '', 'Unassigned Text' or 'SPARE'
+            mask &= df["description"].notna() & ~df["description"].isin(
+                rules["placeholder_descriptions"]
+            )
 
-            # Remove leading and trailing whitespace from 'description' and 'type'
-            df["description"] = df["description"].str.strip()
+        df = df.loc[mask]
 
-            # Replace illegal characters in 'description' and 'type'
-            df["description"] = df["description"].str.replace("/", "-")
-            df["description"] = df["description"].str.replace("&", "+")
+        cleaned_columns = {}
+        if "description" in df.columns:
+            # Remove leading and trailing whitespace and replace illegal characters in 'description'
+            cleaned_columns["description"] = (
+                df["description"]
+                .str.strip()
+                .str.translate(str.maketrans(rules["illegal_chars"]))
+            )
 
         # Replace illegal characters in 'type' only if 'type' column exists
         if "type" in df.columns:
-            df["type"] = df["type"].str.strip()
-            df["type"] = df["type"].str.replace("/", "-")
+            cleaned_columns["type"] = (
+                df["type"]
+                .str.strip()
+                .str.translate(str.maketrans(rules["type_illegal_chars"]))
+            )
 
-        return df
+        return df.assign(**cleaned_columns)
 
     def to_df(self, obj):
+        import pandas as pd
+
         # if df is a dict first convert to a DataFrame
         if type(df) is dict:
             df = pd.DataFrame.from_dict(df)
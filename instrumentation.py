@@ -0,0 +1,73 @@
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Stats:
+    """
+    Stage timings and counters for one FFPReader, ModbusMapper or Excel export.
+
+    Stages are timed with the `timer` context manager, calling the same stage again accumulates:
+        stats.stages == {'tokenize': {'calls': 1, 'seconds': 0.041, 'last_seconds': 0.041}, ...}
+    Counters hold sizes such as sections, rows and bytes:
+        stats.counters == {'sections': 22821, 'bytes': 2026389, 'devices_rows': 12726, ...}
+
+    Each completed stage is also emitted as a DEBUG log record on the 'ffpreader.instrumentation'
+    logger, with 'component', 'stage' and 'seconds' attributes for structured log handlers, eg
+        logging.basicConfig(level=logging.DEBUG)
+    """
+
+    def __init__(self, component):
+        """
+        Args:
+            component (str): Name identifying what is being measured in log records, eg 'ffpreader'.
+        """
+        self.component = component
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def timer(self, stage):
+        """time the body of a with block as a stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            entry = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["last_seconds"] = seconds
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s %s took %.4fs",
+                    self.component,
+                    stage,
+                    seconds,
+                    extra={
+                        "component": self.component,
+                        "stage": stage,
+                        "seconds": seconds,
+                    },
+                )
+
+    def count(self, counter, value=1):
+        """add value to a counter"""
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set(self, counter, value):
+        """set a counter to value, for sizes that are replaced rather than accumulated"""
+        self.counters[counter] = value
+
+    def as_dict(self):
+        """Returns {'component': ..., 'stages': {...}, 'counters': {...}}, eg for writing as JSON"""
+        return {
+            "component": self.component,
+            "stages": {stage: dict(entry) for stage, entry in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def __repr__(self):
+        return f"Stats({self.as_dict()!r})"
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import quote
+
+
+async def _request(reader, writer, host, path, etag=None):
+    """send one GET on a keep-alive connection, returns (status, etag, body length)"""
+    lines = [f"GET {path} HTTP/1.1", f"Host: {host}"]
+    if etag:
+        lines.append(f"If-None-Match: {etag}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length:
+        await reader.readexactly(length)
+    return status, headers.get("etag"), length
+
+
+async def _client(host, port, paths, requests, conditional, latencies, statuses):
+    """one connection issuing requests in turn over paths, recording each latency"""
+    reader, writer = await asyncio.open_connection(host, port)
+    etags = {}
+    try:
+        for i in range(requests):
+            path = paths[i % len(paths)]
+            started = time.perf_counter()
+            status, etag, _ = await _request(
+                reader, writer, host, path, etags.get(path) if conditional else None
+            )
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if etag:
+                etags[path] = etag
+    finally:
+        writer.close()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_load_test(
+    host, port, paths, connections=10, requests=100, conditional=False, warmup=True
+):
+    """
+    Issue requests from several concurrent keep-alive connections to a running ConfigurationServer
+    and return throughput and latency statistics, eg
+        {'requests': 1000, 'seconds': 0.84, 'requests_per_second': 1190.5, 'p50_ms': 7.1,
+         'p95_ms': 12.3, 'p99_ms': 15.0, 'max_ms': 22.4, 'statuses': {200: 1000}}
+
+    Args:
+        paths (list[str]): Request paths, cycled through by each connection.
+        connections (int, optional): Concurrent connections.
+        requests (int, optional): Requests per connection.
+        conditional (bool, optional): Send If-None-Match with the last ETag seen for a path,
+            measuring 304 responses.
+        warmup (bool, optional): Request each path once first, so parsing isn't measured.
+    """
+    if warmup:
+        await _client(host, port, paths, len(paths), False, [], {})
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[
+            _client(host, port, paths, requests, conditional, latencies, statuses)
+            for _ in range(connections)
+        ]
+    )
+    seconds = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "seconds": seconds,
+        "requests_per_second": len(latencies) / seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "statuses": statuses,
+    }
+
+
+def default_paths(ffp_name):
+    """a mix of table, lookup, search and register map requests for one file"""
+    name = quote(ffp_name)
+    return [
+        f"/files/{name}/tables/zones",
+        f"/files/{name}/tables/devices?cleaned=1",
+        f"/files/{name}/zones/5/devices",
+        f"/files/{name}/nodes/1/devices",
+        f"/files/{name}/search?q=FIRE%20CUPBOARD",
+        f"/files/{name}/modbus/devices?gateway=1",
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test a ConfigurationServer (see server.py) running on localhost."
+    )
+    parser.add_argument("file", help="name of a .ffp file served, eg 'QWP 16.02.24.ffp'")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-c", "--connections", type=int, default=10)
+    parser.add_argument("-n", "--requests", type=int, default=100, help="requests per connection")
+    parser.add_argument("--conditional", action="store_true", help="send If-None-Match")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        run_load_test(
+            args.host,
+            args.port,
+            default_paths(args.file),
+            args.connections,
+            args.requests,
+            args.conditional,
+        )
+    )
+    print(json.dumps(results, indent=2))
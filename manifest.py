@@ -0,0 +1,115 @@
+"""
+Manifest of the exports written to a directory, for skipping exports whose tables have not changed.
+
+For each export file the manifest keeps a content hash of every table (csv) or sheet (workbook) it
+was written from, the resolved path of the .ffp file it was exported from, and the size and
+modification time of the file as written. An export is only rewritten when one of its hashes changed,
+a table or sheet was added or removed, it was exported from another .ffp file (eg one with the same
+name in another directory), or the file was deleted or modified since.
+
+    manifest = ExportManifest("out/site.ffp.manifest.json", source="archive/site.ffp")
+    digests = manifest.digests({"zones": zones})
+    if not manifest.unchanged("out/site.ffp.zones.csv", digests):
+        zones.to_csv("out/site.ffp.zones.csv", index=False)
+        manifest.record("out/site.ffp.zones.csv", digests)
+    manifest.save()
+"""
+import hashlib
+import json
+import os
+
+# bump to invalidate the manifests written by earlier versions, eg when an export's format changes
+MANIFEST_VERSION = 1
+
+
+def frame_digest(df):
+    """
+    Content hash of a DataFrame, its column names, dtypes, index and values, eg 'a3f0...'.
+    Equal frames have equal digests across processes and runs.
+    """
+    import pandas as pd
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode())
+    try:
+        hashes = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        # cells holding lists, eg the registers of a Modbus mapping, are hashed by their text
+        hashes = pd.util.hash_pandas_object(df.astype(str), index=True)
+    digest.update(hashes.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ExportManifest:
+    def __init__(self, path, source=None):
+        """
+        Args:
+            path (str): The manifest file, a JSON file created on save. A missing, unreadable or
+                outdated manifest is treated as empty, so every export is written.
+            source (str, optional): The .ffp file the exports are written from, recorded resolved
+                with each export so an export of another file is never taken as unchanged.
+        """
+        self.path = path
+        self.source = None if source is None else os.path.realpath(source)
+        self.entries = self._load()
+        # entries recorded by this manifest, applied over the entries on disk when saved
+        self._recorded = {}
+
+    def _load(self):
+        """the entries of the manifest file, {} if it is missing, unreadable or outdated"""
+        try:
+            with open(self.path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest["exports"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def digests(self, tables, **options):
+        """
+        {name: digest} of a dict of DataFrames, see frame_digest. Options changing how the tables are
+        written, eg as_table=True, are added under the name 'options'.
+        """
+        digests = {str(name): frame_digest(df) for name, df in tables.items()}
+        if options:
+            digests["options"] = repr(sorted(options.items()))
+        return digests
+
+    def _key(self, filepath):
+        """the manifest entry of a file, its name relative to the manifest"""
+        return os.path.relpath(filepath, os.path.dirname(os.path.abspath(self.path)))
+
+    def unchanged(self, filepath, digests):
+        """True if filepath was recorded with these digests and has not been modified since"""
+        entry = self.entries.get(self._key(filepath))
+        if entry is None or entry["tables"] != digests or entry.get("source") != self.source:
+            return False
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def record(self, filepath, digests):
+        """record that filepath was written from tables with these digests"""
+        stat = os.stat(filepath)
+        entry = {
+            "tables": digests,
+            "source": self.source,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        self.entries[self._key(filepath)] = entry
+        self._recorded[self._key(filepath)] = entry
+
+    def save(self):
+        """
+        write the entries recorded over those now on disk, so exports recorded by another process
+        since this manifest was loaded are kept, to a temporary file that then replaces the manifest
+        """
+        self.entries = {**self._load(), **self._recorded}
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "exports": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
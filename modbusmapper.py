@@ -1,8 +1,36 @@
-import pandas as pd
-import numpy as np
+from .instrumentation import Stats
 
 
 class ModbusMapper:
+    # Register layout of each object type, as implemented by the add_*_modbus_mapping methods.
+    # blocks are (gateway, first number, last number, first holding register), objects outside every
+    # block have no register. per_register objects share a register, using bits bits each.
+    # Devices are numbered within their loop, the blocks are by loop number with 32 registers per loop.
+    REGISTER_LAYOUT = {
+        "zones": {
+            "blocks": [(1, 1, 1000, 6002), (2, 1001, 2000, 12352), (3, 2001, 2500, 18702)],
+            "per_register": 4,
+            "bits": 4,
+        },
+        "loops": {
+            "blocks": [(1, 1, 90, 152), (2, 91, 180, 6502), (3, 181, 250, 12852)],
+            "per_register": 2,
+            "bits": 8,
+        },
+        "nodes": {
+            "blocks": [(1, 1, 100, 102)],
+            "per_register": 4,
+            "bits": 4,
+        },
+        "devices": {
+            "blocks": [(1, 1, 90, 242), (2, 91, 180, 6592), (3, 181, 250, 12942)],
+            "per_register": 4,
+            "bits": 4,
+            "registers_per_loop": 32,
+            "devices_per_loop": 128,
+        },
+    }
+
     _ZONE_COLNAME = "zone"
     _LOOP_COLNAME = "loop"
     _DEVICE_COLNAME = "device"
@@ -74,6 +102,11 @@ class ModbusMapper:
                                             each mapping to a DataFrame.
             nodes, zones, loops, devices (pd.DataFrame, optional): Individual DataFrames can be provided directly.
         """
+        import pandas as pd
+
+        # stage timings and row counters, see instrumentation.Stats
+        self.stats = Stats("modbusmapper")
+
         # Start with empty DataFrames
         self._nodes = pd.DataFrame()
         self._zones = pd.DataFrame()
@@ -103,6 +136,8 @@ class ModbusMapper:
 
     @zones.setter
     def zones(self, value):
+        import pandas as pd
+
         self._zones = value if value is not None else pd.DataFrame()
         if not self._zones.empty:
             self.add_zone_modbus_mapping()
@@ -113,6 +148,8 @@ class ModbusMapper:
 
     @nodes.setter
     def nodes(self, value):
+        import pandas as pd
+
         self._nodes = value if value is not None else pd.DataFrame()
         if not self._nodes.empty:
             self.add_node_modbus_mapping()
@@ -123,6 +160,8 @@ class ModbusMapper:
 
     @loops.setter
     def loops(self, value):
+        import pandas as pd
+
         self._loops = value if value is not None else pd.DataFrame()
         if not self._loops.empty:
             self.add_loop_modbus_mapping()
@@ -133,6 +172,8 @@ class ModbusMapper:
 
     @devices.setter
     def devices(self, value):
+        import pandas as pd
+
         self._devices = value if value is not None else pd.DataFrame()
         if not self._devices.empty:
             self.add_device_modbus_mapping()
@@ -162,6 +203,8 @@ class ModbusMapper:
         Returns:
             pd.DataFrame: A copy of the input DataFrame with added Modbus mapping columns.
         """
+        import pandas as pd
+
         if df is None or df.empty:
             return df
         df = df.copy()
@@ -198,12 +241,39 @@ class ModbusMapper:
         return df
 
     def _is_notnull(self, x):
+        import numpy as np
+        import pandas as pd
+
         if isinstance(x, (list, tuple, np.ndarray)):
             # True if at least one element is not null
             return any(pd.notnull(e) for e in x)
         else:
             return pd.notnull(x)
 
+    def _gateway_and_register(self, table, number, device=None):
+        """
+        (gateway, holding register) of object number of a table from REGISTER_LAYOUT, (None, None)
+        outside every block. Devices are numbered by loop, with device their number within it.
+        """
+        layout = self.REGISTER_LAYOUT[table]
+        for gateway, first, last, first_register in layout["blocks"]:
+            if first <= number <= last:
+                if device is None:
+                    return gateway, first_register + (number - first) // layout["per_register"]
+                return (
+                    gateway,
+                    first_register
+                    + (number - first) * layout["registers_per_loop"]
+                    + (device - 1) // layout["per_register"],
+                )
+        return None, None
+
+    def _first_bit(self, table, number):
+        """offset of the first status bit of object number of a table within its register"""
+        layout = self.REGISTER_LAYOUT[table]
+        # rows of an all-numeric devices frame come as floats once the float gateway column is added
+        return int((number - 1) % layout["per_register"]) * layout["bits"]
+
     def add_zone_modbus_mapping(self):
         """
         Adds Modbus mapping columns to the zones DataFrame:
@@ -233,43 +303,26 @@ class ModbusMapper:
             return
 
         def get_gateway_and_register(zone_num):
-            # Gateway 1: zones 1-1000, registers 6002-6251
-            if 1 <= zone_num <= 1000:
-                gateway = 1
-                reg_base = 6002
-                reg = reg_base + ((zone_num - 1) // 4)
-            # Gateway 2: zones 1001-2000, registers 12352-12601
-            elif 1001 <= zone_num <= 2000:
-                gateway = 2
-                reg_base = 12352
-                reg = reg_base + ((zone_num - 1001) // 4)
-            # Gateway 3: zones 2001-2500, registers 18702-18826
-            elif 2001 <= zone_num <= 2500:
-                gateway = 3
-                reg_base = 18702
-                reg = reg_base + ((zone_num - 2001) // 4)
-            else:
-                gateway = None
-                reg = None
-            return gateway, reg
+            return self._gateway_and_register("zones", zone_num)
 
         def get_bit_offsets(zone_num):
-            # Each register holds 4 zones, each zone uses 4 bits
-            offset = ((zone_num - 1) % 4) * 4
+            offset = self._first_bit("zones", zone_num)
             return offset, offset + 1, offset + 2, offset + 3
 
-        self._zones = self._add_modbus_mapping(
-            self._zones,
-            self._ZONE_COLNAME,
-            get_gateway_and_register,
-            get_bit_offsets,
-            [
-                self._ALARM_BIT_OFFSET_COLNAME,
-                self._PREALARM_BIT_OFFSET_COLNAME,
-                self._FAULT_BIT_OFFSET_COLNAME,
-                self._ISOLATE_BIT_OFFSET_COLNAME,
-            ],
-        )
+        with self.stats.timer("map_zones"):
+            self._zones = self._add_modbus_mapping(
+                self._zones,
+                self._ZONE_COLNAME,
+                get_gateway_and_register,
+                get_bit_offsets,
+                [
+                    self._ALARM_BIT_OFFSET_COLNAME,
+                    self._PREALARM_BIT_OFFSET_COLNAME,
+                    self._FAULT_BIT_OFFSET_COLNAME,
+                    self._ISOLATE_BIT_OFFSET_COLNAME,
+                ],
+            )
+        self.stats.set("zones_rows", len(self._zones))
 
     def add_loop_modbus_mapping(self):
         """
@@ -301,29 +354,10 @@ class ModbusMapper:
             return
 
         def get_gateway_and_register(loop_num):
-            # Gateway 1: loops 1-90, registers 152-196
-            if 1 <= loop_num <= 90:
-                gateway = 1
-                reg_base = 152
-                reg = reg_base + ((loop_num - 1) // 2)
-            # Gateway 2: loops 91-180, registers 6502-6546
-            elif 91 <= loop_num <= 180:
-                gateway = 2
-                reg_base = 6502
-                reg = reg_base + ((loop_num - 91) // 2)
-            # Gateway 3: loops 181-250, registers 12852-12886
-            elif 181 <= loop_num <= 250:
-                gateway = 3
-                reg_base = 12852
-                reg = reg_base + ((loop_num - 181) // 2)
-            else:
-                gateway = None
-                reg = None
-            return gateway, reg
+            return self._gateway_and_register("loops", loop_num)
 
         def get_bit_offsets(loop_num):
-            # Each register holds 2 loops, each loop uses 8 bits
-            offset = ((loop_num - 1) % 2) * 8
+            offset = self._first_bit("loops", loop_num)
             # Bit mapping for each loop
             return (
                 offset,  # open circuit
@@ -335,21 +369,23 @@ class ModbusMapper:
                 offset + 5,  # loop module fault
             )
 
-        self._loops = self._add_modbus_mapping(
-            self._loops,
-            self._LOOP_COLNAME,
-            get_gateway_and_register,
-            get_bit_offsets,
-            [
-                "open_circuit_bit_offset",
-                "short_circuit_a_bit_offset",
-                "short_circuit_b_bit_offset",
-                "loop_down_bit_offset",
-                "over_current_bit_offset",
-                "non_configured_bit_offset",
-                "loop_module_fault_bit_offset",
-            ],
-        )
+        with self.stats.timer("map_loops"):
+            self._loops = self._add_modbus_mapping(
+                self._loops,
+                self._LOOP_COLNAME,
+                get_gateway_and_register,
+                get_bit_offsets,
+                [
+                    "open_circuit_bit_offset",
+                    "short_circuit_a_bit_offset",
+                    "short_circuit_b_bit_offset",
+                    "loop_down_bit_offset",
+                    "over_current_bit_offset",
+                    "non_configured_bit_offset",
+                    "loop_module_fault_bit_offset",
+                ],
+            )
+        self.stats.set("loops_rows", len(self._loops))
 
     def add_node_modbus_mapping(self):
         """
@@ -373,33 +409,26 @@ class ModbusMapper:
             return
 
         def get_gateway_and_register(node_num):
-            # Gateway 1: nodes 1-100, registers 102-126
-            if 1 <= node_num <= 100:
-                gateway = 1
-                reg_base = 102
-                reg = reg_base + ((node_num - 1) // 4)
-            else:
-                gateway = None
-                reg = None
-            return gateway, reg
+            return self._gateway_and_register("nodes", node_num)
 
         def get_bit_offsets(node_num):
-            # Each register holds 4 nodes, each node uses 4 bits
-            offset = ((node_num - 1) % 4) * 4
+            offset = self._first_bit("nodes", node_num)
             # Bit 1 is not used
             return offset, offset + 2, offset + 3
 
-        self._nodes = self._add_modbus_mapping(
-            self._nodes,
-            self._NODE_COLNAME,
-            get_gateway_and_register,
-            get_bit_offsets,
-            [
-                self._ALARM_BIT_OFFSET_COLNAME,
-                self._FAULT_BIT_OFFSET_COLNAME,
-                self._ISOLATE_BIT_OFFSET_COLNAME,
-            ],
-        )
+        with self.stats.timer("map_nodes"):
+            self._nodes = self._add_modbus_mapping(
+                self._nodes,
+                self._NODE_COLNAME,
+                get_gateway_and_register,
+                get_bit_offsets,
+                [
+                    self._ALARM_BIT_OFFSET_COLNAME,
+                    self._FAULT_BIT_OFFSET_COLNAME,
+                    self._ISOLATE_BIT_OFFSET_COLNAME,
+                ],
+            )
+        self.stats.set("nodes_rows", len(self._nodes))
 
     def add_device_modbus_mapping(self):
         """
@@ -421,50 +450,29 @@ class ModbusMapper:
             return
 
         def get_gateway_and_register(row):
-            loop = row[self._LOOP_COLNAME]
-            device = row[self._DEVICE_COLNAME]
-
-            # Which device block within the loop
-            register_offset_in_loop = (device - 1) // 4
-            loop_offset = None
-            reg_base = None
-
-            if 1 <= loop <= 90:
-                gateway = 1
-                loop_offset = loop - 1
-                reg_base = 242
-            elif 91 <= loop <= 180:
-                gateway = 2
-                loop_offset = loop - 91
-                reg_base = 6592
-            elif 181 <= loop <= 250:
-                gateway = 3
-                loop_offset = loop - 181
-                reg_base = 12942
-            else:
-                return None, None
-
-            # Each loop uses 32 registers
-            reg = reg_base + (loop_offset * 32) + register_offset_in_loop
-            return gateway, reg
+            return self._gateway_and_register(
+                "devices", row[self._LOOP_COLNAME], device=row[self._DEVICE_COLNAME]
+            )
 
         def get_bit_offsets(row):
-            device = row[self._DEVICE_COLNAME]
-            offset = ((device - 1) % 4) * 4  # 4 bits per device
+            # the bits of a device are placed by its number within its loop
+            offset = self._first_bit("devices", row[self._DEVICE_COLNAME])
             return offset, offset + 1, offset + 2, offset + 3
 
-        self._devices = self._add_modbus_mapping(
-            self._devices,
-            id_col=None,  # not using a single ID column; pass row in lambda
-            gateway_reg_func=lambda row: get_gateway_and_register(row),
-            bit_offset_func=lambda row: get_bit_offsets(row),
-            bit_offset_cols=[
-                self._ALARM_BIT_OFFSET_COLNAME,
-                self._PREALARM_BIT_OFFSET_COLNAME,
-                self._FAULT_BIT_OFFSET_COLNAME,
-                self._ISOLATE_BIT_OFFSET_COLNAME,
-            ],
-        )
+        with self.stats.timer("map_devices"):
+            self._devices = self._add_modbus_mapping(
+                self._devices,
+                id_col=None,  # not using a single ID column; pass row in lambda
+                gateway_reg_func=lambda row: get_gateway_and_register(row),
+                bit_offset_func=lambda row: get_bit_offsets(row),
+                bit_offset_cols=[
+                    self._ALARM_BIT_OFFSET_COLNAME,
+                    self._PREALARM_BIT_OFFSET_COLNAME,
+                    self._FAULT_BIT_OFFSET_COLNAME,
+                    self._ISOLATE_BIT_OFFSET_COLNAME,
+                ],
+            )
+        self.stats.set("devices_rows", len(self._devices))
 
     def split_by_modbus_gateway(self, equipment_type="devices"):
         """
@@ -502,62 +510,36 @@ class ModbusMapper:
             - For "nodes", no splitting is performed; all nodes are assigned to Gateway 1.
             - If an invalid `equipment_type` is provided, an empty list is returned.
         """
-        if equipment_type == "devices" or equipment_type == "loops":
-            if equipment_type == "loops":
-                df = self.loops.copy()
-            else:
-                df = self.devices.copy()
-            # Split the DataFrame
-            df1 = df[df["loop"] <= 90]
-            df2 = df[(df["loop"] > 90) & (df["loop"] <= 180)]
-            df3 = df[df["loop"] > 180]
-
-            # Create a list of dictionaries
-            data = [
-                {
-                    "gateway": 1,
-                    "description": equipment_type + "_L1_to_L90",
-                    "data": df1,
-                },
-                {
-                    "gateway": 2,
-                    "description": equipment_type + "_L91_to_L180",
-                    "data": df2,
-                },
-                {
-                    "gateway": 3,
-                    "description": equipment_type + "_L181_to_L250",
-                    "data": df3,
-                },
-            ]
-        elif equipment_type == "nodes":
+        with self.stats.timer(f"split_{equipment_type}"):
+            return self._split_by_modbus_gateway(equipment_type)
+
+    def _split_by_modbus_gateway(self, equipment_type):
+        """see split_by_modbus_gateway"""
+        if equipment_type == "nodes":
             return [{"gateway": 1, "description": equipment_type, "data": self.nodes}]
+        if equipment_type in ("devices", "loops"):
+            column, prefix = "loop", "L"
         elif equipment_type == "zones":
-            df = self.zones.copy()
-            # Split the DataFrame
-            df1 = df[df[self._ZONE_COLNAME] <= 1000]
-            df2 = df[(df[self._ZONE_COLNAME] > 1001) & (df[self._ZONE_COLNAME] <= 2000)]
-            df3 = df[df[self._ZONE_COLNAME] > 2000]
-            return [
-                {
-                    "gateway": 1,
-                    "description": equipment_type + "_Z1_to_Z1000",
-                    "data": df1,
-                },
-                {
-                    "gateway": 2,
-                    "description": equipment_type + "_Z1001_to_Z2000",
-                    "data": df2,
-                },
-                {
-                    "gateway": 3,
-                    "description": equipment_type + "_Z2001_to_Z2500",
-                    "data": df3,
-                },
-            ]
+            column, prefix = self._ZONE_COLNAME, "Z"
         else:
             return []
-
+        df = getattr(self, equipment_type).copy()
+        # one frame per gateway block, the first and last blocks also take the numbers below and above
+        blocks = self.REGISTER_LAYOUT[equipment_type]["blocks"]
+        data = []
+        for position, (gateway, first, last, _) in enumerate(blocks):
+            inside = df[column].notna()
+            if position > 0:
+                inside &= df[column] > blocks[position - 1][2]
+            if position < len(blocks) - 1:
+                inside &= df[column] <= last
+            data.append(
+                {
+                    "gateway": gateway,
+                    "description": f"{equipment_type}_{prefix}{first}_to_{prefix}{last}",
+                    "data": df[inside],
+                }
+            )
         return data
 
     def calculate_register_decimal(self, *bit_offsets):
@@ -595,11 +577,12 @@ class ModbusMapper:
                 )
         return value
 
-    def extend_with_all_bit_decimals(self, df: pd.DataFrame) -> pd.DataFrame:
+    def extend_with_all_bit_decimals(self, df: "pd.DataFrame") -> "pd.DataFrame":
         """
         Extend the DataFrame by computing and adding decimal values
         for all *_BIT_OFFSET columns in the register layout.
         """
+        import pandas as pd
 
         def normalize_to_bit_list(offsets):
             if pd.isna(offsets):
@@ -633,8 +616,8 @@ class ModbusMapper:
 
 
 if __name__ == "__main__":
-    from ffpreader import FFPReader
-    from utils import write_dfs_to_excel_and_format
+    from .ffpreader import FFPReader
+    from .utils import write_dfs_to_excel_and_format
     import os
 
     input_dir = "./data/input"
@@ -0,0 +1,146 @@
+"""
+Parse the naming convention of the descriptions of devices, zones and nodes into structured location
+columns, eg the device description 'IRD-ICG-L05M-FCG-01 MGF OVERFLOW' is system IRD, building ICG,
+level L05M, room FCG, number 01 and text 'MGF OVERFLOW'.
+
+Each table's descriptions are matched against one precompiled regex whose named groups become the
+columns, in a single vectorized str.extract. The system, building and level columns are categorical,
+so grouping and filtering by location are integer operations on the category codes.
+
+    locations = FFPReader("site.ffp").locations
+    locations.devices                                   # cleaned devices with the location columns
+    locations.on_level("L05M", building="ICG")          # devices of one level
+    locations.rollup("devices", by=["building", "level"])
+"""
+import re
+
+# regex per table with named groups for the location parts, override per reader with the
+# 'naming_patterns' cleaning rule, see FFPReader.DEFAULT_CLEANING_RULES
+DEFAULT_NAMING_PATTERNS = {
+    # eg 'IRD-ICG-L05M-FCG-01 MGF OVERFLOW'
+    "devices": (
+        r"^(?P<system>[A-Z]+)-(?P<building>[A-Z0-9]+)-(?P<level>[LB][A-Z0-9]*)-(?P<room>[A-Z0-9]+)"
+        r"-(?P<number>[0-9]+)\s*(?P<text>.*)$"
+    ),
+    # eg 'TOWER 4 LEVEL 36 NORTH'
+    "zones": r"^(?P<building>.+?)\s+(?P<level>(?:LEVEL|BASEMENT)\s*[0-9]+M?)\b\s*(?P<text>.*)$",
+    # eg 'MASD-FIP-ICG-L02-01 T4 L02 MFIP'
+    "nodes": (
+        r"^(?P<system>[A-Z]+)-(?P<panel>[A-Z]+)-(?P<building>[A-Z0-9]+)-(?P<level>[LB][A-Z0-9]*)"
+        r"-(?P<number>[0-9]+)\s*(?P<text>.*)$"
+    ),
+}
+# replacements applied in order to the level column of every table so the levels of the tables
+# compare equal, eg 'LEVEL 5M' becomes 'L05M' and 'BASEMENT 3' becomes 'B03'
+LEVEL_REPLACEMENTS = [
+    (r"^LEVEL\s*", "L"),
+    (r"^BASEMENT\s*", "B"),
+    (r"^([LB])([0-9])(?![0-9])", r"\g<1>0\g<2>"),
+]
+# location columns stored as categoricals
+_CATEGORICAL_COLUMNS = ("system", "panel", "building", "level")
+# columns of each table kept alongside the location columns
+_TABLE_COLUMNS = {
+    "devices": ["loop", "device", "zone", "description", "type"],
+    "zones": ["zone", "description"],
+    "nodes": ["node", "description"],
+}
+
+_compiled = {}
+
+
+def compile_pattern(pattern):
+    """the compiled regex of a pattern, compiled once per pattern"""
+    if pattern not in _compiled:
+        _compiled[pattern] = re.compile(pattern)
+    return _compiled[pattern]
+
+
+def parse_names(descriptions, pattern, level_replacements=LEVEL_REPLACEMENTS):
+    """
+    Split descriptions into the named groups of a regex.
+
+    Args:
+        descriptions (pd.Series): The descriptions to parse.
+        pattern (str): Regex with a named group per column, see DEFAULT_NAMING_PATTERNS.
+        level_replacements (list, optional): (regex, replacement) pairs applied to a 'level' group.
+    Returns:
+        pd.DataFrame: One column per named group, aligned with descriptions. The columns are empty
+            (NaN) for descriptions not following the pattern. The system, panel, building and level
+            columns are categorical, eg
+                system  building  level  room  number  text
+                IRD     ICG       L05M   FCG   01      MGF OVERFLOW
+    """
+    regex = compile_pattern(pattern)
+    df = descriptions.fillna("").astype(str).str.strip().str.extract(regex, expand=True)
+    if "level" in df.columns:
+        for level_pattern, replacement in level_replacements:
+            df["level"] = df["level"].str.replace(compile_pattern(level_pattern), replacement, regex=True)
+    for column in _CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+class Locations:
+    """
+    The cleaned devices, zones and nodes of an FFPReader with the location columns parsed from their
+    descriptions (see parse_names), and an index of the device rows of each building and level, see
+    FFPReader.locations.
+    """
+
+    def __init__(self, reader, patterns=None):
+        """
+        Args:
+            reader (FFPReader): The configuration, its cleaned devices and zones and its nodes are parsed.
+            patterns (dict, optional): Overrides of DEFAULT_NAMING_PATTERNS by table.
+        """
+        self.patterns = {**DEFAULT_NAMING_PATTERNS, **(patterns or {})}
+        tables = {
+            "devices": reader.cleaned_devices,
+            "zones": reader.cleaned_zones,
+            "nodes": reader.nodes,
+        }
+        self.devices = self.zones = self.nodes = None
+        for table, df in tables.items():
+            if df is None:
+                continue
+            df = df[[c for c in _TABLE_COLUMNS[table] if c in df.columns]].reset_index(drop=True)
+            setattr(self, table, df.join(parse_names(df["description"], self.patterns[table])))
+
+        # (building, level) -> row positions in devices
+        self.level_index = {}
+        if self.devices is not None and {"building", "level"} <= set(self.devices.columns):
+            self.level_index = self.devices.groupby(["building", "level"], observed=True).indices
+
+    def on_level(self, level, building=None):
+        """the devices of a level, of every building or of one"""
+        import numpy as np
+
+        rows = [
+            positions
+            for (row_building, row_level), positions in self.level_index.items()
+            if row_level == level and (building is None or row_building == building)
+        ]
+        rows = np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp)
+        return self.devices.iloc[rows]
+
+    def unmatched(self, table="devices"):
+        """the rows of a table whose description does not follow the naming pattern"""
+        df = getattr(self, table)
+        return df[df["text"].isna()]
+
+    def rollup(self, table="devices", by=("building", "level")):
+        """
+        Number of rows of a table per combination of location columns, eg
+            building  level  count
+            ICG       L05M   212
+        """
+        df = getattr(self, table)
+        if df is None:
+            raise ValueError(f"Locations were built without the {table} table.")
+        by = list(by)
+        missing = [column for column in by if column not in df.columns]
+        if missing:
+            raise ValueError(f"The {table} naming pattern has no {missing} groups.")
+        return df.groupby(by, observed=True).size().rename("count").reset_index()
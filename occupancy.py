@@ -0,0 +1,301 @@
+from .modbusmapper import ModbusMapper
+
+
+def _configured(df, placeholders):
+    """mask of the rows of a zones/devices frame whose description is not a placeholder"""
+    return ~df["description"].fillna("").str.strip().isin(placeholders)
+
+
+def _bit_positions(words):
+    """the 0-based positions of the set bits of a uint64 word array, bit 0 of word 0 first"""
+    import numpy as np
+
+    bits = np.unpackbits(words.astype("<u8").view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits)
+
+
+def _device_loop_rows(devices, loops):
+    """
+    The position in loops of the loop info section each device row belongs to, -1 where unknown.
+
+    Device rows are in file order with the addresses of each loop section numbered from 1, so a new
+    section starts where the device number does not increase or the loop changes. The n-th section
+    with a loop number is matched to the n-th loop info section with that number, so loops whose
+    number is used on more than one node (see validation, 'duplicate_loop') keep their own rows.
+    """
+    import numpy as np
+    import pandas as pd
+
+    loop = pd.to_numeric(devices["loop"], errors="coerce").to_numpy(dtype=float)
+    device = pd.to_numeric(devices["device"], errors="coerce").to_numpy(dtype=float)
+    starts = np.ones(len(devices), dtype=bool)
+    if len(devices):
+        starts[1:] = (device[1:] <= device[:-1]) | (loop[1:] != loop[:-1])
+    section = np.cumsum(starts) - 1
+    sections = pd.DataFrame({"loop": loop[starts]})
+    sections["occurrence"] = sections.groupby("loop").cumcount()
+    slots = pd.DataFrame({"loop": loops["loop"].to_numpy(dtype=float)})
+    slots["occurrence"] = slots.groupby("loop").cumcount()
+    slots["row"] = np.arange(len(slots))
+    rows = sections.merge(slots, on=["loop", "occurrence"], how="left")["row"]
+    return rows.fillna(-1).to_numpy(dtype=np.int64)[section]
+
+
+class Occupancy:
+    """
+    Occupancy bitmaps of the device addresses of every loop (128 bits per loop) and of the zones, built
+    from the configured rows (description not a placeholder) of an FFPReader's tables, see
+    FFPReader.occupancy. Lookups, free-address searches and comparisons between revisions are bitwise
+    operations on the bitmaps instead of filters over the DataFrames.
+
+    Each loop info section of the loops table has its own bitmap, keyed by (node, loop), so every loop
+    is counted, including loops without devices and loop numbers used on more than one node. Loops are
+    looked up by number, with the node as well when the number is used on more than one node.
+
+        occupancy = FFPReader("site.ffp").occupancy
+        occupancy.free_addresses(12, count=4)       # array([91, 92, 93, 94])
+        occupancy.free_run(12, 8)                   # first of 8 consecutive free addresses on loop 12
+        occupancy.node_stats()                      # loops, used and free addresses per node
+        occupancy.compare(FFPReader("site rev 2.ffp").occupancy)   # added, removed and moved devices
+    """
+
+    DEVICES_PER_LOOP = ModbusMapper.REGISTER_LAYOUT["devices"]["devices_per_loop"]
+    ZONES = 5000
+    _WORD_BITS = 64
+
+    def __init__(self, devices, zones=None, loops=None, placeholders=("", "Unassigned Text", "SPARE")):
+        """
+        Args:
+            devices (pd.DataFrame): FFPReader.devices, in file order. Devices without a loop or
+                outside the 1 to DEVICES_PER_LOOP address range are left out.
+            zones (pd.DataFrame, optional): FFPReader.zones, for the zone bitmap.
+            loops (pd.DataFrame, optional): FFPReader.loops, the loops and their nodes. Without it
+                there is one loop per loop number of the devices, without a node.
+            placeholders (list[str], optional): Descriptions of empty addresses, see
+                FFPReader.DEFAULT_CLEANING_RULES['placeholder_descriptions'].
+        """
+        import numpy as np
+        import pandas as pd
+
+        # the loops, one row and bitmap per loop info section, and the row of each device's loop
+        if loops is not None:
+            self.loops = loops[["node", "loop"]].astype("Int64").reset_index(drop=True)
+            self._row_loops = _device_loop_rows(devices, loops)
+        else:
+            loop = pd.to_numeric(devices["loop"], errors="coerce")
+            numbers = pd.Index(np.unique(loop.dropna().to_numpy(dtype=np.int64)))
+            self.loops = pd.DataFrame(
+                {"node": pd.array([pd.NA] * len(numbers), dtype="Int64"), "loop": pd.array(numbers, dtype="Int64")}
+            )
+            self._row_loops = numbers.get_indexer(loop.fillna(-1).to_numpy(dtype=np.int64))
+        # nth occurrence of each (node, loop), to align the loops of two revisions in compare
+        self.loops["occurrence"] = self.loops.groupby(["node", "loop"], dropna=False).cumcount()
+
+        self._configured_rows = _configured(devices, placeholders).to_numpy() & (self._row_loops >= 0)
+        device_numbers = pd.to_numeric(devices["device"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+        in_range = (device_numbers >= 1) & (device_numbers <= self.DEVICES_PER_LOOP)
+        used = self._configured_rows & in_range
+        row = self._row_loops[used]
+        device = device_numbers[used] - 1
+        # devices[i] holds the bits of addresses 1-128 of the loop in row i of self.loops
+        self.devices = np.zeros((len(self.loops), self.DEVICES_PER_LOOP // self._WORD_BITS), dtype=np.uint64)
+        np.bitwise_or.at(
+            self.devices,
+            (row, device // self._WORD_BITS),
+            np.left_shift(np.uint64(1), (device % self._WORD_BITS).astype(np.uint64)),
+        )
+        # description of each configured address, for matching moved devices in compare
+        self._descriptions = (
+            pd.DataFrame(
+                {"row": row, "device": device + 1, "description": devices["description"].to_numpy()[used]}
+            )
+            .drop_duplicates(["row", "device"])
+            .set_index(["row", "device"])["description"]
+            .str.strip()
+        )
+
+        self.zones = None
+        if zones is not None:
+            configured_zones = zones[_configured(zones, placeholders) & (zones["zone"] > 0)]
+            number = configured_zones["zone"].to_numpy(dtype=np.int64)
+            size = max(self.ZONES, int(number.max(initial=0)))
+            # bit z of zones is zone z, bit 0 is unused
+            self.zones = np.zeros(size // self._WORD_BITS + 1, dtype=np.uint64)
+            np.bitwise_or.at(
+                self.zones,
+                number // self._WORD_BITS,
+                np.left_shift(np.uint64(1), (number % self._WORD_BITS).astype(np.uint64)),
+            )
+            self._zone_descriptions = (
+                configured_zones.drop_duplicates("zone").set_index("zone")["description"].str.strip()
+            )
+
+    def _row(self, loop, node=None):
+        """the row of a loop in self.loops, the node is needed when the loop number is on more than one node"""
+        import numpy as np
+
+        matches = self.loops["loop"].to_numpy(dtype=float) == loop
+        if node is not None:
+            matches &= self.loops["node"].to_numpy(dtype=float, na_value=np.nan) == node
+        rows = np.flatnonzero(matches)
+        if len(rows) == 0:
+            raise ValueError(f"No loop {loop}" + (f" on node {node}." if node is not None else "."))
+        if len(rows) > 1:
+            if node is not None:
+                raise ValueError(f"Loop {loop} is defined more than once on node {node}.")
+            nodes = self.loops["node"].iloc[rows].tolist()
+            raise ValueError(f"Loop {loop} is on more than one node {nodes}, give the node.")
+        return int(rows[0])
+
+    def count_by_loop(self, mask):
+        """number of the device rows selected by a bool mask in each loop, aligned with self.loops"""
+        import numpy as np
+
+        rows = self._row_loops[np.asarray(mask, dtype=bool) & (self._row_loops >= 0)]
+        return np.bincount(rows, minlength=len(self.loops))
+
+    def is_used(self, loop, device, node=None):
+        """whether an address is configured"""
+        word, bit = divmod(device - 1, self._WORD_BITS)
+        return bool((int(self.devices[self._row(loop, node), word]) >> bit) & 1)
+
+    def used_addresses(self, loop, node=None):
+        """the configured addresses of a loop, eg array([1, 2, 3, 5])"""
+        return _bit_positions(self.devices[self._row(loop, node)]) + 1
+
+    def free_addresses(self, loop, count=None, node=None):
+        """the free addresses of a loop in order, the first count only when given"""
+        free = _bit_positions(~self.devices[self._row(loop, node)]) + 1
+        return free if count is None else free[:count]
+
+    def free_run(self, loop, length, node=None):
+        """the first address of the first run of length consecutive free addresses on a loop, or None"""
+        import numpy as np
+
+        words = ~self.devices[self._row(loop, node)]
+        free = np.unpackbits(words.astype("<u8").view(np.uint8), bitorder="little")
+        # windows[i] counts the free addresses in the window starting at address i + 1
+        windows = np.convolve(free, np.ones(length, dtype=np.int64), mode="valid")
+        starts = np.flatnonzero(windows == length)
+        return int(starts[0]) + 1 if len(starts) else None
+
+    def free_zones(self, count=None):
+        """the zone numbers (1 to ZONES) without a configured zone, the first count only when given"""
+        if self.zones is None:
+            raise ValueError("Occupancy was built without the zones table.")
+        free = _bit_positions(~self.zones)
+        free = free[(free >= 1) & (free <= self.ZONES)]
+        return free if count is None else free[:count]
+
+    def loop_stats(self):
+        """used and free addresses of every loop, including those without devices, columns node, loop, used, free"""
+        import numpy as np
+
+        used = np.bitwise_count(self.devices).sum(axis=1).astype(np.int64)
+        df = self.loops[["node", "loop"]].copy()
+        df["used"] = used
+        df["free"] = self.DEVICES_PER_LOOP - used
+        return df
+
+    def node_stats(self):
+        """loops, used and free addresses and the fraction used per node, for loops with a node"""
+        df = (
+            self.loop_stats()
+            .dropna(subset=["node"])
+            .groupby("node")
+            .agg(loops=("loop", "size"), used=("used", "sum"), free=("free", "sum"))
+            .reset_index()
+        )
+        df["occupancy"] = df["used"] / (df["used"] + df["free"])
+        return df
+
+    def compare(self, other):
+        """
+        Compare the device addresses of two revisions, self being the old one. Loops are matched by
+        (node, loop). Addresses configured only in other are added, only in self removed. A removed and
+        an added address with the same description, each the only one with it, are reported as one
+        moved device instead.
+
+        Returns:
+            pd.DataFrame: Columns change ('added', 'removed' or 'moved'), node, loop, device,
+                description, from_node, from_loop and from_device (the old address of moved devices), eg
+                change  node  loop  device  description                       from_node  from_loop  from_device
+                moved   9     12    91      IRD-ICG-L05M-FCG-01 MGF OVERFLOW  9          12         90
+        """
+        import numpy as np
+        import pandas as pd
+
+        # the loops of both revisions, with the bitmap row of each in self and other (-1 if absent)
+        keys = ["node", "loop", "occurrence"]
+        aligned = self.loops[keys].assign(old=np.arange(len(self.loops))).merge(
+            other.loops[keys].assign(new=np.arange(len(other.loops))), on=keys, how="outer"
+        )
+        old_rows = aligned["old"].fillna(-1).to_numpy(dtype=np.int64)
+        new_rows = aligned["new"].fillna(-1).to_numpy(dtype=np.int64)
+        empty = np.zeros((1, self.devices.shape[1]), dtype=np.uint64)
+        old = np.concatenate([self.devices, empty])[old_rows]
+        new = np.concatenate([other.devices, empty])[new_rows]
+
+        def addresses(words, rows, descriptions):
+            loop_position, position = divmod(_bit_positions(words.ravel()), self.DEVICES_PER_LOOP)
+            index = pd.MultiIndex.from_arrays([rows[loop_position], position + 1], names=["row", "device"])
+            return pd.DataFrame(
+                {
+                    "node": aligned["node"].to_numpy()[loop_position],
+                    "loop": aligned["loop"].to_numpy()[loop_position],
+                    "device": position + 1,
+                    "description": descriptions.reindex(index).to_numpy(),
+                }
+            )
+
+        added = addresses(new & ~old, new_rows, other._descriptions)
+        removed = addresses(old & ~new, old_rows, self._descriptions)
+
+        # pair up descriptions appearing exactly once among both the added and the removed addresses
+        unique_added = added.drop_duplicates("description", keep=False)
+        unique_removed = removed.drop_duplicates("description", keep=False)
+        moved = unique_added.merge(
+            unique_removed, on="description", suffixes=("", "_from")
+        ).rename(columns={"node_from": "from_node", "loop_from": "from_loop", "device_from": "from_device"})
+        moved = moved[moved["description"].fillna("") != ""]
+        added = added[~added["description"].isin(moved["description"])]
+        removed = removed[~removed["description"].isin(moved["description"])]
+
+        return pd.concat(
+            [
+                added.assign(change="added"),
+                removed.assign(change="removed"),
+                moved.assign(change="moved"),
+            ],
+            ignore_index=True,
+        ).reindex(
+            columns=["change", "node", "loop", "device", "description", "from_node", "from_loop", "from_device"]
+        ).astype(
+            {"node": "Int64", "loop": "Int64", "from_node": "Int64", "from_loop": "Int64", "from_device": "Int64"}
+        )
+
+    def compare_zones(self, other):
+        """zones configured in only one of two revisions, columns change ('added' or 'removed'), zone, description"""
+        import numpy as np
+        import pandas as pd
+
+        if self.zones is None or other.zones is None:
+            raise ValueError("Occupancy was built without the zones table.")
+        size = max(len(self.zones), len(other.zones))
+        old = np.zeros(size, dtype=np.uint64)
+        new = np.zeros(size, dtype=np.uint64)
+        old[: len(self.zones)] = self.zones
+        new[: len(other.zones)] = other.zones
+        added = _bit_positions(new & ~old)
+        removed = _bit_positions(old & ~new)
+        return pd.concat(
+            [
+                pd.DataFrame(
+                    {"change": "added", "zone": added, "description": other._zone_descriptions.reindex(added).to_numpy()}
+                ),
+                pd.DataFrame(
+                    {"change": "removed", "zone": removed, "description": self._zone_descriptions.reindex(removed).to_numpy()}
+                ),
+            ],
+            ignore_index=True,
+        )
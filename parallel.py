@@ -0,0 +1,99 @@
+"""
+Parse the sections of one .ffp file in a pool of processes, see FFPReader(workers=...).
+
+The sections to parse are split into chunks of about equal byte size. Each worker maps the file
+itself and is sent only the (start, end) byte offsets of its chunk's sections, not their text, and
+returns the parsed result of each section. Workers check the blake2b digest of each section against
+the one the reader hashed, so a file replaced or rewritten in between raises SectionsChanged instead
+of returning results for other bytes. The results are put back in file order, so the tables
+are the same as those of a serial parse.
+"""
+import hashlib
+import heapq
+from .utils import map_file, decode_span
+
+
+class SectionsChanged(ValueError):
+    """the bytes of a section read by a worker differ from those hashed by the reader"""
+
+
+def balanced_chunks(spans, chunks):
+    """
+    Split the positions of a list of (start, end) spans into at most chunks lists with about equal
+    byte totals, assigning the largest spans first to the least loaded chunk. Each list is in file
+    order, eg balanced_chunks([(0, 10), (10, 15), (15, 20)], 2) returns [[0], [1, 2]].
+    """
+    order = sorted(range(len(spans)), key=lambda i: spans[i][1] - spans[i][0], reverse=True)
+    # (bytes assigned, chunk) of each chunk, least loaded first
+    loads = [(0, chunk) for chunk in range(min(chunks, len(spans)))]
+    assigned = [[] for _ in loads]
+    for position in order:
+        size, chunk = heapq.heappop(loads)
+        assigned[chunk].append(position)
+        start, end = spans[position]
+        heapq.heappush(loads, (size + end - start, chunk))
+    return [sorted(positions) for positions in assigned if positions]
+
+
+def _parse_chunk(path, spans, digests, encoding, parse_name, state):
+    """
+    Worker: parse the sections of a file at spans with the FFPReader method parse_name, on a bare
+    reader holding only state (eg the loop number of each loop section id for device sections).
+    Raises SectionsChanged if the bytes at a span don't have the expected digest.
+    """
+    from .ffpreader import FFPReader
+
+    reader = FFPReader.__new__(FFPReader)
+    reader.__dict__.update(state)
+    parse = getattr(reader, parse_name)
+    results = []
+    with map_file(path) as buffer:
+        for (start, end), digest in zip(spans, digests):
+            if hashlib.blake2b(buffer[start:end], digest_size=16).digest() != digest:
+                raise SectionsChanged(f"'{path}' changed while it was being parsed.")
+            results.append(parse(decode_span(buffer, (start, end), encoding)))
+    return results
+
+
+def parse_spans(pool, path, spans, digests, encoding, parse_name, state=None, chunks=1):
+    """
+    Parse the sections of a file at spans in a process pool, see _parse_chunk.
+
+    Args:
+        pool (concurrent.futures.ProcessPoolExecutor): The workers.
+        path (str): The file, mapped by each worker.
+        spans (list[tuple]): (start, end) byte offsets of the sections to parse.
+        digests (list[bytes]): 16 byte blake2b digest of the bytes of each span as the reader
+            hashed them, a worker reading other bytes raises SectionsChanged.
+        encoding (str): The file's encoding, see utils.detect_encoding.
+        parse_name (str): Name of the FFPReader method parsing a section, eg '_parse_loop_device_section_to_df'.
+        state (dict, optional): Reader attributes the method needs.
+        chunks (int, optional): Number of chunks the spans are split into, see balanced_chunks.
+    Returns:
+        list: The result of each span, in the order of spans.
+    """
+    results = [None] * len(spans)
+    futures = [
+        (
+            positions,
+            pool.submit(
+                _parse_chunk,
+                path,
+                [spans[i] for i in positions],
+                [digests[i] for i in positions],
+                encoding,
+                parse_name,
+                state or {},
+            ),
+        )
+        for positions in balanced_chunks(spans, chunks)
+    ]
+    try:
+        for positions, future in futures:
+            for position, result in zip(positions, future.result()):
+                results[position] = result
+    except BaseException:
+        for _, future in futures:
+            future.cancel()
+        raise
+    return results
@@ -0,0 +1,212 @@
+"""
+Poll plans for a Modbus master reading the status registers of a configuration.
+
+A poll plan is the list of read holding registers requests (function 3) covering every register that
+carries a configured zone, node, loop or device, per gateway. Registers are coalesced into as few
+requests as possible: consecutive used registers are merged, and gaps of up to gap_tolerance unused
+registers are read through when that saves a request, each request reading at most max_registers.
+
+    reader = FFPReader("site.ffp")
+    plan = build_poll_plan(reader.cleaned_configuration, gap_tolerance=8)
+    summarize(plan), summarize(full_range_plan())   # requests and registers read, vs whole ranges
+
+    gateway  start_register  count  used_registers  objects  tables
+    1        102             7      7               26       nodes
+    1        152             45     45              90       loops
+    ...
+"""
+from .modbusmapper import ModbusMapper
+
+# most registers one read holding registers request can return, from the Modbus specification
+MAX_READ_REGISTERS = 125
+
+# columns of the poll plan DataFrames returned by plan_reads, build_poll_plan and full_range_plan
+PLAN_COLUMNS = ["gateway", "start_register", "count", "used_registers", "objects", "tables"]
+
+# column numbering the objects of each table, devices are numbered within their loop
+_NUMBER_COLNAME = {"zones": "zone", "nodes": "node", "loops": "loop", "devices": "loop"}
+
+
+def _layout_registers(df, table):
+    """
+    gateway and holding_register of each row of an unmapped zones/nodes/loops/devices frame, computed
+    from ModbusMapper.REGISTER_LAYOUT with the same arithmetic as ModbusMapper.add_*_modbus_mapping
+    """
+    import pandas as pd
+
+    layout = ModbusMapper.REGISTER_LAYOUT[table]
+    number = pd.to_numeric(df[_NUMBER_COLNAME[table]], errors="coerce")
+    registers = pd.DataFrame({"gateway": float("nan"), "holding_register": float("nan")}, index=df.index)
+    for gateway, first, last, first_register in layout["blocks"]:
+        inside = number.between(first, last)
+        if table == "devices":
+            register = (
+                first_register
+                + (number - first) * layout["registers_per_loop"]
+                + (df["device"] - 1) // layout["per_register"]
+            )
+        else:
+            register = first_register + (number - first) // layout["per_register"]
+        registers.loc[inside, "gateway"] = gateway
+        registers.loc[inside, "holding_register"] = register[inside]
+    return registers
+
+
+def configured_registers(configuration):
+    """
+    The registers carrying configured objects, one row per (gateway, holding_register) with the
+    number of objects in the register and the tables they come from, eg
+        gateway  holding_register  objects  tables
+        1        102               4        nodes
+
+    Args:
+        configuration (dict): {table: pd.DataFrame} of zones, nodes, loops and/or devices, eg
+            FFPReader.cleaned_configuration (so unconfigured zones and devices are left out) or the
+            ModbusMapper frames. Frames with gateway and holding_register columns use them, other
+            frames are mapped with ModbusMapper.REGISTER_LAYOUT. Objects without a register are dropped.
+    """
+    import pandas as pd
+
+    frames = []
+    for table in ModbusMapper.REGISTER_LAYOUT:
+        df = configuration.get(table)
+        if df is None or df.empty:
+            continue
+        if {"gateway", "holding_register"}.issubset(df.columns):
+            registers = df[["gateway", "holding_register"]]
+        else:
+            registers = _layout_registers(df, table)
+        frames.append(registers.dropna().assign(table=table))
+    if not frames:
+        return pd.DataFrame(columns=["gateway", "holding_register", "objects", "tables"])
+    registers = pd.concat(frames, ignore_index=True).astype(
+        {"gateway": int, "holding_register": int}
+    )
+    return (
+        registers.groupby(["gateway", "holding_register"], sort=True)
+        .agg(objects=("table", "size"), tables=("table", lambda tables: ",".join(sorted(set(tables)))))
+        .reset_index()
+    )
+
+
+def plan_reads(registers, max_registers=MAX_READ_REGISTERS, gap_tolerance=0):
+    """
+    Coalesce registers into read requests, per gateway in register order. A request is extended to
+    the next used register while the gap to it is at most gap_tolerance registers and the request
+    stays within max_registers, otherwise a new request starts there. Extending greedily gives the
+    fewest requests for a given gap_tolerance and max_registers.
+
+    Args:
+        registers (pd.DataFrame): Rows with gateway and holding_register columns, and optionally
+            objects and tables as returned by configured_registers.
+        max_registers (int, optional): Most registers per request, at most MAX_READ_REGISTERS.
+        gap_tolerance (int, optional): Most unused registers read between two used registers
+            to save a request.
+
+    Returns:
+        pd.DataFrame: One row per request with columns PLAN_COLUMNS, where count is the registers read
+            and used_registers those carrying configured objects.
+    """
+    import pandas as pd
+
+    if not 1 <= max_registers <= MAX_READ_REGISTERS:
+        raise ValueError(f"max_registers must be between 1 and {MAX_READ_REGISTERS}, got {max_registers}.")
+    if gap_tolerance < 0:
+        raise ValueError(f"gap_tolerance must not be negative, got {gap_tolerance}.")
+
+    registers = registers.sort_values(["gateway", "holding_register"])
+    objects = registers["objects"] if "objects" in registers.columns else pd.Series(1, index=registers.index)
+    tables = registers["tables"] if "tables" in registers.columns else pd.Series("", index=registers.index)
+
+    requests = []
+    request = None
+    for gateway, register, count, table in zip(
+        registers["gateway"], registers["holding_register"], objects, tables
+    ):
+        if (
+            request is not None
+            and request["gateway"] == gateway
+            and register - request["last"] - 1 <= gap_tolerance
+            and register - request["start_register"] < max_registers
+        ):
+            request["last"] = register
+            request["used_registers"] += 1
+            request["objects"] += count
+            request["tables"].update(table.split(","))
+            continue
+        request = {
+            "gateway": gateway,
+            "start_register": register,
+            "last": register,
+            "used_registers": 1,
+            "objects": count,
+            "tables": set(table.split(",")),
+        }
+        requests.append(request)
+
+    for request in requests:
+        request["count"] = request.pop("last") - request["start_register"] + 1
+        request["tables"] = ",".join(sorted(request["tables"] - {""}))
+    return pd.DataFrame(requests, columns=PLAN_COLUMNS)
+
+
+def build_poll_plan(configuration, max_registers=MAX_READ_REGISTERS, gap_tolerance=0):
+    """
+    The read requests covering the configured registers of a configuration, see configured_registers
+    for the configuration accepted and plan_reads for the requests returned.
+    """
+    return plan_reads(configured_registers(configuration), max_registers, gap_tolerance)
+
+
+def full_range_plan(max_registers=MAX_READ_REGISTERS):
+    """
+    The read requests covering the whole register range of every table in
+    ModbusMapper.REGISTER_LAYOUT, configured or not, ie polling whole gateway ranges. Used as the
+    baseline a poll plan is compared to, objects and used_registers count every address in the range.
+    """
+    import pandas as pd
+
+    requests = []
+    for table, layout in ModbusMapper.REGISTER_LAYOUT.items():
+        for gateway, first, last, first_register in layout["blocks"]:
+            if table == "devices":
+                registers = (last - first + 1) * layout["registers_per_loop"]
+                addresses = (last - first + 1) * layout["devices_per_loop"]
+            else:
+                registers = -(-(last - first + 1) // layout["per_register"])
+                addresses = last - first + 1
+            for start in range(0, registers, max_registers):
+                count = min(max_registers, registers - start)
+                requests.append(
+                    {
+                        "gateway": gateway,
+                        "start_register": first_register + start,
+                        "count": count,
+                        "used_registers": count,
+                        "objects": addresses * count // registers,
+                        "tables": table,
+                    }
+                )
+    return (
+        pd.DataFrame(requests, columns=PLAN_COLUMNS)
+        .sort_values(["gateway", "start_register"])
+        .reset_index(drop=True)
+    )
+
+
+def summarize(plan):
+    """
+    Totals of a poll plan, per gateway and overall, eg
+        {'requests': 42, 'registers_read': 3180, 'used_registers': 3101, 'gateways': {1: {...}, ...}}
+    """
+
+    def totals(df):
+        return {
+            "requests": len(df),
+            "registers_read": int(df["count"].sum()),
+            "used_registers": int(df["used_registers"].sum()),
+        }
+
+    summary = totals(plan)
+    summary["gateways"] = {int(gateway): totals(df) for gateway, df in plan.groupby("gateway")}
+    return summary
@@ -0,0 +1,228 @@
+import bisect
+import fnmatch
+import re
+
+# upper case alphanumeric runs of a description, eg ['IRD', 'ICG', 'L05M', 'FCG', '01', 'MGF', 'OVERFLOW']
+_TOKEN = re.compile(r"[A-Z0-9]+")
+# sorts after every character, so prefix + _MAX_CHAR bounds the strings starting with prefix
+_MAX_CHAR = "\U0010ffff"
+
+
+class ConfigurationIndex:
+    """
+    Precomputed indexes over a parsed configuration for repeated lookups, built once per parse
+    (see FFPReader.query) so each question is answered without filtering the devices DataFrame:
+
+    - zone -> device rows
+    - node -> loops -> device rows
+    - a sorted array of upper case descriptions for prefix search
+    - an inverted index of description tokens for substring search
+
+    Text search is case insensitive. Every lookup returns the matching rows of the devices
+    DataFrame in their original order, with only the COLUMNS present in it (selecting rows of
+    the ~30 raw setting columns costs more than the lookup itself).
+
+    Example:
+        index = FFPReader("site.ffp").query
+        index.devices_in_zone(1234)
+        index.loops_on_node(14)               # [40, 41, 42, 43]
+        index.devices_on_node(14)
+        index.match("IRD-ICG-L05M*")          # prefix search
+        index.find("FIRE CUPBOARD")           # substring search
+    """
+
+    # device columns returned by lookups unless others are given
+    COLUMNS = ("device", "loop", "zone", "description", "subtype", "type", "name", "locationId")
+
+    def __init__(self, devices, loops=None, columns=None):
+        """
+        Args:
+            devices (pd.DataFrame): Devices with 'loop', 'zone' and 'description' columns,
+                eg FFPReader.devices or FFPReader.cleaned_devices.
+            loops (pd.DataFrame, optional): Loops with 'loop' and 'node' columns, eg FFPReader.loops.
+                Required for the node lookups.
+            columns (list, optional): Device columns returned by lookups, defaults to COLUMNS.
+        """
+        import numpy as np
+        import pandas as pd
+
+        columns = self.COLUMNS if columns is None else columns
+        self.devices = devices[[c for c in devices.columns if c in columns]]
+        self.loops = loops
+
+        # zone and loop -> row positions, grouped with one stable sort so rows keep their order
+        zones = pd.to_numeric(devices["zone"], errors="coerce").to_numpy()
+        self._rows_by_zone = self._group_rows(zones)
+        self._rows_by_loop = self._group_rows(devices["loop"].to_numpy())
+
+        # node -> loop numbers and node -> row positions
+        self._loops_by_node = {}
+        self._rows_by_node = {}
+        if loops is not None:
+            for node, loop in zip(loops["node"], loops["loop"]):
+                self._loops_by_node.setdefault(int(node), []).append(int(loop))
+            for node, node_loops in self._loops_by_node.items():
+                rows = [self._rows_by_loop[loop] for loop in node_loops if loop in self._rows_by_loop]
+                self._rows_by_node[node] = (
+                    np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp)
+                )
+
+        # descriptions sorted for prefix search, with the row position of each
+        self._descriptions = devices["description"].fillna("").str.upper().tolist()
+        order = np.argsort(np.array(self._descriptions, dtype=str), kind="stable")
+        self._sorted_descriptions = np.array(self._descriptions, dtype=str)[order]
+        self._sorted_rows = order
+
+        # token -> row positions containing it, and the sorted token vocabulary
+        postings = {}
+        for row, description in enumerate(self._descriptions):
+            for token in set(_TOKEN.findall(description)):
+                postings.setdefault(token, []).append(row)
+        self._postings = {
+            token: np.array(rows, dtype=np.intp) for token, rows in postings.items()
+        }
+        self._tokens = sorted(self._postings)
+
+    @staticmethod
+    def _group_rows(keys):
+        """return {key: array of row positions} for an array of numeric keys, NaN keys are skipped"""
+        import numpy as np
+
+        keys = np.asarray(keys, dtype=float)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        valid = ~np.isnan(sorted_keys)
+        order, sorted_keys = order[valid], sorted_keys[valid]
+        unique_keys, starts = np.unique(sorted_keys, return_index=True)
+        return {
+            int(key): rows
+            for key, rows in zip(unique_keys, np.split(order, starts[1:]))
+        }
+
+    def _rows(self, positions):
+        """the devices DataFrame rows at an array of row positions"""
+        return self.devices.iloc[positions]
+
+    def _empty(self):
+        return self.devices.iloc[:0]
+
+    def devices_in_zone(self, zone):
+        """return the devices assigned to a zone, eg devices_in_zone(1234)"""
+        positions = self._rows_by_zone.get(int(zone))
+        return self._empty() if positions is None else self._rows(positions)
+
+    def devices_on_loop(self, loop):
+        """return the devices on a loop"""
+        positions = self._rows_by_loop.get(int(loop))
+        return self._empty() if positions is None else self._rows(positions)
+
+    def loops_on_node(self, node):
+        """return the loop numbers on a node, in the order of their loop info sections"""
+        return list(self._loops_by_node.get(int(node), []))
+
+    def devices_on_node(self, node):
+        """return the devices on every loop of a node"""
+        if self.loops is None:
+            raise ValueError("Node lookups need the loops table, pass loops to ConfigurationIndex.")
+        positions = self._rows_by_node.get(int(node))
+        return self._empty() if positions is None else self._rows(positions)
+
+    def _prefix_positions(self, prefix):
+        """sorted row positions of the descriptions starting with prefix (upper case)"""
+        import numpy as np
+
+        start = np.searchsorted(self._sorted_descriptions, prefix, side="left")
+        end = np.searchsorted(self._sorted_descriptions, prefix + _MAX_CHAR, side="left")
+        return np.sort(self._sorted_rows[start:end])
+
+    def _token_positions(self, query_token, position):
+        """
+        row positions whose description contains a token matching query_token, where position says
+        which part of the query it is: a lone token can be inside any token, the first can end one,
+        the last can start one and tokens in between must match whole tokens
+        """
+        import numpy as np
+
+        if position == "middle":
+            candidates = [query_token] if query_token in self._postings else []
+        elif position == "last":
+            start = bisect.bisect_left(self._tokens, query_token)
+            end = bisect.bisect_left(self._tokens, query_token + _MAX_CHAR)
+            candidates = self._tokens[start:end]
+        elif position == "first":
+            candidates = [t for t in self._tokens if t.endswith(query_token)]
+        else:
+            candidates = [t for t in self._tokens if query_token in t]
+        if not candidates:
+            return np.empty(0, dtype=np.intp)
+        return np.unique(np.concatenate([self._postings[t] for t in candidates]))
+
+    def _substring_positions(self, text):
+        """sorted row positions of the descriptions containing text (upper case)"""
+        import numpy as np
+
+        query_tokens = _TOKEN.findall(text)
+        if not query_tokens:
+            # only punctuation or spaces, nothing to look up in the token index
+            rows = range(len(self._descriptions))
+        else:
+            rows = None
+            for i, query_token in enumerate(query_tokens):
+                # a token at either end of the query can be part of a longer token in a description
+                # unless the query has a separator there
+                at_start = i == 0 and text.startswith(query_token)
+                at_end = i == len(query_tokens) - 1 and text.endswith(query_token)
+                if at_start and at_end:
+                    position = "inside"
+                elif at_start:
+                    position = "first"
+                elif at_end:
+                    position = "last"
+                else:
+                    position = "middle"
+                positions = self._token_positions(query_token, position)
+                rows = positions if rows is None else np.intersect1d(rows, positions)
+                if not len(rows):
+                    break
+        # the tokens narrow the candidates, confirm the whole text appears in order
+        return np.array(
+            [row for row in rows if text in self._descriptions[row]], dtype=np.intp
+        )
+
+    def find_prefix(self, prefix):
+        """return the devices whose description starts with prefix, eg find_prefix('IRD-ICG-L05M')"""
+        return self._rows(self._prefix_positions(prefix.upper()))
+
+    def find(self, text):
+        """return the devices whose description contains text, eg find('FIRE CUPBOARD')"""
+        return self._rows(self._substring_positions(text.upper()))
+
+    def match(self, pattern):
+        """
+        return the devices whose whole description matches a shell style pattern, eg 'IRD-ICG-L05M*'
+        or '*-FCG-0?*'. Candidates come from the prefix or token index before matching the pattern.
+        """
+        import numpy as np
+
+        pattern = pattern.upper()
+        literals = [part for part in re.split(r"[*?\[\]]", pattern) if part]
+        if not re.search(r"[*?\[]", pattern):
+            positions = self._prefix_positions(pattern)
+            return self._rows(
+                np.array([p for p in positions if self._descriptions[p] == pattern], dtype=np.intp)
+            )
+        prefix = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+        if pattern == prefix + "*":
+            return self._rows(self._prefix_positions(prefix))
+        if prefix:
+            candidates = self._prefix_positions(prefix)
+        elif literals:
+            candidates = self._substring_positions(max(literals, key=len))
+        else:
+            candidates = np.arange(len(self._descriptions))
+        return self._rows(
+            np.array(
+                [p for p in candidates if fnmatch.fnmatchcase(self._descriptions[p], pattern)],
+                dtype=np.intp,
+            )
+        )
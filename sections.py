@@ -0,0 +1,94 @@
+"""
+Pure Python access to the raw structure of a .ffp file: the header preamble and the [ ] sections.
+Nothing here imports pandas, so scripts that only need to list or read sections start quickly.
+"""
+from .utils import (
+    map_file,
+    find_section_spans,
+    section_header,
+    decode_span,
+    detect_encoding,
+    parse_tsv,
+)
+
+
+def read_file_header(filepath):
+    """
+    Read the preamble before the first section of a .ffp file.
+    Returns a dict of the title line and each 'key: value' line, eg
+        {'title': 'Fire Finder Plus Configuration File', 'File Version': '1000',
+         'Project': 'NewProject', 'Date': '16/02/2024 9:59:42', 'Configuration Version': '255\t0', ...}
+    """
+    with map_file(filepath) as buffer:
+        end = buffer.find(b"[")
+        if end == -1:
+            end = len(buffer)
+        text = decode_span(buffer, (0, end), detect_encoding(buffer))
+
+    header = {}
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        key, separator, value = line.partition(":")
+        if separator:
+            header[key.strip()] = value.strip()
+        elif "title" not in header:
+            header["title"] = line
+    return header
+
+
+def list_sections(filepath, start_flag=None, end_suffix=None):
+    """
+    List the sections of a .ffp file without parsing their contents.
+    Optionally only sections whose header starts with start_flag and ends with end_suffix,
+    matched as in FFPReader, eg list_sections(path, "M", "X 2") for the loop device sections.
+    Returns a list of dicts in file order, eg
+        [{'header': 'Z 1 Z 1', 'start': 1043, 'end': 98311, 'bytes': 97268}, ...]
+    where start and end are the byte offsets of the section contents.
+    """
+    with map_file(filepath) as buffer:
+        encoding = detect_encoding(buffer)
+        sections = []
+        for span in find_section_spans(buffer):
+            header = section_header(buffer, span, encoding)
+            if start_flag is not None and not header.startswith(start_flag):
+                continue
+            if end_suffix is not None and not header.endswith(end_suffix):
+                continue
+            start, end = span
+            sections.append(
+                {"header": header, "start": start, "end": end, "bytes": end - start}
+            )
+    return sections
+
+
+def count_sections(filepath):
+    """
+    Count the sections of a .ffp file by the first token of their header.
+    eg {'S': 1, 'L': 1, 'Z': 1, 'P': 26, 'M': 200, 'F': 512, ...}
+    """
+    counts = {}
+    for section in list_sections(filepath):
+        flag = section["header"].split(" ", 1)[0]
+        counts[flag] = counts.get(flag, 0) + 1
+    return counts
+
+
+def read_section(filepath, header, occurrence=0):
+    """
+    Read one section of a .ffp file by its header line, eg read_section(path, 'M 90102 X 2').
+    occurrence selects between sections sharing a header, in file order.
+    Returns (header, rows) where rows is the list of tab separated fields of each following line,
+    see utils.parse_tsv. Raises KeyError if there is no such section.
+    """
+    with map_file(filepath) as buffer:
+        encoding = detect_encoding(buffer)
+        seen = 0
+        for span in find_section_spans(buffer):
+            if section_header(buffer, span, encoding) != header:
+                continue
+            if seen == occurrence:
+                return header, parse_tsv(decode_span(buffer, span, encoding))
+            seen += 1
+    raise KeyError(f"No section '{header}' (occurrence {occurrence}) in '{filepath}'.")
@@ -0,0 +1,466 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+_JSON = "application/json"
+_ARROW = "application/vnd.apache.arrow.stream"
+_REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    406: "Not Acceptable",
+    500: "Internal Server Error",
+}
+_TABLES = ("zones", "nodes", "loops", "devices")
+
+
+class HTTPError(Exception):
+    """an error response, raised by request handlers"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _frame_bytes(df):
+    """approximate memory used by a DataFrame, including its strings"""
+    return 0 if df is None else int(df.memory_usage(deep=True).sum())
+
+
+class _CacheEntry:
+    """A parsed file kept in the cache: its reader, ModbusMapper (built on first use) and rendered responses"""
+
+    # rendered responses kept per file, least recently used are dropped first
+    MAX_BODIES = 256
+
+    def __init__(self, reader, signature):
+        self.reader = reader
+        self.signature = signature
+        self.mapper = None
+        # (target, format) -> rendered body, so repeated requests skip serialisation, least recently used first
+        self.bodies = OrderedDict()
+        self.size = sum(_frame_bytes(getattr(reader, table)) for table in _TABLES)
+
+    def get_body(self, key):
+        """a kept (content type, body) response or None"""
+        rendered = self.bodies.get(key)
+        if rendered is not None:
+            self.bodies.move_to_end(key)
+        return rendered
+
+    def add_body(self, key, rendered):
+        """keep a rendered (content type, body) response, dropping the oldest beyond MAX_BODIES"""
+        if key in self.bodies:
+            return
+        self.bodies[key] = rendered
+        self.size += len(rendered[1])
+        while len(self.bodies) > self.MAX_BODIES:
+            self.drop_body()
+
+    def drop_body(self):
+        """drop the least recently used rendered response, returns False if there was none"""
+        if not self.bodies:
+            return False
+        _, (_, body) = self.bodies.popitem(last=False)
+        self.size -= len(body)
+        return True
+
+    def set_mapper(self, mapper):
+        self.mapper = mapper
+        self.size += sum(_frame_bytes(getattr(mapper, table)) for table in _TABLES)
+
+
+class ConfigurationServer:
+    """
+    Local HTTP/JSON service serving the parsed configurations of the .ffp files in a directory, so
+    tools can fetch device lists and register maps without re-parsing.
+
+    - Files are parsed with FFPReader on first request on a thread pool and kept in an LRU cache keyed by
+      path, mtime and size, bounded by max_cache_bytes of DataFrames and rendered responses. A file that
+      changes on disk is re-parsed on its next request. At most _CacheEntry.MAX_BODIES responses are kept
+      per file, and search responses are not kept.
+    - Every response carries an ETag derived from the file's signature and the request, a request with
+      a matching If-None-Match gets 304 Not Modified without touching the cache.
+    - Tables are JSON (records) by default, Apache Arrow IPC streams with ?format=arrow or an
+      'Accept: application/vnd.apache.arrow.stream' header when pyarrow is installed.
+
+    Endpoints, {name} is the url encoded file name relative to data_dir:
+        GET /health
+        GET /metrics                                      cache and request counters
+        GET /files                                        the .ffp files and whether they are cached
+        GET /files/{name}/tables/{table}[?cleaned=1]      zones, nodes, loops or devices
+        GET /files/{name}/modbus/{table}[?gateway=1]      the ModbusMapper table, optionally one gateway
+        GET /files/{name}/zones/{zone}/devices            devices in a zone, see query.ConfigurationIndex
+        GET /files/{name}/nodes/{node}/devices
+        GET /files/{name}/loops/{loop}/devices
+        GET /files/{name}/search?q=FIRE+CUPBOARD          substring search, or ?pattern=IRD-ICG-L05M*
+
+    Example:
+        ConfigurationServer("./data/input", port=8765).run()
+        curl 'http://127.0.0.1:8765/files/QWP%2016.02.24.ffp/zones/5/devices'
+    """
+
+    _SUFFIX = ".ffp"
+
+    def __init__(
+        self,
+        data_dir,
+        host="127.0.0.1",
+        port=8765,
+        max_cache_bytes=1024**3,
+        workers=4,
+    ):
+        """
+        Args:
+            data_dir (str): Directory containing the .ffp files served.
+            host (str, optional): Address to listen on, localhost by default.
+            port (int, optional): Port to listen on, 0 picks a free port (see self.port once started).
+            max_cache_bytes (int, optional): Approximate memory bound of the cache.
+            workers (int, optional): Threads parsing files and rendering responses.
+        """
+        self.data_dir = os.path.abspath(data_dir)
+        self.host = host
+        self.port = port
+        self.max_cache_bytes = max_cache_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # path -> _CacheEntry, least recently used first
+        self._cache = OrderedDict()
+        # path -> future of a parse in progress, so concurrent requests share one parse
+        self._loading = {}
+        self.metrics = {
+            "requests": 0,
+            "not_modified": 0,
+            "errors": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "evictions": 0,
+        }
+        self._server = None
+
+    # ----- cache -----
+
+    def _resolve(self, name):
+        """absolute path of a served file name, raising 404 for names outside data_dir"""
+        path = os.path.abspath(os.path.join(self.data_dir, name))
+        if os.path.dirname(path) != self.data_dir or not path.lower().endswith(self._SUFFIX):
+            raise HTTPError(404, f"No file '{name}'.")
+        if not os.path.isfile(path):
+            raise HTTPError(404, f"No file '{name}'.")
+        return path
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _cache_bytes(self):
+        return sum(entry.size for entry in self._cache.values())
+
+    def _evict(self, keep=None):
+        """
+        drop least recently used entries until the cache fits in max_cache_bytes, then the rendered
+        responses of the entry kept, least recently used first
+        """
+        while self._cache_bytes() > self.max_cache_bytes and len(self._cache) > 1:
+            path = next(iter(self._cache))
+            if path == keep:
+                self._cache.move_to_end(path)
+                path = next(iter(self._cache))
+            del self._cache[path]
+            self.metrics["evictions"] += 1
+            logger.debug(f"Evicted '{path}' from the cache.")
+        for entry in self._cache.values():
+            while self._cache_bytes() > self.max_cache_bytes and entry.drop_body():
+                self.metrics["evictions"] += 1
+
+    async def _entry(self, path, signature):
+        """the cache entry for a file with the given signature, parsing it if needed"""
+        from .ffpreader import FFPReader
+
+        entry = self._cache.get(path)
+        if entry is not None and entry.signature == signature:
+            self._cache.move_to_end(path)
+            self.metrics["cache_hits"] += 1
+            return entry
+        key = (path, signature)
+        if key not in self._loading:
+            self.metrics["cache_misses"] += 1
+            loop = asyncio.get_running_loop()
+            self._loading[key] = loop.run_in_executor(self._executor, FFPReader, path)
+        try:
+            reader = await self._loading[key]
+        finally:
+            self._loading.pop(key, None)
+        entry = self._cache.get(path)
+        if entry is None or entry.signature != signature:
+            entry = _CacheEntry(reader, signature)
+            self._cache[path] = entry
+        self._cache.move_to_end(path)
+        self._evict(keep=path)
+        return entry
+
+    async def _mapper(self, entry):
+        from .modbusmapper import ModbusMapper
+
+        if entry.mapper is None:
+            configuration = {
+                table: df for table, df in entry.reader.configuration.items() if df is not None
+            }
+            loop = asyncio.get_running_loop()
+            mapper = await loop.run_in_executor(
+                self._executor, lambda: ModbusMapper(configuration=configuration)
+            )
+            if entry.mapper is None:
+                entry.set_mapper(mapper)
+        return entry.mapper
+
+    # ----- rendering -----
+
+    @staticmethod
+    def _response_format(query, headers):
+        requested = query.get("format", [None])[0]
+        if requested is None:
+            requested = "arrow" if _ARROW in headers.get("accept", "") else "json"
+        if requested not in ("json", "arrow"):
+            raise HTTPError(406, f"Unknown format '{requested}', expected 'json' or 'arrow'.")
+        return requested
+
+    @staticmethod
+    def _render(df, response_format):
+        """serialise a DataFrame as JSON records or an Arrow IPC stream, returns (content type, body)"""
+        if response_format == "arrow":
+            try:
+                import pyarrow as pa
+            except ImportError:
+                raise HTTPError(406, "Arrow responses need pyarrow, install it or request JSON.")
+            table = pa.Table.from_pandas(
+                df.rename(columns=str).reset_index(drop=True), preserve_index=False
+            )
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return _ARROW, sink.getvalue().to_pybytes()
+        return _JSON, df.to_json(orient="records").encode()
+
+    async def _render_cached(self, entry, key, build, response_format, cache=True):
+        """render the frame returned by build() once per entry, key and format, every time if not cache"""
+        cache_key = (key, response_format)
+        rendered = entry.get_body(cache_key)
+        if rendered is None:
+            loop = asyncio.get_running_loop()
+            rendered = await loop.run_in_executor(
+                self._executor, lambda: self._render(build(), response_format)
+            )
+            if cache:
+                entry.add_body(cache_key, rendered)
+        return rendered
+
+    # ----- routing -----
+
+    async def _file_response(self, path, parts, query, headers):
+        entry = await self._entry(path, self._signature(path))
+        response_format = self._response_format(query, headers)
+        key = "/".join(parts) + "?" + "&".join(f"{k}={v}" for k, v in sorted(query.items()))
+        reader = entry.reader
+        # searches are not kept, any text can be searched for so they would only fill the cache
+        cache = True
+
+        if len(parts) == 2 and parts[0] == "tables" and parts[1] in _TABLES:
+            table = parts[1]
+            cleaned = query.get("cleaned", ["0"])[0] == "1"
+
+            def build():
+                if cleaned and table in ("zones", "devices"):
+                    df = getattr(reader, f"cleaned_{table}")
+                else:
+                    df = getattr(reader, table)
+                if df is None:
+                    raise HTTPError(404, f"Table '{table}' was not parsed.")
+                return df
+
+        elif len(parts) == 2 and parts[0] == "modbus" and parts[1] in _TABLES:
+            table = parts[1]
+            mapper = await self._mapper(entry)
+            gateway = query.get("gateway", [None])[0]
+            if gateway is not None:
+                try:
+                    gateway = int(gateway)
+                except ValueError:
+                    raise HTTPError(400, f"Expected a gateway number, got '{gateway}'.")
+
+            def build():
+                df = getattr(mapper, table)
+                if gateway is not None:
+                    df = df[df["gateway"] == gateway]
+                return df
+
+        elif len(parts) == 3 and parts[2] == "devices" and parts[0] in ("zones", "nodes", "loops"):
+            try:
+                number = int(parts[1])
+            except ValueError:
+                raise HTTPError(400, f"Expected a number, got '{parts[1]}'.")
+            lookup = {
+                "zones": "devices_in_zone",
+                "nodes": "devices_on_node",
+                "loops": "devices_on_loop",
+            }[parts[0]]
+
+            def build():
+                return getattr(reader.query, lookup)(number)
+
+        elif parts == ["search"]:
+            text = query.get("q", [None])[0]
+            pattern = query.get("pattern", [None])[0]
+            if not text and not pattern:
+                raise HTTPError(400, "Expected a 'q' or 'pattern' parameter.")
+
+            cache = False
+
+            def build():
+                return reader.query.find(text) if text else reader.query.match(pattern)
+
+        else:
+            raise HTTPError(404, "Unknown endpoint.")
+
+        # rendered responses count towards the cache size
+        content_type, body = await self._render_cached(entry, key, build, response_format, cache)
+        self._evict(keep=path)
+        return content_type, body
+
+    async def _route(self, target, headers):
+        """returns (status, content type, body, etag) for a GET request target"""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+
+        if parts == ["health"]:
+            return 200, _JSON, b'{"status": "ok"}', None
+        if parts == ["metrics"]:
+            metrics = dict(
+                self.metrics,
+                cached_files=len(self._cache),
+                cache_bytes=self._cache_bytes(),
+                max_cache_bytes=self.max_cache_bytes,
+            )
+            return 200, _JSON, json.dumps(metrics).encode(), None
+        if parts == ["files"]:
+            files = []
+            for name in sorted(os.listdir(self.data_dir)):
+                path = os.path.join(self.data_dir, name)
+                if name.lower().endswith(self._SUFFIX) and os.path.isfile(path):
+                    mtime_ns, size = self._signature(path)
+                    files.append(
+                        {"name": name, "size": size, "mtime": mtime_ns / 1e9, "cached": path in self._cache}
+                    )
+            return 200, _JSON, json.dumps(files).encode(), None
+        if len(parts) >= 2 and parts[0] == "files":
+            path = self._resolve(parts[1])
+            # the response only depends on the file contents and the request, so the etag is known
+            # before parsing and a conditional request can be answered without the cache
+            mtime_ns, size = self._signature(path)
+            etag = '"' + hashlib.blake2b(
+                f"{path}:{mtime_ns}:{size}:{target}:{headers.get('accept', '')}".encode(),
+                digest_size=16,
+            ).hexdigest() + '"'
+            if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+                self.metrics["not_modified"] += 1
+                return 304, None, b"", etag
+            content_type, body = await self._file_response(path, parts[2:], query, headers)
+            return 200, content_type, body, etag
+        raise HTTPError(404, "Unknown endpoint.")
+
+    # ----- HTTP -----
+
+    async def _handle_connection(self, reader, writer):
+        """serve requests on one connection until the client closes it, HTTP/1.1 keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    if version == "HTTP/1.1"
+                    else headers.get("connection", "").lower() == "keep-alive"
+                )
+
+                started = time.perf_counter()
+                self.metrics["requests"] += 1
+                etag = None
+                try:
+                    if method not in ("GET", "HEAD"):
+                        raise HTTPError(405, f"Method {method} not allowed.")
+                    status, content_type, body, etag = await self._route(target, headers)
+                except HTTPError as error:
+                    status, content_type = error.status, _JSON
+                    body = json.dumps({"error": error.message}).encode()
+                except Exception as error:
+                    self.metrics["errors"] += 1
+                    logger.exception(f"Failed to serve '{target}'.")
+                    status, content_type = 500, _JSON
+                    body = json.dumps({"error": str(error)}).encode()
+
+                response = [f"HTTP/1.1 {status} {_REASONS[status]}"]
+                if content_type:
+                    response.append(f"Content-Type: {content_type}")
+                if etag:
+                    response.append(f"ETag: {etag}")
+                response.append(f"Content-Length: {len(body)}")
+                response.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+                writer.write(("\r\n".join(response) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                logger.debug(
+                    f"{method} {target} {status} {len(body)}B {time.perf_counter() - started:.4f}s"
+                )
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Start listening and serve until cancelled."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Serving '{self.data_dir}' on http://{self.host}:{self.port}/")
+        async with self._server:
+            await self._server.serve_forever()
+
+    def run(self):
+        """Serve until interrupted."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ConfigurationServer("./data/input").run()
@@ -0,0 +1,221 @@
+"""
+Live status of the zones, nodes, loops and devices of a panel, held as the raw Modbus holding registers
+they are reported in. Register words read from a gateway are copied in as they are (see
+StateStore.update), the status of each object is decoded from them on demand with vectorized bit
+operations over ModbusMapper.REGISTER_LAYOUT, and joined to the descriptions of an FFPReader.
+
+    store = StateStore(FFPReader("site.ffp"))
+    store.update(1, 6002, words)                    # uint16 words read from gateway 1 from register 6002
+    store.active("zones", "alarm")                  # zones in alarm, with their descriptions
+    store.counts("alarm", by="zone")                # devices in alarm per zone
+"""
+from .modbusmapper import ModbusMapper
+
+
+class StateStore:
+    # status flags of each object type and their bit within the object's bits of a register, as in
+    # ModbusMapper.add_*_modbus_mapping
+    FLAGS = {
+        "zones": {"alarm": 0, "prealarm": 1, "fault": 2, "isolate": 3},
+        "nodes": {"alarm": 0, "fault": 2, "isolate": 3},
+        "loops": {
+            "open_circuit": 0,
+            "short_circuit_a": 1,
+            "short_circuit_b": 2,
+            "over_current": 3,
+            "non_configured": 4,
+            "loop_module_fault": 5,
+        },
+        "devices": {"alarm": 0, "prealarm": 1, "fault": 2, "isolate": 3},
+    }
+    # a loop is down when both short circuit B and over current are set
+    _LOOP_DOWN_BITS = (2, 3)
+
+    # columns identifying an object of each type
+    KEYS = {
+        "zones": ["zone"],
+        "nodes": ["node"],
+        "loops": ["loop"],
+        "devices": ["loop", "device"],
+    }
+    # columns of the FFPReader tables joined onto the states
+    _DESCRIPTION_COLUMNS = {
+        "zones": ["description"],
+        "nodes": ["description"],
+        "loops": ["node"],
+        "devices": ["zone", "description", "type"],
+    }
+
+    def __init__(self, reader=None):
+        """
+        Args:
+            reader (FFPReader, optional): Configuration whose tables are joined onto the states, only
+                the objects in its tables are returned by states and active. Without a reader every
+                address of the register layout is returned.
+        """
+        import numpy as np
+
+        self.reader = reader
+        layout = ModbusMapper.REGISTER_LAYOUT
+        gateways = max(block[0] for table in layout.values() for block in table["blocks"])
+        # one row of registers per gateway (row 0 unused), wide enough for the highest register used
+        self._size = 1 + max(self._last_register(table) for table in layout)
+        self.registers = np.zeros((gateways + 1, self._size), dtype=np.uint16)
+        self._addresses = {table: self._build_addresses(table) for table in layout}
+
+    @staticmethod
+    def _last_register(table):
+        """highest holding register used by a table in ModbusMapper.REGISTER_LAYOUT"""
+        layout = ModbusMapper.REGISTER_LAYOUT[table]
+        last_register = 0
+        for _, first, last, first_register in layout["blocks"]:
+            if table == "devices":
+                registers = (last - first + 1) * layout["registers_per_loop"]
+            else:
+                registers = -(-(last - first + 1) // layout["per_register"])
+            last_register = max(last_register, first_register + registers - 1)
+        return last_register
+
+    def _build_addresses(self, table):
+        """
+        keys, flat index into registers and bit shift of every object a table's layout can address,
+        eg for zones {'zone': [1, 2, ...], 'index': [6002, 6002, ...], 'shift': [0, 4, ...]}
+        """
+        import numpy as np
+
+        layout = ModbusMapper.REGISTER_LAYOUT[table]
+        per_register = layout["per_register"]
+        columns = {key: [] for key in self.KEYS[table]}
+        index = []
+        shift = []
+        for gateway, first, last, first_register in layout["blocks"]:
+            numbers = np.arange(first, last + 1)
+            if table == "devices":
+                devices_per_loop = layout["devices_per_loop"]
+                loop = np.repeat(numbers, devices_per_loop)
+                device = np.tile(np.arange(1, devices_per_loop + 1), len(numbers))
+                register = (
+                    first_register
+                    + (loop - first) * layout["registers_per_loop"]
+                    + (device - 1) // per_register
+                )
+                position = device
+                columns["loop"].append(loop)
+                columns["device"].append(device)
+            else:
+                register = first_register + (numbers - first) // per_register
+                position = numbers
+                columns[self.KEYS[table][0]].append(numbers)
+            index.append(gateway * self._size + register)
+            shift.append(((position - 1) % per_register) * layout["bits"])
+        addresses = {key: np.concatenate(values) for key, values in columns.items()}
+        addresses["index"] = np.concatenate(index)
+        addresses["shift"] = np.concatenate(shift).astype(np.uint16)
+        return addresses
+
+    def update(self, gateway, start_register, words):
+        """
+        Copy register words read from a gateway into the store, eg the response of a read holding
+        registers request (see pollplan.build_poll_plan) from start_register.
+
+        Args:
+            gateway (int): Gateway the words were read from.
+            start_register (int): Holding register of the first word.
+            words (array-like): uint16 register values.
+        """
+        import numpy as np
+
+        words = np.asarray(words, dtype=np.uint16)
+        if not 1 <= gateway < len(self.registers):
+            raise ValueError(f"Unknown gateway {gateway}.")
+        if start_register < 0 or start_register + len(words) > self._size:
+            raise ValueError(
+                f"Registers {start_register} to {start_register + len(words) - 1} are outside the layout."
+            )
+        self.registers[gateway, start_register : start_register + len(words)] = words
+
+    def clear(self):
+        """reset every register to 0, ie no object active"""
+        self.registers[:] = 0
+
+    def bits(self, table):
+        """
+        The raw status bits of every object a table's layout addresses, in the order of addresses,
+        eg the 4 bits of each of the 2500 zones. Returns a uint16 array.
+        """
+        addresses = self._addresses[table]
+        width = ModbusMapper.REGISTER_LAYOUT[table]["bits"]
+        return (self.registers.ravel()[addresses["index"]] >> addresses["shift"]) & ((1 << width) - 1)
+
+    def flag(self, table, flag):
+        """bool array of whether flag is set for every object a table's layout addresses, see FLAGS"""
+        bits = self.bits(table)
+        if table == "loops" and flag == "loop_down":
+            mask = sum(1 << bit for bit in self._LOOP_DOWN_BITS)
+            return (bits & mask) == mask
+        if flag not in self.FLAGS[table]:
+            raise ValueError(f"Unknown {table} flag '{flag}', expected one of {self.flags(table)}.")
+        return (bits >> self.FLAGS[table][flag]) & 1 == 1
+
+    def flags(self, table):
+        """names of the status flags of a table"""
+        return list(self.FLAGS[table]) + (["loop_down"] if table == "loops" else [])
+
+    def keys(self, table):
+        """the KEYS columns of every object a table's layout addresses, in the order of bits, eg {'zone': array([1, 2, ...])}"""
+        return {key: self._addresses[table][key] for key in self.KEYS[table]}
+
+    def states(self, table):
+        """
+        The status of each object of a table as a DataFrame, one bool column per flag, joined to the
+        reader's table (only objects in it) or for every address without a reader, eg
+            zone  alarm  prealarm  fault  isolate  description
+            1     False  False     True   False    TOWER 2 LEVEL 1
+        """
+        import pandas as pd
+
+        addresses = self._addresses[table]
+        df = pd.DataFrame({key: addresses[key] for key in self.KEYS[table]})
+        for flag in self.flags(table):
+            df[flag] = self.flag(table, flag)
+        return self._join(df, table)
+
+    def active(self, table, flag="alarm"):
+        """the states of the objects of a table with flag set, see states"""
+        import pandas as pd
+
+        addresses = self._addresses[table]
+        active = self.flag(table, flag)
+        df = pd.DataFrame({key: addresses[key][active] for key in self.KEYS[table]})
+        for name in self.flags(table):
+            df[name] = self.flag(table, name)[active]
+        return self._join(df, table)
+
+    def _join(self, df, table):
+        """add the description columns of the reader's table, keeping only the objects in it"""
+        configuration = None if self.reader is None else getattr(self.reader, table)
+        if configuration is None:
+            return df
+        keys = self.KEYS[table]
+        columns = [c for c in self._DESCRIPTION_COLUMNS[table] if c in configuration.columns]
+        configured = configuration[keys + columns].drop_duplicates(keys)
+        return df.merge(configured, on=keys, how="inner")
+
+    def counts(self, flag="alarm", by="zone"):
+        """
+        Number of devices with flag set per value of a column of the reader's devices, eg by='zone'
+        gives the active alarms per zone, by='type' per device type and by='node' per node (through
+        the loops table). Returns a pd.Series sorted by count, descending.
+        """
+        if self.reader is None or self.reader.devices is None:
+            raise ValueError("counts needs a reader with a devices table.")
+        active = self.active("devices", flag)
+        devices = self.reader.devices[["loop", "device"] + ([by] if by in self.reader.devices else [])]
+        active = active[["loop", "device"]].merge(devices.drop_duplicates(["loop", "device"]), on=["loop", "device"])
+        if by == "node":
+            if self.reader.loops is None:
+                raise ValueError("counts by node needs a reader with a loops table.")
+            active = active.merge(self.reader.loops[["loop", "node"]].drop_duplicates("loop"), on="loop")
+        if by not in active.columns:
+            raise ValueError(f"Cannot count devices by '{by}'.")
+        return active.groupby(by).size().sort_values(ascending=False).rename(f"{flag}_count")
@@ -0,0 +1,146 @@
+"""
+Streaming access to the rows of a .ffp file as lightweight records, for bulk processing of many files
+without building DataFrames. Memory use is bounded by one section at a time, the file is memory-mapped.
+
+    for device in iter_devices("site.ffp"):
+        device.loop, device.device, device.zone, device.description, device.type
+
+    # across an archive
+    for path in glob.glob("archive/**/*.ffp", recursive=True):
+        for device in iter_devices(path): ...
+
+Records hold the same values as the matching FFPReader table columns, eg Device.zone is a string as in
+FFPReader.devices and Device.loop is None for device sections without a loop info section.
+"""
+from collections import namedtuple
+from .utils import (
+    map_file,
+    iter_section_spans,
+    section_header,
+    decode_span,
+    detect_encoding,
+)
+
+Zone = namedtuple("Zone", ["zone", "description"])
+Node = namedtuple("Node", ["node", "description", "id"])
+Loop = namedtuple("Loop", ["loop", "description", "node", "id"])
+Device = namedtuple("Device", ["device", "loop", "zone", "description", "subtype", "type"])
+
+# record type of each kind, in FFPReader.TABLES order
+RECORDS = {"zones": Zone, "nodes": Node, "loops": Loop, "devices": Device}
+
+
+def _node_number(section_id):
+    """node number of a node/loop section id, ie without the last 4 digits, eg 11 from '110101'"""
+    return int(section_id[:-4])
+
+
+def _matching_spans(buffer, encoding, start_flag, end_suffix=None):
+    """yield (header, span) for the sections whose header matches, as in FFPReader._parse_matching_sections"""
+    for span in iter_section_spans(buffer):
+        header = section_header(buffer, span, encoding)
+        if not header.startswith(start_flag):
+            continue
+        if end_suffix is not None and not header.endswith(end_suffix):
+            continue
+        yield header, span
+
+
+def _rows(buffer, span, encoding, fields):
+    """yield the first `fields` tab separated fields of each line of a section after its header"""
+    text = decode_span(buffer, span, encoding)
+    start = text.find("\n")
+    if start == -1:
+        return
+    start += 1
+    while True:
+        end = text.find("\n", start)
+        line = text[start:] if end == -1 else text[start:end]
+        yield line.split("\t", fields)[:fields]
+        if end == -1:
+            return
+        start = end + 1
+
+
+def _iter_zones(buffer, encoding):
+    for _, span in _matching_spans(buffer, encoding, "Z"):
+        for zone, fields in enumerate(_rows(buffer, span, encoding, 2), start=1):
+            yield Zone(zone, fields[1] if len(fields) > 1 else None)
+
+
+def _iter_nodes(buffer, encoding):
+    for header, span in _matching_spans(buffer, encoding, "P"):
+        section_id = header.split(" ")[1]
+        fields = next(_rows(buffer, span, encoding, 1), [None])
+        yield Node(_node_number(section_id), fields[0], section_id)
+
+
+def _iter_loops(buffer, encoding):
+    for header, span in _matching_spans(buffer, encoding, "M", "X 1"):
+        section_id = header.split(" ")[1]
+        fields = next(_rows(buffer, span, encoding, 2))
+        yield Loop(int(fields[0]), fields[1] if len(fields) > 1 else None, _node_number(section_id), section_id)
+
+
+def _iter_devices(buffer, encoding):
+    # loop numbers come from the loop info sections, the first section with an id wins as in FFPReader
+    loop_by_id = {}
+    for loop in _iter_loops(buffer, encoding):
+        loop_by_id.setdefault(loop.id, loop.loop)
+    for header, span in _matching_spans(buffer, encoding, "M", "X 2"):
+        loop = loop_by_id.get(header.split(" ")[1])
+        for device, fields in enumerate(_rows(buffer, span, encoding, 4), start=1):
+            fields += [None] * (4 - len(fields))
+            yield Device(device, loop, *fields)
+
+
+_ITERATORS = {
+    "zones": _iter_zones,
+    "nodes": _iter_nodes,
+    "loops": _iter_loops,
+    "devices": _iter_devices,
+}
+
+
+def iter_records(path, kind):
+    """
+    Yield the rows of one table of a .ffp file as records, in file order.
+
+    Args:
+        path (str): The .ffp file.
+        kind (str): 'zones', 'nodes', 'loops' or 'devices', yielding Zone, Node, Loop or Device records.
+    """
+    if kind not in _ITERATORS:
+        raise ValueError(f"Unknown kind '{kind}', expected one of {list(_ITERATORS)}.")
+    with map_file(path) as buffer:
+        yield from _ITERATORS[kind](buffer, detect_encoding(buffer))
+
+
+def iter_devices(path):
+    """Yield the devices of a .ffp file as Device records, see iter_records"""
+    return iter_records(path, "devices")
+
+
+def iter_batches(path, kind, batch_size=10000):
+    """Yield the records of iter_records in lists of at most batch_size records"""
+    batch = []
+    for record in iter_records(path, kind):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_record_batches(path, kind, batch_size=10000):
+    """
+    Yield the records of iter_records as Apache Arrow RecordBatches of at most batch_size rows, with one
+    column per record field, eg for streaming into Parquet or a database. Requires pyarrow.
+    """
+    import pyarrow as pa
+
+    fields = RECORDS[kind]._fields
+    for batch in iter_batches(path, kind, batch_size):
+        columns = zip(*batch)
+        yield pa.RecordBatch.from_arrays([pa.array(list(column)) for column in columns], names=fields)
@@ -0,0 +1,109 @@
+"""
+Summary rollups of a configuration: devices per zone, loop, node and device type, spare addresses and
+loop utilization, computed once from the devices table with bincounts over integer keys instead of a
+group-by per report, see FFPReader.summary. The loop and node rollups are those of
+occupancy.Occupancy, keyed by (node, loop), with the spare addresses added.
+
+    summary = FFPReader("site.ffp").summary
+    summary.loops          # devices, spare, free and utilization per loop
+    summary.totals         # one row per metric, eg the summary sheet of the exports
+    summary.tables()       # every rollup by sheet name, for write_dfs_to_excel_and_format
+"""
+from .modbusmapper import ModbusMapper
+from .occupancy import Occupancy
+
+
+class Summary:
+    DEVICES_PER_LOOP = ModbusMapper.REGISTER_LAYOUT["devices"]["devices_per_loop"]
+
+    def __init__(
+        self, devices, zones=None, loops=None, placeholders=("", "Unassigned Text", "SPARE"), occupancy=None
+    ):
+        """
+        Args:
+            devices (pd.DataFrame): FFPReader.devices.
+            zones (pd.DataFrame, optional): FFPReader.zones, for the zone descriptions and counts.
+            loops (pd.DataFrame, optional): FFPReader.loops, for the node of each loop.
+            placeholders (list[str], optional): Descriptions of spare addresses, see
+                FFPReader.DEFAULT_CLEANING_RULES['placeholder_descriptions'].
+            occupancy (Occupancy, optional): The occupancy of the same tables, eg FFPReader.occupancy,
+                built from them if not given.
+        """
+        import numpy as np
+        import pandas as pd
+
+        # integer zone of every device row, 0 where unknown
+        spare = devices["description"].fillna("").str.strip().isin(placeholders).to_numpy()
+        configured = ~spare
+        zone = pd.to_numeric(devices["zone"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+        zone = np.where(zone > 0, zone, 0)
+
+        # per loop and node, from the loop bitmaps
+        if occupancy is None:
+            occupancy = Occupancy(devices, zones, loops, placeholders)
+        self.loops = occupancy.loop_stats().rename(columns={"used": "devices"})
+        self.loops.insert(3, "spare", occupancy.count_by_loop(spare))
+        self.loops["utilization"] = self.loops["devices"] / self.DEVICES_PER_LOOP
+        self.nodes = None
+        if loops is not None:
+            self.nodes = occupancy.node_stats().rename(columns={"used": "devices", "occupancy": "utilization"})
+            spare_by_node = self.loops.groupby("node")["spare"].sum()
+            self.nodes.insert(3, "spare", self.nodes["node"].map(spare_by_node).to_numpy())
+        else:
+            self.loops = self.loops.drop(columns="node")
+
+        # per zone, configured devices of every zone with any, plus every configured zone
+        zone_devices = np.bincount(zone, weights=configured, minlength=int(zone.max(initial=0)) + 1)
+        numbers = np.flatnonzero(zone_devices)
+        numbers = numbers[numbers > 0]
+        by_zone = pd.DataFrame({"zone": numbers, "devices": zone_devices[numbers].astype(np.int64)})
+        if zones is not None:
+            configured_zones = zones[
+                ~zones["description"].fillna("").str.strip().isin(placeholders)
+            ][["zone", "description"]].drop_duplicates("zone")
+            by_zone = configured_zones.merge(by_zone, on="zone", how="outer")
+            by_zone["devices"] = by_zone["devices"].fillna(0).astype(np.int64)
+            by_zone = by_zone.sort_values("zone", ignore_index=True)
+        self.zones = by_zone
+
+        # per type and subtype of the configured devices
+        self.types = (
+            devices.loc[configured, ["type", "subtype"]]
+            .fillna("")
+            .value_counts(sort=False)
+            .rename("devices")
+            .reset_index()
+            .sort_values(["devices", "type", "subtype"], ascending=[False, True, True], ignore_index=True)
+        )
+
+        totals = {
+            "devices": int(configured.sum()),
+            "spare": int(spare.sum()),
+            "zones": len(self.zones) if zones is not None else None,
+            "zones_without_devices": int((self.zones["devices"] == 0).sum()) if zones is not None else None,
+            "loops": len(self.loops),
+            "nodes": len(self.nodes) if self.nodes is not None else None,
+            "device_types": len(self.types),
+            "free_addresses": int(self.loops["free"].sum()),
+            "utilization": (
+                float(self.loops["devices"].sum() / (len(self.loops) * self.DEVICES_PER_LOOP))
+                if len(self.loops)
+                else 0.0
+            ),
+        }
+        # metrics of tables not given are left out, values keep their int or float type
+        totals = {metric: value for metric, value in totals.items() if value is not None}
+        self.totals = pd.DataFrame(
+            {"metric": list(totals), "value": pd.Series(list(totals.values()), dtype=object)}
+        )
+
+    def tables(self):
+        """every rollup by sheet name, eg {'summary': totals, 'zones': ..., 'loops': ...}, skipping those not built"""
+        tables = {
+            "summary": self.totals,
+            "zones": self.zones,
+            "nodes": self.nodes,
+            "loops": self.loops,
+            "types": self.types,
+        }
+        return {name: df for name, df in tables.items() if df is not None}
@@ -0,0 +1,52 @@
+"""
+Shared fixtures of the tests, run with `python -m pytest` from the repository directory.
+
+The repository directory is the package, its modules use relative imports. The tests import it as
+`ffpreader`, as in the README, whatever the directory of the checkout is called.
+"""
+import importlib.machinery
+import importlib.util
+import os
+import shutil
+import sys
+
+import pytest
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INPUT_DIR = os.path.join(REPOSITORY_DIR, "data", "input")
+SAMPLE_FILES = sorted(name for name in os.listdir(INPUT_DIR) if name.lower().endswith(".ffp"))
+
+if "ffpreader" not in sys.modules or not hasattr(sys.modules["ffpreader"], "__path__"):
+    spec = importlib.machinery.ModuleSpec("ffpreader", None, is_package=True)
+    spec.submodule_search_locations = [REPOSITORY_DIR]
+    sys.modules["ffpreader"] = importlib.util.module_from_spec(spec)
+
+
+@pytest.fixture(params=SAMPLE_FILES)
+def sample_path(request):
+    """path of each sample .ffp file in data/input"""
+    return os.path.join(INPUT_DIR, request.param)
+
+
+@pytest.fixture
+def sample_copy(sample_path, tmp_path):
+    """a copy of each sample file in a temporary directory, for tests that edit or replace it"""
+    path = tmp_path / os.path.basename(sample_path)
+    shutil.copyfile(sample_path, path)
+    return str(path)
+
+
+_readers = {}
+
+
+@pytest.fixture
+def reader(sample_path):
+    """
+    the FFPReader of each sample file, parsed once per session and shared, so tests must not edit
+    its tables, use sample_copy and a reader of their own to edit
+    """
+    from ffpreader.ffpreader import FFPReader
+
+    if sample_path not in _readers:
+        _readers[sample_path] = FFPReader(sample_path)
+    return _readers[sample_path]
@@ -0,0 +1,69 @@
+import os
+import shutil
+import sqlite3
+
+from conftest import INPUT_DIR, SAMPLE_FILES
+from ffpreader.archive import ArchiveIndex
+
+
+def _archive(root):
+    """an archive with a site directory per sample file, eg root/site0/QWP 16.02.24.ffp"""
+    paths = []
+    for number, name in enumerate(SAMPLE_FILES):
+        os.makedirs(root / f"site{number}")
+        paths.append(str(root / f"site{number}" / name))
+        shutil.copyfile(os.path.join(INPUT_DIR, name), paths[-1])
+    return paths
+
+
+def test_update_indexes_new_files_and_removes_deleted_ones(tmp_path):
+    paths = _archive(tmp_path / "archive")
+    with ArchiveIndex(str(tmp_path / "archive.sqlite")) as index:
+        counts = index.update(str(tmp_path / "archive"), jobs=1)
+        assert counts == {"indexed": len(paths), "unchanged": 0, "removed": 0, "failed": 0}
+        assert index.update(str(tmp_path / "archive"), jobs=1)["unchanged"] == len(paths)
+        os.remove(paths[0])
+        assert index.update(str(tmp_path / "archive"), jobs=1)["removed"] == 1
+        files = index.files()
+        assert files["site"].tolist() == [f"site{number}" for number in range(1, len(paths))]
+        assert (files["entries"] > 0).all()
+
+
+def test_search(tmp_path):
+    _archive(tmp_path / "archive")
+    with ArchiveIndex(str(tmp_path / "archive.sqlite")) as index:
+        index.update(str(tmp_path / "archive"), jobs=1)
+        matches = index.search("fire cupboard")
+        assert len(matches) > 0
+        assert matches["description"].str.upper().str.contains("FIRE CUPBOARD").all()
+        assert set(index.search("fire cupboard", kind="zone")["kind"]) <= {"zone"}
+        assert set(index.search("fire cupboard", site="site0")["site"]) == {"site0"}
+        assert len(index.search("fire cupboard", limit=3)) == 3
+
+        prefix = index.search("IRD-ICG*", kind="device")
+        assert len(prefix) > 0
+        assert prefix["description"].str.startswith("IRD-ICG").all()
+        assert index.search("NO SUCH DESCRIPTION ANYWHERE").empty
+
+
+def test_search_loops(tmp_path):
+    _archive(tmp_path / "archive")
+    with ArchiveIndex(str(tmp_path / "archive.sqlite")) as index:
+        index.update(str(tmp_path / "archive"), jobs=1)
+        loops = index.search("apollo loop no 23", kind="loop")
+        assert set(loops["site"]) == {f"site{number}" for number in range(len(SAMPLE_FILES))}
+        assert (loops["loop"] == 23).all() and loops["node"].notna().all()
+        assert index.search("apollo*", kind="device").empty
+
+
+def test_an_index_of_an_older_version_is_rebuilt(tmp_path):
+    paths = _archive(tmp_path / "archive")
+    db_path = str(tmp_path / "archive.sqlite")
+    with ArchiveIndex(db_path) as index:
+        index.update(str(tmp_path / "archive"), jobs=1)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA user_version = 1")
+    connection.close()
+    with ArchiveIndex(db_path) as index:
+        assert index.files().empty
+        assert index.update(str(tmp_path / "archive"), jobs=1)["indexed"] == len(paths)
@@ -0,0 +1,56 @@
+import pytest
+
+from ffpreader.benchmark import PRESETS, run_benchmark, write_synthetic_ffp
+from ffpreader.ffpreader import FFPReader
+
+_SIZES = {"nodes": 3, "loops": 5, "devices_per_loop": 10, "zones": 40, "cause_effects": 5}
+
+
+def test_synthetic_file_has_the_requested_size(tmp_path):
+    path = str(tmp_path / "synthetic.ffp")
+    write_synthetic_ffp(path, **_SIZES)
+    reader = FFPReader(path)
+    assert len(reader.nodes) == 3
+    assert sorted(reader.loops["loop"]) == [1, 2, 3, 4, 5]
+    assert len(reader.devices) == 5 * 10
+    assert len(reader.zones) == 40
+
+
+@pytest.mark.parametrize("preset", sorted(PRESETS))
+def test_loops_are_spread_over_every_node(tmp_path, preset):
+    path = str(tmp_path / "synthetic.ffp")
+    sizes = dict(PRESETS[preset], devices_per_loop=1, zones=10)
+    write_synthetic_ffp(path, **sizes, cause_effects=0)
+    loops_per_node = FFPReader(path).loops["node"].value_counts()
+    assert len(loops_per_node) == sizes["nodes"]
+    assert loops_per_node.sum() == sizes["loops"]
+    assert loops_per_node.max() - loops_per_node.min() <= 1
+
+
+def test_synthetic_file_is_reproducible(tmp_path):
+    first, second, other = (str(tmp_path / f"{name}.ffp") for name in ("first", "second", "other"))
+    write_synthetic_ffp(first, **_SIZES)
+    write_synthetic_ffp(second, **_SIZES)
+    write_synthetic_ffp(other, **_SIZES, seed=1)
+    with open(first, "rb") as f1, open(second, "rb") as f2, open(other, "rb") as f3:
+        first, second, other = f1.read(), f2.read(), f3.read()
+    assert first == second
+    assert first != other
+
+
+def test_synthetic_file_sizes_are_checked(tmp_path):
+    with pytest.raises(ValueError):
+        write_synthetic_ffp(str(tmp_path / "synthetic.ffp"), loops=251)
+
+
+def test_run_benchmark_times_every_stage(tmp_path, capsys):
+    path = str(tmp_path / "synthetic.ffp")
+    write_synthetic_ffp(path, **_SIZES)
+    results = run_benchmark(path, str(tmp_path), formats=["csv"])
+    stages = {result["stage"]: result for result in results}
+    assert results[0]["stage"] == "import"
+    assert {"tokenize", "parse", "parse_devices", "refresh_unchanged", "modbus_map", "export_csv"} <= set(stages)
+    assert stages["parse"]["rows"] == 50
+    assert all(result["seconds"] >= 0 for result in results)
+    # printing is left to the command line
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,69 @@
+import json
+import os
+
+import pandas as pd
+
+from conftest import INPUT_DIR, SAMPLE_FILES
+from ffpreader.cli import build_parser, expand_paths, main
+from ffpreader.diff import diff_configurations, diff_tables
+
+
+def test_expand_paths_of_directories_globs_and_files():
+    paths = [os.path.join(INPUT_DIR, name) for name in SAMPLE_FILES]
+    assert expand_paths([INPUT_DIR]) == paths
+    assert expand_paths([os.path.join(INPUT_DIR, "QWP 16*.ffp")]) == paths[:1]
+    assert expand_paths(paths + paths[:1]) == paths
+
+
+def test_parse_prints_the_rows_of_each_file(capsys):
+    assert main(["parse", INPUT_DIR, "--json", "--tables", "zones", "nodes"]) == 0
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(results) == len(SAMPLE_FILES)
+    assert all(set(result["rows"]) == {"zones", "nodes"} for result in results)
+
+
+def test_info_of_a_missing_file_fails(tmp_path, capsys):
+    assert main(["info", str(tmp_path / "missing.ffp")]) == 1
+    assert "missing.ffp" in capsys.readouterr().err
+
+
+def test_export_writes_the_formats_and_skips_unchanged_exports(sample_path, tmp_path, capsys):
+    output_dir = str(tmp_path)
+    assert main(["export", sample_path, "-o", output_dir, "--formats", "csv", "--json"]) == 0
+    written = json.loads(capsys.readouterr().out)["written"]
+    assert written and all(path.endswith(".csv") and os.path.exists(path) for path in written)
+
+    assert main(["export", sample_path, "-o", output_dir, "--formats", "csv", "--json"]) == 0
+    assert json.loads(capsys.readouterr().out)["written"] == []
+    assert main(["export", sample_path, "-o", output_dir, "--formats", "csv", "--json", "--force"]) == 0
+    assert len(json.loads(capsys.readouterr().out)["written"]) == len(written)
+
+
+def test_bench_and_watch_options():
+    parser = build_parser()
+    assert parser.parse_args(["bench", "--workers", "4"]).workers == 4
+    args = parser.parse_args(["watch", "input", "-o", "out", "--poll", "--formats", "csv"])
+    assert (args.watch_dir, args.output_dir, args.poll, args.formats) == ("input", "out", True, ["csv"])
+
+
+def test_diff_tables():
+    old = pd.DataFrame({"zone": [1, 2, 3], "description": ["A", "B", "C"]})
+    new = pd.DataFrame({"zone": [2, 3, 4], "description": ["B", "C2", "D"]})
+    diff = diff_tables(old, new, ["zone"], ["description"])
+    assert diff[["zone", "change"]].values.tolist() == [[1, "removed"], [3, "changed"], [4, "added"]]
+    assert diff.loc[1, ["description_old", "description_new"]].tolist() == ["C", "C2"]
+
+
+def test_diff_tables_matches_repeated_keys_in_order():
+    # a node with a 'P 1' and a 'P 2' section
+    old = pd.DataFrame({"node": [13, 13, 14], "description": ["SUB PANEL", "N", "MAIN"]})
+    new = pd.DataFrame({"node": [13, 13], "description": ["SUB PANEL", "Y"]})
+    diff = diff_tables(old, new, ["node"], ["description"])
+    assert diff[["node", "change", "description_old"]].values.tolist() == [[13, "changed", "N"], [14, "removed", "MAIN"]]
+    assert diff["description_new"].tolist()[0] == "Y"
+
+
+def test_a_file_diffed_against_itself_is_empty(reader):
+    differences = diff_configurations(reader, reader)
+    assert list(differences) == ["zones", "nodes", "loops", "devices"]
+    assert all(df.empty for df in differences.values())
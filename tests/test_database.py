@@ -0,0 +1,47 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from ffpreader.database import read_configuration, read_metadata, write_database
+from ffpreader.ffpreader import FFPReader
+from ffpreader.modbusmapper import ModbusMapper
+
+
+def test_database_round_trip(reader, tmp_path):
+    path = str(tmp_path / "site.sqlite")
+    counts = write_database(reader, path)
+    assert counts["devices"] == len(reader.devices)
+
+    configuration = read_configuration(path)
+    for table in FFPReader.TABLES:
+        pd.testing.assert_frame_equal(configuration[table], getattr(reader, table))
+
+    loaded = FFPReader.from_database(path)
+    for table in FFPReader.TABLES:
+        pd.testing.assert_frame_equal(getattr(loaded, table), getattr(reader, table))
+    assert loaded.encoding == reader.encoding
+    assert loaded.ffp_filepath == read_metadata(path)["source"]
+    pd.testing.assert_frame_equal(loaded.cleaned_devices, reader.cleaned_devices)
+
+    # the register tables give the ModbusMapper frames
+    mapper = ModbusMapper(configuration=reader.configuration)
+    configuration = read_configuration(path, tables=["zones", "devices"], modbus=True)
+    assert list(configuration) == ["zones", "devices"]
+    pd.testing.assert_frame_equal(configuration["zones"], mapper.zones)
+    pd.testing.assert_frame_equal(configuration["devices"], mapper.devices)
+
+    with sqlite3.connect(path) as connection:
+        (rows,) = connection.execute(
+            "SELECT COUNT(*) FROM devices d JOIN device_registers r USING (position) WHERE r.gateway = 1"
+        ).fetchone()
+    assert rows == (mapper.devices["gateway"] == 1).sum()
+
+
+def test_database_without_modbus(reader, tmp_path):
+    path = str(tmp_path / "site.sqlite")
+    write_database(reader, path, modbus=False)
+    with pytest.raises(ValueError):
+        read_configuration(path, modbus=True)
+    with pytest.raises(ValueError):
+        read_configuration(path, tables=["panels"])
@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ffpreader.eventlog import TABLES, EventLog
+from ffpreader.state import StateStore
+
+
+def _append_random_events(log, batches=60, seed=0):
+    """
+    append batches of random status changes of a few objects per table, each batch at one time and
+    some batches sharing a time. Returns the events appended as a DataFrame, in the order appended
+    """
+    rng = np.random.default_rng(seed)
+    last = {}
+    rows = []
+    time = 1_700_000_000.0
+    for _ in range(batches):
+        time += float(rng.choice([0.0, 0.5, 60.0]))
+        table = TABLES[rng.integers(len(TABLES))]
+        numbers = rng.choice(np.arange(1, 9), size=rng.integers(1, 6), replace=False)
+        devices = rng.integers(1, 4, len(numbers)) if table == "devices" else np.zeros(len(numbers), dtype=int)
+        previous = np.array([last.get((table, n, d), 0) for n, d in zip(numbers, devices)])
+        # a change always flips at least one bit
+        bits = previous ^ rng.integers(1, 16, len(numbers))
+        log.append(
+            table,
+            numbers,
+            bits,
+            previous=previous,
+            devices=devices if table == "devices" else None,
+            time=time,
+        )
+        for number, device, new, old in zip(numbers, devices, bits, previous):
+            last[table, number, device] = new
+            rows.append((time, table, number, device, new, old))
+    events = pd.DataFrame(rows, columns=["time", "table", "number", "device", "bits", "previous"])
+    return events.astype({"number": int, "device": int, "bits": int, "previous": int})
+
+
+def _scan(events, start=None, end=None, table=None, number=None, device=None, flag=None):
+    """the events of a query by a full scan"""
+    mask = pd.Series(True, index=events.index)
+    if start is not None:
+        mask &= events["time"] >= start
+    if end is not None:
+        mask &= events["time"] <= end
+    if table is not None:
+        mask &= events["table"] == table
+    if number is not None:
+        mask &= events["number"] == number
+    if device is not None:
+        mask &= events["device"] == device
+    if flag is not None:
+        bit = 1 << StateStore.FLAGS[table][flag]
+        mask &= (events["bits"] & bit) != (events["previous"] & bit)
+    return events[mask].reset_index(drop=True)
+
+
+def _rows(df):
+    """the events of a query result in the layout of _scan"""
+    return pd.DataFrame(
+        {
+            "time": (df["time"] - pd.Timestamp(0)).dt.total_seconds(),
+            "table": df["table"].astype(str),
+            "number": df["number"],
+            "device": df["device"],
+            "bits": df["bits"],
+            "previous": df["previous"],
+        }
+    ).reset_index(drop=True)
+
+
+@pytest.fixture
+def log(tmp_path):
+    with EventLog(str(tmp_path / "site.events"), index_interval=7) as log:
+        yield log
+
+
+def test_query_and_history_match_a_full_scan(log):
+    events = _append_random_events(log)
+    assert len(log) == len(events)
+    rng = np.random.default_rng(1)
+    times = events["time"].to_numpy()
+    for _ in range(100):
+        start, end = sorted(rng.choice(times, 2))
+        start = None if rng.random() < 0.2 else start - float(rng.choice([0.0, 0.25]))
+        end = None if rng.random() < 0.2 else end + float(rng.choice([0.0, 0.25]))
+        table = TABLES[rng.integers(len(TABLES))] if rng.random() < 0.8 else None
+        number = int(rng.integers(1, 9)) if rng.random() < 0.5 else None
+        flag = None
+        if table is not None and rng.random() < 0.5:
+            flag = list(StateStore.FLAGS[table])[rng.integers(len(StateStore.FLAGS[table]))]
+        query = dict(start=start, end=end, table=table, number=number, flag=flag)
+        pd.testing.assert_frame_equal(_rows(log.query(**query)), _scan(events, **query), obj=str(query))
+
+    for table in TABLES:
+        for number in range(1, 9):
+            device = 2 if table == "devices" else None
+            expected = _scan(events, table=table, number=number, device=device)
+            pd.testing.assert_frame_equal(_rows(log.history(table, number, device=device)), expected)
+    with pytest.raises(ValueError):
+        log.history("devices", 1)
+    with pytest.raises(ValueError):
+        log.query(flag="alarm")
+
+
+def test_snapshot_is_the_last_event_of_each_object(log):
+    events = _append_random_events(log)
+    time = events["time"].iloc[len(events) // 2]
+    expected = events[events["time"] <= time].drop_duplicates(["table", "number", "device"], keep="last")
+    snapshot = log.snapshot(time).astype({"table": str})
+    columns = ["table", "number", "device", "bits"]
+    assert sorted(snapshot[columns].itertuples(index=False)) == sorted(expected[columns].itertuples(index=False))
+    zones = log.snapshot(time, table="zones")
+    assert list(zones.columns) == ["time", "table", "zone", "bits"]
+
+
+def test_compact_keeps_the_snapshot(log):
+    events = _append_random_events(log)
+    before = events["time"].iloc[2 * len(events) // 3]
+    later = events["time"].iloc[-1]
+    snapshots = [log.snapshot(time) for time in (before, later)]
+    recent = log.query(start=before + 0.25)
+
+    removed = log.compact(before=before)
+    assert removed > 0
+    assert len(log) == len(events) - removed
+    for time, snapshot in zip((before, later), snapshots):
+        pd.testing.assert_frame_equal(log.snapshot(time), snapshot)
+    pd.testing.assert_frame_equal(log.query(start=before + 0.25), recent)
+    # the index written with the compacted log is read back on open
+    with EventLog(log.path) as reopened:
+        pd.testing.assert_frame_equal(reopened.query(), log.query())
+
+
+def test_partial_record_is_dropped_on_open(tmp_path):
+    path = str(tmp_path / "site.events")
+    with EventLog(path) as log:
+        log.append("zones", [1, 2, 3], [1, 1, 1], time=10.0)
+        expected = log.query()
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 5)
+    with EventLog(path) as log:
+        assert len(log) == 3
+        pd.testing.assert_frame_equal(log.query(), expected)
+        log.append("zones", [4], [1], time=11.0)
+        assert log.query()["number"].tolist() == [1, 2, 3, 4]
+    assert (os.path.getsize(path) - 24) % 16 == 0
+
+
+def test_append_errors(log, tmp_path):
+    log.append("zones", [1], [1], time=10.0)
+    with pytest.raises(ValueError):
+        log.append("zones", [1], [0], time=9.0)
+    not_a_log = tmp_path / "other.events"
+    not_a_log.write_bytes(b"something else entirely")
+    with pytest.raises(ValueError):
+        EventLog(str(not_a_log))
+
+
+def test_record_appends_the_changes_of_a_state_store(log):
+    store = StateStore()
+    store.update(1, 6002, [0x0011])
+    assert log.record(store, time=1.0) == 2
+    assert log.record(store, time=2.0) == 0
+    store.update(1, 6002, [0x0010])
+    assert log.record(store, time=3.0) == 1
+    assert log.history("zones", 1)["bits"].tolist() == [1, 0]
+
+    # a new log object carries on from the last logged status
+    with EventLog(log.path) as reopened:
+        assert reopened.record(store, time=4.0) == 0
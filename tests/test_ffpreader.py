@@ -0,0 +1,44 @@
+import pytest
+
+from ffpreader.ffpreader import FFPReader
+
+
+def test_tables_are_parsed(reader):
+    for table in FFPReader.TABLES:
+        assert len(getattr(reader, table)) > 0
+    assert reader.devices["device"].between(1, 128).all()
+    assert reader.loops["loop"].notna().all()
+
+
+def test_tables_option_parses_only_some_tables(sample_path):
+    reader = FFPReader(sample_path, tables=["zones"])
+    assert reader.zones is not None
+    assert reader.nodes is None and reader.loops is None and reader.devices is None
+    with pytest.raises(ValueError):
+        FFPReader(sample_path, tables=["panels"])
+
+
+def test_cleaned_devices(reader):
+    placeholders = reader.cleaning_rules["placeholder_descriptions"]
+    devices = reader.cleaned_devices
+    assert len(devices) < len(reader.devices)
+    assert not devices["description"].isin(placeholders).any()
+    assert not devices["description"].str.contains("[/&]").any()
+    assert (devices["description"] == devices["description"].str.strip()).all()
+    assert (devices["zone"] != 0).all()
+    assert list(devices.columns[-2:]) == ["name", "locationId"]
+    assert devices[["loop", "device"]].equals(devices[["loop", "device"]].sort_values(["loop", "device"]))
+
+    row = devices.iloc[0]
+    assert row["name"] == (
+        f"L{row['loop']} - D{row['device']} - Z{row['zone']} - {row['description']} - {row['type']}"
+    )
+    located = devices[devices["locationId"] != ""]
+    assert located["locationId"].str.startswith("IRD-").all()
+    assert (located["description"].str.split(" ").str[0] == located["locationId"]).all()
+
+
+def test_cleaning_rules_override_the_defaults(sample_path):
+    reader = FFPReader(sample_path, tables=["zones"], cleaning_rules={"illegal_chars": {" ": "_"}})
+    assert reader.cleaning_rules["placeholder_descriptions"] == ["", "Unassigned Text", "SPARE"]
+    assert not reader.cleaned_zones["description"].str.contains(" ").any()
@@ -0,0 +1,43 @@
+import logging
+
+import pytest
+
+from ffpreader.instrumentation import Stats
+
+
+def test_timer_accumulates_calls_and_logs_each_stage(caplog):
+    stats = Stats("test")
+    with caplog.at_level(logging.DEBUG, logger="ffpreader.instrumentation"):
+        for _ in range(2):
+            with stats.timer("stage"):
+                pass
+    assert stats.stages["stage"]["calls"] == 2
+    assert stats.stages["stage"]["seconds"] >= stats.stages["stage"]["last_seconds"] >= 0
+    records = [record for record in caplog.records if getattr(record, "stage", None) == "stage"]
+    assert len(records) == 2
+    assert records[0].component == "test"
+
+
+def test_timer_records_a_stage_that_raised():
+    stats = Stats("test")
+    with pytest.raises(RuntimeError):
+        with stats.timer("failing"):
+            raise RuntimeError
+    assert stats.stages["failing"]["calls"] == 1
+
+
+def test_counters():
+    stats = Stats("test")
+    stats.count("parses")
+    stats.count("parses", 2)
+    stats.set("rows", 10)
+    stats.set("rows", 12)
+    assert stats.as_dict() == {"component": "test", "stages": {}, "counters": {"parses": 3, "rows": 12}}
+
+
+def test_reader_records_its_stages(reader):
+    stages, counters = reader.stats.stages, reader.stats.counters
+    for stage in ["parse", "tokenize", "parse_zones", "parse_nodes", "parse_loops", "parse_devices"]:
+        assert stages[stage]["calls"] >= 1
+    assert counters["devices_rows"] == len(reader.devices)
+    assert counters["sections"] == len(reader.section_spans)
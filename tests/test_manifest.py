@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from ffpreader.benchmark import write_synthetic_ffp
+from ffpreader.exports import write_csv_exports, write_excel_exports, write_sqlite_exports
+from ffpreader.ffpreader import FFPReader
+from ffpreader.manifest import MANIFEST_VERSION, ExportManifest, frame_digest
+
+
+def test_frame_digest():
+    df = pd.DataFrame({"zone": [1, 2], "description": ["A", "B"]})
+    assert frame_digest(df) == frame_digest(df.copy())
+    assert frame_digest(df) != frame_digest(df.assign(description=["A", "C"]))
+    assert frame_digest(df) != frame_digest(df.astype({"zone": float}))
+    assert frame_digest(df) != frame_digest(df.rename(columns={"zone": "node"}))
+    assert frame_digest(df) != frame_digest(df.set_axis([1, 0]))
+    # cells holding lists are hashed by their text
+    registers = pd.DataFrame({"bits": [[0, 1], [2, 3]]})
+    assert frame_digest(registers) != frame_digest(pd.DataFrame({"bits": [[0, 1], [2, 4]]}))
+
+
+def test_unchanged_record_and_save(tmp_path):
+    export = tmp_path / "site.ffp.zones.csv"
+    export.write_text("zone\n1\n")
+    manifest = ExportManifest(str(tmp_path / "site.ffp.manifest.json"), source=str(tmp_path / "site.ffp"))
+    digests = manifest.digests({"zones": pd.DataFrame({"zone": [1]})}, index=False)
+    assert "options" in digests
+    assert not manifest.unchanged(str(export), digests)
+    manifest.record(str(export), digests)
+    assert manifest.unchanged(str(export), digests)
+    manifest.save()
+
+    with open(manifest.path) as f:
+        saved = json.load(f)
+    assert saved["version"] == MANIFEST_VERSION
+    assert list(saved["exports"]) == ["site.ffp.zones.csv"]
+
+    reloaded = ExportManifest(manifest.path, source=str(tmp_path / "site.ffp"))
+    assert reloaded.unchanged(str(export), digests)
+    assert not reloaded.unchanged(str(export), {**digests, "zones": "0" * 32})
+    # a file modified or deleted since it was recorded is written again
+    export.write_text("zone\n1\n2\n")
+    assert not reloaded.unchanged(str(export), digests)
+    export.unlink()
+    assert not reloaded.unchanged(str(export), digests)
+
+
+def test_exports_of_another_source_are_not_unchanged(tmp_path):
+    export = tmp_path / "site.ffp.zones.csv"
+    export.write_text("zone\n1\n")
+    path = str(tmp_path / "site.ffp.manifest.json")
+    manifest = ExportManifest(path, source=str(tmp_path / "a" / "site.ffp"))
+    digests = manifest.digests({"zones": pd.DataFrame({"zone": [1]})})
+    manifest.record(str(export), digests)
+    manifest.save()
+    assert ExportManifest(path, source=str(tmp_path / "a" / "site.ffp")).unchanged(str(export), digests)
+    assert not ExportManifest(path, source=str(tmp_path / "b" / "site.ffp")).unchanged(str(export), digests)
+
+
+def test_save_keeps_the_entries_of_other_processes(tmp_path):
+    path = str(tmp_path / "site.ffp.manifest.json")
+    first, second = ExportManifest(path), ExportManifest(path)
+    for manifest, name in [(first, "a.csv"), (second, "b.csv")]:
+        (tmp_path / name).write_text(name)
+        manifest.record(str(tmp_path / name), {"table": name})
+        manifest.save()
+    assert sorted(ExportManifest(path).entries) == ["a.csv", "b.csv"]
+
+
+@pytest.mark.parametrize("contents", ["not json", json.dumps({"version": MANIFEST_VERSION - 1, "exports": {}})])
+def test_unreadable_or_outdated_manifests_are_empty(tmp_path, contents):
+    path = tmp_path / "site.ffp.manifest.json"
+    path.write_text(contents)
+    assert ExportManifest(str(path)).entries == {}
+
+
+@pytest.fixture
+def site(tmp_path):
+    path = str(tmp_path / "site.ffp")
+    write_synthetic_ffp(path, nodes=2, loops=4, devices_per_loop=20, zones=50)
+    os.makedirs(tmp_path / "out")
+    return path, str(tmp_path / "out")
+
+
+@pytest.mark.parametrize("exporter", [write_csv_exports, write_excel_exports, write_sqlite_exports])
+def test_exporters_skip_unchanged_tables(site, exporter):
+    path, output_dir = site
+    written = exporter(FFPReader(path), output_dir)
+    assert written
+    assert exporter(FFPReader(path), output_dir) == []
+    assert exporter(FFPReader(path), output_dir, force=True) == written
+
+    reader = FFPReader(path)
+    reader.zones.loc[0, "description"] = "RENAMED ZONE"
+    rewritten = exporter(reader, output_dir)
+    assert rewritten and set(rewritten) <= set(written)
+    if exporter is write_csv_exports:
+        names = [os.path.basename(file) for file in rewritten]
+        assert names == ["site.ffp.zones.csv", "site.ffp.zones (cleaned).csv"]
+
+
+def test_exports_of_a_moved_file_are_rewritten(site, tmp_path):
+    path, output_dir = site
+    write_csv_exports(FFPReader(path), output_dir)
+    os.makedirs(tmp_path / "other")
+    other = str(tmp_path / "other" / "site.ffp")
+    shutil.copyfile(path, other)
+    assert len(write_csv_exports(FFPReader(other), output_dir)) == 6
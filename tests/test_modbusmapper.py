@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+from ffpreader.modbusmapper import ModbusMapper
+from ffpreader.pollplan import _layout_registers
+
+
+def _mapper():
+    """a mapper over numbers at both ends of every register block, and one past the last block"""
+    zones = pd.DataFrame({"zone": [1, 4, 5, 1000, 1001, 2000, 2001, 2500, 2501]})
+    loops = pd.DataFrame({"loop": [1, 2, 3, 90, 91, 180, 181, 250, 251], "node": 1})
+    nodes = pd.DataFrame({"node": [1, 4, 5, 100, 101]})
+    devices = pd.DataFrame(
+        {
+            "loop": [1, 1, 1, 12, 90, 91, 180, 181, 250, 251],
+            "device": [1, 4, 5, 90, 128, 1, 128, 1, 128, 1],
+        }
+    )
+    # the frames are mapped as they are set
+    return ModbusMapper(zones=zones, loops=loops, nodes=nodes, devices=devices)
+
+
+def _register(df, *numbers):
+    """(gateway, holding register, alarm bit) of the row numbered numbers, eg (loop, device)"""
+    columns = ["zone"] if len(numbers) == 1 else ["loop", "device"]
+    row = df.loc[(df[columns] == list(numbers)).all(axis=1)].iloc[0]
+    return row["gateway"], row["holding_register"], row["alarm_bit_offset"]
+
+
+def test_registers_of_the_documented_ranges():
+    mapper = _mapper()
+    assert _register(mapper.zones, 1) == (1, 6002, 0)
+    assert _register(mapper.zones, 5) == (1, 6003, 0)
+    assert _register(mapper.zones, 1001) == (2, 12352, 0)
+    assert _register(mapper.zones, 2500) == (3, 18826, 12)
+    assert _register(mapper.devices, 12, 90) == (1, 242 + 11 * 32 + 22, 4)
+    assert _register(mapper.devices, 250, 128) == (3, 12942 + 69 * 32 + 31, 12)
+    loop = mapper.loops.loc[mapper.loops["loop"] == 2].iloc[0]
+    assert (loop["gateway"], loop["holding_register"], loop["open_circuit_bit_offset"]) == (1, 152, 8)
+
+
+@pytest.mark.parametrize("table", list(ModbusMapper.REGISTER_LAYOUT))
+def test_registers_match_the_layout_arithmetic_of_the_poll_plan(table):
+    mapped = getattr(_mapper(), table)
+    numbers = [column for column in ("zone", "node", "loop", "device") if column in mapped]
+    expected = _layout_registers(mapped[numbers], table)
+    pd.testing.assert_series_equal(
+        pd.to_numeric(mapped["gateway"]).astype(float), expected["gateway"], check_names=False
+    )
+    pd.testing.assert_series_equal(
+        pd.to_numeric(mapped["holding_register"]).astype(float), expected["holding_register"], check_names=False
+    )
+
+
+def test_objects_outside_every_block_have_no_register():
+    mapper = _mapper()
+    for table, column, number in [("zones", "zone", 2501), ("loops", "loop", 251), ("nodes", "node", 101)]:
+        row = getattr(mapper, table).loc[lambda df: df[column] == number].iloc[0]
+        assert pd.isna(row["gateway"]) and pd.isna(row["holding_register"]), table
+
+
+@pytest.mark.parametrize("zone, gateway", [(1000, 1), (1001, 2), (2000, 2), (2001, 3)])
+def test_zones_at_the_gateway_boundaries_are_kept(zone, gateway):
+    # the zones split used to drop zone 1001, between its first and second blocks
+    mapper = ModbusMapper(zones=pd.DataFrame({"zone": [zone]}))
+    assert _register(mapper.zones, zone)[0] == gateway
+    blocks = mapper.split_by_modbus_gateway("zones")
+    assert [block["data"]["zone"].tolist() for block in blocks if len(block["data"])] == [[zone]]
+    assert [block["gateway"] for block in blocks if len(block["data"])] == [gateway]
+
+
+def test_bit_offsets_of_an_all_numeric_devices_frame_are_integers():
+    # loop 251 has no gateway, which makes the gateway column and so every row float
+    mapper = ModbusMapper(devices=pd.DataFrame({"loop": [1, 1, 251], "device": [1, 6, 1]}))
+    assert mapper.devices["alarm_bit_offset"].tolist() == [0, 4, 0]
+    assert all(isinstance(offset, int) for offset in mapper.devices["alarm_bit_offset"])
+
+
+def test_decimals_are_the_bits_of_the_offsets():
+    zones = _mapper().zones.set_index("zone")
+    decimals = ["alarm_decimal", "prealarm_decimal", "fault_decimal", "isolate_decimal"]
+    assert zones.loc[1, decimals].tolist() == [1, 2, 4, 8]
+    assert zones.loc[4, "isolate_decimal"] == 1 << 15
+    with pytest.raises(ValueError):
+        ModbusMapper().calculate_register_decimal(16)
+
+
+def test_split_by_gateway_follows_the_blocks():
+    mapper = _mapper()
+    zones = mapper.split_by_modbus_gateway("zones")
+    assert [block["description"] for block in zones] == [
+        "zones_Z1_to_Z1000",
+        "zones_Z1001_to_Z2000",
+        "zones_Z2001_to_Z2500",
+    ]
+    assert [block["data"]["zone"].tolist() for block in zones] == [[1, 4, 5, 1000], [1001, 2000], [2001, 2500, 2501]]
+    devices = mapper.split_by_modbus_gateway("devices")
+    assert sum(len(block["data"]) for block in devices) == len(mapper.devices)
+    assert devices[1]["data"]["loop"].tolist() == [91, 180]
+    assert mapper.split_by_modbus_gateway("nodes")[0]["data"] is mapper.nodes
+    assert mapper.split_by_modbus_gateway("panels") == []
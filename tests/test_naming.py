@@ -0,0 +1,50 @@
+import re
+
+import pandas as pd
+import pytest
+
+from ffpreader.naming import DEFAULT_NAMING_PATTERNS, parse_names
+
+
+def test_parse_names_splits_the_naming_convention():
+    descriptions = pd.Series(
+        ["IRD-ICG-L05M-FCG-01 MGF OVERFLOW", "  MCP-T4-B2-LOBBY-12", "SPARE", None]
+    )
+    df = parse_names(descriptions, DEFAULT_NAMING_PATTERNS["devices"])
+    assert df.iloc[0].tolist() == ["IRD", "ICG", "L05M", "FCG", "01", "MGF OVERFLOW"]
+    assert df.iloc[1].tolist() == ["MCP", "T4", "B02", "LOBBY", "12", ""]
+    assert df.iloc[2:].isna().all(axis=None)
+    assert isinstance(df["building"].dtype, pd.CategoricalDtype)
+    assert not isinstance(df["room"].dtype, pd.CategoricalDtype)
+
+
+def test_zone_levels_are_normalized_like_device_levels():
+    zones = parse_names(
+        pd.Series(["TOWER 4 LEVEL 36 NORTH", "TOWER 2 BASEMENT 3", "CARPARK LEVEL 5M"]),
+        DEFAULT_NAMING_PATTERNS["zones"],
+    )
+    assert zones["level"].tolist() == ["L36", "B03", "L05M"]
+    assert zones["building"].tolist() == ["TOWER 4", "TOWER 2", "CARPARK"]
+    assert zones["text"].tolist() == ["NORTH", "", ""]
+
+
+def test_locations_of_the_sample_files(reader):
+    locations = reader.locations
+    devices = locations.devices
+    assert len(devices) == len(reader.cleaned_devices)
+    # rows are matched when the whole description follows the pattern
+    pattern = re.compile(DEFAULT_NAMING_PATTERNS["devices"])
+    matched = devices["description"].fillna("").str.strip().map(lambda text: bool(pattern.match(text)))
+    assert devices["text"].notna().tolist() == matched.tolist()
+    assert len(locations.unmatched()) == (~matched).sum()
+
+    rollup = locations.rollup("devices")
+    assert rollup["count"].sum() == devices["level"].notna().sum()
+    building, level = rollup.sort_values("count").iloc[-1][["building", "level"]]
+    on_level = locations.on_level(level, building=building)
+    expected = devices[(devices["building"] == building) & (devices["level"] == level)]
+    assert on_level.index.equals(expected.index)
+    assert len(locations.on_level(level)) == (devices["level"] == level).sum()
+    assert locations.on_level("L99Z").empty
+    with pytest.raises(ValueError):
+        locations.rollup("zones", by=["room"])
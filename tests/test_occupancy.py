@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ffpreader.occupancy import Occupancy
+
+
+def _frames():
+    """
+    node 1 has loops 1 and 2 (without devices), node 2 has another loop 1. Device rows are in file
+    order, the second loop 1 section starts where the device number drops back
+    """
+    loops = pd.DataFrame({"loop": [1, 2, 1], "node": [1, 1, 2]})
+    devices = pd.DataFrame(
+        {
+            "loop": [1, 1, 1, 1, 1, 1],
+            "device": [1, 2, 3, 4, 1, 5],
+            "description": ["SD A", "SD B", "SPARE", "MCP C", "SD D", "SD E"],
+        }
+    )
+    zones = pd.DataFrame({"zone": [1, 2, 3], "description": ["ZONE 1", "Unassigned Text", "ZONE 3"]})
+    return devices, zones, loops
+
+
+def test_loops_are_keyed_by_node_and_loop():
+    devices, zones, loops = _frames()
+    occupancy = Occupancy(devices, zones, loops)
+    stats = occupancy.loop_stats()
+    assert stats[["node", "loop", "used"]].values.tolist() == [[1, 1, 3], [1, 2, 0], [2, 1, 2]]
+    assert (stats["used"] + stats["free"] == Occupancy.DEVICES_PER_LOOP).all()
+
+    with pytest.raises(ValueError, match="more than one node"):
+        occupancy.used_addresses(1)
+    assert occupancy.used_addresses(1, node=1).tolist() == [1, 2, 4]
+    assert occupancy.used_addresses(1, node=2).tolist() == [1, 5]
+    assert not occupancy.is_used(1, 3, node=1)
+    assert occupancy.free_addresses(1, count=3, node=2).tolist() == [2, 3, 4]
+    assert occupancy.free_run(1, 3, node=1) == 5
+    assert occupancy.free_run(2, Occupancy.DEVICES_PER_LOOP) == 1
+    with pytest.raises(ValueError):
+        occupancy.used_addresses(3)
+    assert occupancy.free_zones(count=3).tolist() == [2, 4, 5]
+
+
+def test_node_stats_add_up_the_loop_stats(reader):
+    occupancy = reader.occupancy
+    loops = occupancy.loop_stats()
+    nodes = occupancy.node_stats()
+    expected = loops.dropna(subset=["node"]).groupby("node")[["used", "free"]].sum()
+    assert nodes.set_index("node")[["used", "free"]].equals(expected)
+    assert nodes["loops"].sum() == len(reader.loops)
+    assert np.allclose(nodes["occupancy"], nodes["used"] / (nodes["used"] + nodes["free"]))
+
+
+def test_used_addresses_match_the_configured_devices(reader):
+    occupancy = reader.occupancy
+    placeholders = reader.cleaning_rules["placeholder_descriptions"]
+    devices = reader.devices
+    configured = devices[~devices["description"].fillna("").str.strip().isin(placeholders)]
+    counts = reader.loops["loop"].value_counts()
+    for loop in counts.index[counts == 1][:20]:
+        expected = sorted(set(configured.loc[configured["loop"] == loop, "device"].astype(int)))
+        assert occupancy.used_addresses(int(loop)).tolist() == expected, loop
+
+
+def test_compare_reports_added_removed_and_moved_devices():
+    devices, zones, loops = _frames()
+    old = Occupancy(devices, zones, loops)
+    # SD B moves from address 2 to 6 on node 1 loop 1, SD E is removed, SD F added on loop 2 of node 1
+    devices = pd.DataFrame(
+        {
+            "loop": [1, 1, 1, 1, 2, 1],
+            "device": [1, 3, 4, 6, 7, 1],
+            "description": ["SD A", "SPARE", "MCP C", "SD B", "SD F", "SD D"],
+        }
+    )
+    zones = zones.assign(description=["ZONE 1", "ZONE 2", "Unassigned Text"])
+    new = Occupancy(devices, zones, loops)
+
+    changes = old.compare(new)
+    rows = changes.astype(object).where(changes.notna(), None).values.tolist()
+    assert sorted(rows, key=str) == sorted(
+        [
+            ["added", 1, 2, 7, "SD F", None, None, None],
+            ["removed", 2, 1, 5, "SD E", None, None, None],
+            ["moved", 1, 1, 6, "SD B", 1, 1, 2],
+        ],
+        key=str,
+    )
+    assert old.compare(old).empty
+    assert old.compare_zones(new)[["change", "zone"]].values.tolist() == [["added", 2], ["removed", 3]]
+
+
+def test_without_loops_there_is_one_loop_per_number():
+    devices, _, _ = _frames()
+    occupancy = Occupancy(devices)
+    stats = occupancy.loop_stats()
+    assert stats["loop"].tolist() == [1]
+    assert stats["node"].isna().all()
+    assert occupancy.used_addresses(1).tolist() == [1, 2, 4, 5]
+    with pytest.raises(ValueError):
+        occupancy.free_zones()
@@ -0,0 +1,60 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+from ffpreader import parallel
+from ffpreader.ffpreader import FFPReader
+from ffpreader.parallel import SectionsChanged, balanced_chunks, parse_spans
+from ffpreader.utils import find_section_spans, map_file, section_header
+
+
+def test_balanced_chunks():
+    assert balanced_chunks([(0, 10), (10, 15), (15, 20)], 2) == [[0], [1, 2]]
+    assert balanced_chunks([(0, 1)], 4) == [[0]]
+    assert balanced_chunks([], 4) == []
+    spans = [(start, start + size) for start, size in zip(range(0, 10000, 100), [7, 90, 3, 40, 55] * 20)]
+    chunks = balanced_chunks(spans, 3)
+    assert sorted(position for chunk in chunks for position in chunk) == list(range(len(spans)))
+    assert all(chunk == sorted(chunk) for chunk in chunks)
+    loads = [sum(spans[i][1] - spans[i][0] for i in chunk) for chunk in chunks]
+    # the largest span bounds how unbalanced the greedy assignment can be
+    assert max(loads) - min(loads) <= 90
+
+
+def test_parallel_parse_equals_a_serial_parse(reader, sample_path, monkeypatch):
+    monkeypatch.setattr(FFPReader, "_PARALLEL_MIN_BYTES", 0)
+    parallel_reader = FFPReader(sample_path, workers=2)
+    assert any(stage.startswith("parallel_") for stage in parallel_reader.stats.stages)
+    for table in FFPReader.TABLES:
+        pd.testing.assert_frame_equal(getattr(parallel_reader, table), getattr(reader, table))
+
+
+def test_workers_reject_sections_that_changed(reader, sample_path):
+    with map_file(sample_path) as buffer:
+        spans = [
+            span
+            for span in find_section_spans(buffer)
+            if section_header(buffer, span, "ascii").startswith(FFPReader._NODE_SECTION_FLAG)
+        ]
+        digests = [hashlib.blake2b(buffer[start:end], digest_size=16).digest() for start, end in spans]
+    changed = list(digests)
+    changed[7] = bytes(16)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        nodes = parse_spans(pool, sample_path, spans, digests, "ascii", "_parse_node_section_to_dict", chunks=4)
+        with pytest.raises(SectionsChanged):
+            parse_spans(pool, sample_path, spans, changed, "ascii", "_parse_node_section_to_dict", chunks=4)
+    assert [node["description"] for node in nodes] == reader.nodes["description"].tolist()
+
+
+def test_a_changed_file_is_parsed_serially(reader, sample_path, monkeypatch):
+    def changed(*args, **kwargs):
+        raise SectionsChanged(f"'{sample_path}' changed while it was being parsed.")
+
+    monkeypatch.setattr(FFPReader, "_PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(parallel, "parse_spans", changed)
+    fallback_reader = FFPReader(sample_path, workers=2)
+    assert fallback_reader.stats.counters["parallel_fallbacks"] > 0
+    for table in FFPReader.TABLES:
+        pd.testing.assert_frame_equal(getattr(fallback_reader, table), getattr(reader, table))
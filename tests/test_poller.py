@@ -0,0 +1,119 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ffpreader.poller import ModbusError, ModbusPoller, ModbusSimulator
+from ffpreader.state import StateStore
+
+
+def _registers(size, seed):
+    return np.random.default_rng(seed).integers(0, 1 << 16, size, dtype=np.uint16)
+
+
+async def _start(registers, **kwargs):
+    simulator = ModbusSimulator(registers, **kwargs)
+    await simulator.start()
+    return simulator
+
+
+def test_poll_once_reads_the_plan_from_each_gateway():
+    plan = pd.DataFrame(
+        {"gateway": [1, 1, 1, 2], "start_register": [10, 100, 300, 50], "count": [5, 125, 20, 10]}
+    )
+
+    async def poll():
+        simulators = {gateway: await _start(_registers(400, gateway), delay=0.001) for gateway in (1, 2)}
+        poller = ModbusPoller(
+            {gateway: ("127.0.0.1", simulator.port) for gateway, simulator in simulators.items()},
+            plan=plan,
+            max_in_flight=2,
+        )
+        try:
+            return simulators, await poller.poll_once(), poller.metrics
+        finally:
+            await poller.close()
+            for simulator in simulators.values():
+                await simulator.close()
+
+    simulators, registers, metrics = asyncio.run(poll())
+    for gateway, start, count in zip(plan["gateway"], plan["start_register"], plan["count"]):
+        expected = simulators[gateway].registers[start : start + count]
+        np.testing.assert_array_equal(registers[gateway][start : start + count], expected)
+    # registers outside the plan are not read
+    assert registers[1][:10].sum() == 0
+    assert len(registers[2]) == 60
+    assert (metrics["cycles"], metrics["requests"], metrics["errors"], metrics["connects"]) == (1, 4, 0, 2)
+
+
+def test_an_exception_response_fails_the_cycle_and_leaves_nothing_pending():
+    plan = pd.DataFrame({"gateway": 1, "start_register": [0, 20, 195], "count": [10, 10, 10]})
+
+    async def poll():
+        simulator = await _start(_registers(200, 0), delay=0.01)
+        poller = ModbusPoller({1: ("127.0.0.1", simulator.port)}, plan=plan)
+        try:
+            with pytest.raises(ModbusError) as error:
+                await poller.poll_once()
+            await asyncio.sleep(0.05)
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            return error.value, poller._connections[1]._pending, tasks, poller.metrics
+        finally:
+            await poller.close()
+            await simulator.close()
+
+    error, pending, tasks, metrics = asyncio.run(poll())
+    # illegal data address, the last request reads past the simulator's registers
+    assert error.code == 2
+    assert pending == {}
+    # only the connection's receiver and the simulator's handler are left running
+    assert len(tasks) == 2
+    assert metrics["errors"] == 1
+
+
+def test_reconnects_after_the_gateway_restarts():
+    registers = _registers(200, 1)
+    plan = pd.DataFrame({"gateway": [1], "start_register": [0], "count": [100]})
+
+    async def poll():
+        simulator = await _start(registers)
+        port = simulator.port
+        poller = ModbusPoller({1: ("127.0.0.1", port)}, plan=plan, timeout=1.0)
+        try:
+            await poller.poll_once()
+            await simulator.close()
+            await asyncio.sleep(0.01)
+            with pytest.raises((ConnectionError, OSError)):
+                await poller.poll_once()
+            simulator = await _start(registers, port=port)
+            return await poller.poll_once(), poller.metrics
+        finally:
+            await poller.close()
+            await simulator.close()
+
+    result, metrics = asyncio.run(poll())
+    np.testing.assert_array_equal(result[1], registers[:100])
+    assert metrics["connects"] == 2
+    assert (metrics["cycles"], metrics["errors"]) == (2, 1)
+
+
+def test_run_updates_a_state_store():
+    store = StateStore()
+    words = _registers(store.registers.shape[1], 2)
+    plan = pd.DataFrame({"gateway": [1, 1], "start_register": [6002, 6127], "count": [125, 125]})
+
+    async def run():
+        simulator = await _start(words)
+        poller = ModbusPoller({1: ("127.0.0.1", simulator.port)}, plan=plan)
+        cycles = []
+        try:
+            await poller.run(interval=0.0, cycles=2, store=store, on_cycle=cycles.append)
+        finally:
+            await poller.close()
+            await simulator.close()
+        return cycles
+
+    assert len(asyncio.run(run())) == 2
+    np.testing.assert_array_equal(store.registers[1, 6002:6252], words[6002:6252])
+    assert store.registers[1, :6002].sum() == 0
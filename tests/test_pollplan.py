@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ffpreader.benchmark import write_synthetic_ffp
+from ffpreader.ffpreader import FFPReader
+from ffpreader.modbusmapper import ModbusMapper
+from ffpreader.pollplan import (
+    MAX_READ_REGISTERS,
+    PLAN_COLUMNS,
+    build_poll_plan,
+    configured_registers,
+    full_range_plan,
+    plan_reads,
+    summarize,
+)
+
+
+def _covered(plan):
+    """(gateway, register) of every register read by a plan"""
+    return [
+        (gateway, register)
+        for gateway, start, count in zip(plan["gateway"], plan["start_register"], plan["count"])
+        for register in range(start, start + count)
+    ]
+
+
+@pytest.mark.parametrize("gap_tolerance", [0, 3, 50])
+@pytest.mark.parametrize("max_registers", [1, 10, MAX_READ_REGISTERS])
+def test_requests_cover_every_register_once(max_registers, gap_tolerance):
+    rng = np.random.default_rng(max_registers + gap_tolerance)
+    registers = pd.DataFrame(
+        {"gateway": rng.integers(1, 4, 500), "holding_register": rng.integers(100, 2000, 500)}
+    ).drop_duplicates()
+    plan = plan_reads(registers, max_registers, gap_tolerance)
+    assert list(plan.columns) == PLAN_COLUMNS
+    covered = _covered(plan)
+    assert len(covered) == len(set(covered))
+    used = set(zip(registers["gateway"], registers["holding_register"]))
+    assert used <= set(covered)
+    assert plan["used_registers"].sum() == len(used)
+    assert (plan["count"] <= max_registers).all()
+    # unused registers are only read within gap_tolerance of a used one
+    unused = sorted(set(covered) - used)
+    assert all(
+        any((gateway, register - gap) in used for gap in range(1, gap_tolerance + 1))
+        for gateway, register in unused
+    )
+
+
+def test_gap_tolerance_saves_requests():
+    registers = pd.DataFrame({"gateway": 1, "holding_register": [100, 102, 104, 110]})
+    assert plan_reads(registers)["count"].tolist() == [1, 1, 1, 1]
+    assert plan_reads(registers, gap_tolerance=1)["count"].tolist() == [5, 1]
+    assert plan_reads(registers, gap_tolerance=5)["count"].tolist() == [11]
+    assert plan_reads(registers, max_registers=4, gap_tolerance=5)["count"].tolist() == [3, 1, 1]
+    with pytest.raises(ValueError):
+        plan_reads(registers, max_registers=MAX_READ_REGISTERS + 1)
+    with pytest.raises(ValueError):
+        plan_reads(registers, gap_tolerance=-1)
+
+
+def test_mapped_and_unmapped_frames_give_the_same_plan(tmp_path):
+    path = str(tmp_path / "site.ffp")
+    write_synthetic_ffp(path, nodes=2, loops=6, devices_per_loop=30, zones=60)
+    configuration = FFPReader(path).cleaned_configuration
+    mapper = ModbusMapper(configuration=configuration)
+    mapped = {table: getattr(mapper, table) for table in configuration}
+    pd.testing.assert_frame_equal(configured_registers(mapped), configured_registers(configuration))
+    plan = build_poll_plan(configuration, gap_tolerance=8)
+    assert plan["objects"].sum() == sum(len(df) for df in configuration.values())
+    assert set(plan["tables"].str.split(",").sum()) == set(configuration)
+
+
+def test_full_range_plan_covers_the_register_layout():
+    plan = full_range_plan()
+    summary = summarize(plan)
+    assert summary["requests"] == len(plan)
+    assert summary["registers_read"] == sum(gateway["registers_read"] for gateway in summary["gateways"].values())
+    zones = plan[plan["tables"] == "zones"]
+    assert zones["objects"].sum() == 2500
+    assert plan.loc[plan["tables"] == "devices", "objects"].sum() == 250 * 128
+    assert plan.loc[plan["tables"] == "nodes", "count"].sum() == 25
+
+
+def test_empty_configuration():
+    assert configured_registers({}).empty
+    assert build_poll_plan({}).empty
@@ -0,0 +1,64 @@
+import fnmatch
+
+import pandas as pd
+import pytest
+
+
+def _queries(descriptions):
+    """substrings of every 400th description, cutting tokens at both ends, plus fixed queries"""
+    queries = ["FIRE CUPBOARD", "cupboard", "L05", "-", " ", "ZZZ NOT THERE", "OPT"]
+    for description in descriptions[::400]:
+        queries += [description, description[:5], description[3:11], description[-6:], description.lower()]
+    return [query for query in queries if query]
+
+
+def test_find_matches_a_pandas_filter(reader):
+    devices, index = reader.devices, reader.query
+    upper = devices["description"].fillna("").str.upper()
+    for query in _queries(devices["description"].dropna().tolist()):
+        expected = devices.index[upper.str.contains(query.upper(), regex=False)]
+        assert index.find(query).index.equals(expected), query
+
+
+def test_find_prefix_and_match_match_a_pandas_filter(reader):
+    devices, index = reader.devices, reader.query
+    upper = devices["description"].fillna("").str.upper()
+    for description in devices["description"].dropna().tolist()[::400]:
+        prefix = description[:8]
+        assert index.find_prefix(prefix).index.equals(devices.index[upper.str.startswith(prefix.upper())])
+        for pattern in [prefix + "*", "*" + description[4:10] + "*", description[:3] + "?" + description[4:]]:
+            expected = devices.index[[fnmatch.fnmatchcase(value, pattern.upper()) for value in upper]]
+            assert index.match(pattern).index.equals(expected), pattern
+
+
+def test_lookups_by_zone_loop_and_node(reader):
+    devices, loops, index = reader.devices, reader.loops, reader.query
+    zones = pd.to_numeric(devices["zone"], errors="coerce")
+    zone = int(zones[zones > 0].mode()[0])
+    assert index.devices_in_zone(zone).index.equals(devices.index[zones == zone])
+    loop = int(devices["loop"].iloc[-1])
+    assert index.devices_on_loop(loop).index.equals(devices.index[devices["loop"] == loop])
+
+    node = int(loops["node"].iloc[0])
+    node_loops = loops.loc[loops["node"] == node, "loop"].tolist()
+    assert index.loops_on_node(node) == node_loops
+    assert index.devices_on_node(node).index.equals(devices.index[devices["loop"].isin(node_loops)])
+    assert index.devices_in_zone(999999).empty
+
+
+def test_lookups_return_the_index_columns(reader):
+    columns = list(reader.query.find("FIRE").columns)
+    assert set(columns) <= set(reader.query.COLUMNS)
+    assert "description" in columns
+
+
+def test_query_index_is_built_once_per_parse(sample_path):
+    from ffpreader.ffpreader import FFPReader
+
+    reader = FFPReader(sample_path, tables=["devices"])
+    index = reader.query
+    assert reader.query is index
+    reader.refresh()
+    assert reader.query is not index
+    with pytest.raises(ValueError):
+        FFPReader(sample_path, tables=["zones"]).query
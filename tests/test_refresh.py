@@ -0,0 +1,41 @@
+import pandas as pd
+
+from ffpreader.ffpreader import FFPReader
+from ffpreader.sections import list_sections
+
+
+def _edit_first_device_section(path, description, new_description):
+    """replace a device description in the first loop device section of a file, returns its header"""
+    section = list_sections(path, "M", "X 2")[0]
+    with open(path, "rb") as f:
+        raw = f.read()
+    start, end = section["start"], section["end"]
+    old, new = f"\t{description}\t".encode(), f"\t{new_description}\t".encode()
+    assert old in raw[start:end]
+    with open(path, "wb") as f:
+        f.write(raw[:start] + raw[start:end].replace(old, new, 1) + raw[end:])
+    return section["header"]
+
+
+def test_refresh_of_an_unchanged_file_parses_nothing(sample_copy):
+    reader = FFPReader(sample_copy)
+    assert reader.refresh() == []
+    assert reader.stats.counters["sections_parsed"] == 0
+    assert reader.stats.counters["sections_reused"] > 0
+
+
+def test_refresh_after_a_one_loop_edit_matches_a_fresh_parse(sample_copy):
+    reader = FFPReader(sample_copy)
+    devices_before = reader.devices
+    snapshot = devices_before.copy()
+    description = reader.devices["description"].iloc[0]
+
+    header = _edit_first_device_section(sample_copy, description, description + " EDITED")
+    assert reader.refresh() == [header]
+
+    fresh = FFPReader(sample_copy)
+    for table in FFPReader.TABLES:
+        pd.testing.assert_frame_equal(getattr(reader, table), getattr(fresh, table))
+    assert (reader.devices["description"] == description + " EDITED").sum() == 1
+    # frames taken before the refresh are not modified by it
+    pd.testing.assert_frame_equal(devices_before, snapshot)
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPOSITORY_DIR
+from ffpreader.sections import count_sections, list_sections, read_file_header, read_section
+
+
+def test_read_file_header(sample_path):
+    header = read_file_header(sample_path)
+    assert header["title"] == "Fire Finder Plus Configuration File"
+    assert "Project" in header and "Date" in header
+
+
+def test_sections_match_the_reader(sample_path, reader):
+    sections = list_sections(sample_path)
+    assert [section["header"] for section in sections] == reader.section_headers
+    assert sum(count_sections(sample_path).values()) == len(sections)
+    assert count_sections(sample_path)["P"] == len(reader.nodes)
+    device_sections = list_sections(sample_path, "M", "X 2")
+    assert all(section["header"].endswith("X 2") for section in device_sections)
+
+
+def test_read_section(sample_path, reader):
+    header, rows = read_section(sample_path, "Z 1 Z 1")
+    assert header == "Z 1 Z 1"
+    assert len(rows) == len(reader.zones)
+    with pytest.raises(KeyError):
+        read_section(sample_path, "Z 1 Z 1", occurrence=1)
+
+
+def test_sections_and_cli_do_not_import_pandas():
+    code = (
+        "import sys, importlib.machinery, importlib.util\n"
+        "spec = importlib.machinery.ModuleSpec('ffpreader', None, is_package=True)\n"
+        f"spec.submodule_search_locations = [{REPOSITORY_DIR!r}]\n"
+        "sys.modules['ffpreader'] = importlib.util.module_from_spec(spec)\n"
+        "import ffpreader.sections, ffpreader.cli, ffpreader.ffpreader\n"
+        "print(sorted({'pandas', 'numpy', 'openpyxl'} & set(sys.modules)))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+
+from ffpreader.benchmark import write_synthetic_ffp
+from ffpreader.ffpreader import FFPReader
+from ffpreader.server import ConfigurationServer, HTTPError, _CacheEntry
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write_synthetic_ffp(str(tmp_path / "site.ffp"), nodes=2, loops=4, devices_per_loop=20, zones=50)
+    return tmp_path
+
+
+def _get(server, target, headers=None):
+    """(status, content type, body, etag) of a GET request, HTTPError for error responses"""
+    return asyncio.run(server._route(target, headers or {}))
+
+
+def test_tables_and_lookups(data_dir):
+    server = ConfigurationServer(str(data_dir), workers=1)
+    reader = FFPReader(str(data_dir / "site.ffp"))
+    status, content_type, body, etag = _get(server, "/files/site.ffp/tables/devices")
+    assert (status, content_type) == (200, "application/json")
+    assert len(json.loads(body)) == len(reader.devices)
+    cleaned = json.loads(_get(server, "/files/site.ffp/tables/devices?cleaned=1")[2])
+    assert len(cleaned) == len(reader.cleaned_devices)
+
+    loop = int(reader.devices["loop"].iloc[0])
+    devices = json.loads(_get(server, f"/files/site.ffp/loops/{loop}/devices")[2])
+    assert len(devices) == (reader.devices["loop"] == loop).sum()
+    files = json.loads(_get(server, "/files")[2])
+    assert files[0]["name"] == "site.ffp" and files[0]["cached"]
+
+
+def test_matching_etag_is_not_modified(data_dir):
+    server = ConfigurationServer(str(data_dir), workers=1)
+    etag = _get(server, "/files/site.ffp/tables/zones")[3]
+    assert _get(server, "/files/site.ffp/tables/zones", {"if-none-match": etag})[0] == 304
+    assert server.metrics["not_modified"] == 1
+
+
+@pytest.mark.parametrize(
+    "target, status",
+    [
+        ("/files/site.ffp/modbus/devices?gateway=abc", 400),
+        ("/files/site.ffp/zones/abc/devices", 400),
+        ("/files/site.ffp/search", 400),
+        ("/files/..%2Fsite.ffp/tables/zones", 404),
+        ("/files/missing.ffp/tables/zones", 404),
+        ("/files/site.ffp/tables/panels", 404),
+        ("/files/site.ffp/tables/zones?format=xml", 406),
+    ],
+)
+def test_bad_requests(data_dir, target, status):
+    server = ConfigurationServer(str(data_dir), workers=1)
+    with pytest.raises(HTTPError) as error:
+        _get(server, target)
+    assert error.value.status == status
+
+
+def test_modbus_gateway(data_dir):
+    server = ConfigurationServer(str(data_dir), workers=1)
+    rows = json.loads(_get(server, "/files/site.ffp/modbus/devices?gateway=1")[2])
+    assert rows and all(row["gateway"] == 1 for row in rows)
+
+
+def test_rendered_responses_are_bounded(data_dir, monkeypatch):
+    server = ConfigurationServer(str(data_dir), workers=1)
+    for number in range(1, 6):
+        _get(server, f"/files/site.ffp/search?q=L{number}")
+    entry = server._cache[str(data_dir / "site.ffp")]
+    # any text can be searched for, so searches are never kept
+    assert len(entry.bodies) == 0
+
+    monkeypatch.setattr(_CacheEntry, "MAX_BODIES", 2)
+    for table in ("zones", "nodes", "loops"):
+        _get(server, f"/files/site.ffp/tables/{table}")
+    assert [key for key, _ in entry.bodies] == ["tables/nodes?", "tables/loops?"]
+
+    size = entry.size
+    server.max_cache_bytes = 1
+    _get(server, "/files/site.ffp/tables/devices")
+    assert len(entry.bodies) == 0
+    assert entry.size < size
+
+
+def test_http_requests(data_dir):
+    server = ConfigurationServer(str(data_dir), port=0, workers=1)
+
+    async def request():
+        task = asyncio.ensure_future(server.serve())
+        while server._server is None or not server._server.is_serving():
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"GET /health HTTP/1.1\r\n\r\nPOST /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        task.cancel()
+        return response
+
+    response = asyncio.run(request())
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert b'{"status": "ok"}' in response
+    assert b"HTTP/1.1 405 Method Not Allowed" in response
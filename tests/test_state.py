@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ffpreader.benchmark import write_synthetic_ffp
+from ffpreader.ffpreader import FFPReader
+from ffpreader.modbusmapper import ModbusMapper
+from ffpreader.state import StateStore
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("state") / "site.ffp")
+    write_synthetic_ffp(path, nodes=2, loops=6, devices_per_loop=30, zones=60)
+    reader = FFPReader(path)
+    return reader, ModbusMapper(configuration=reader.configuration)
+
+
+def _set(store, mapped, decimal_column):
+    """set the bits of decimal_column of each mapped row, by OR-ing into the store's registers"""
+    for gateway, register, decimal in zip(mapped["gateway"], mapped["holding_register"], mapped[decimal_column]):
+        gateway, register = int(gateway), int(register)
+        store.update(gateway, register, [store.registers[gateway, register] | int(decimal)])
+
+
+def test_active_devices_are_those_set_through_the_mapper(synthetic):
+    reader, mapper = synthetic
+    store = StateStore(reader)
+    alarms = mapper.devices.sample(25, random_state=1)
+    faults = mapper.devices.sample(10, random_state=2)
+    _set(store, alarms, "alarm_decimal")
+    _set(store, faults, "fault_decimal")
+
+    active = store.active("devices", "alarm")
+    assert set(zip(active["loop"], active["device"])) == set(zip(alarms["loop"], alarms["device"]))
+    faulty = set(zip(faults["loop"], faults["device"]))
+    alarms_and_faults = active[active["fault"]]
+    expected = faulty & set(zip(alarms["loop"], alarms["device"]))
+    assert set(zip(alarms_and_faults["loop"], alarms_and_faults["device"])) == expected
+    assert {"zone", "description", "type"} <= set(active.columns)
+
+    states = store.states("devices")
+    assert len(states) == len(reader.devices.drop_duplicates(["loop", "device"]))
+    assert states["fault"].sum() == len(faulty)
+
+
+def test_counts_match_a_pandas_count(synthetic):
+    reader, mapper = synthetic
+    store = StateStore(reader)
+    alarms = mapper.devices.drop_duplicates(["loop", "device"]).sample(40, random_state=3)
+    _set(store, alarms, "alarm_decimal")
+    expected = alarms["zone"].value_counts()
+    counts = store.counts("alarm", by="zone")
+    assert counts.to_dict() == expected.to_dict()
+    assert counts.name == "alarm_count"
+    by_node = store.counts("alarm", by="node")
+    assert by_node.sum() == 40
+    with pytest.raises(ValueError):
+        store.counts("alarm", by="colour")
+
+
+def test_zone_and_loop_flags(synthetic):
+    reader, mapper = synthetic
+    store = StateStore(reader)
+    zones = mapper.zones.iloc[[0, 3, 5]]
+    _set(store, zones, "isolate_decimal")
+    assert store.active("zones", "isolate")["zone"].tolist() == zones["zone"].tolist()
+
+    loop = mapper.loops.iloc[[1]]
+    _set(store, loop, "loop_down_decimal")
+    down = store.active("loops", "loop_down")
+    assert down["loop"].tolist() == loop["loop"].tolist()
+    assert down[["short_circuit_b", "over_current"]].all(axis=None)
+    store.clear()
+    assert store.active("loops", "loop_down").empty
+
+
+def test_without_a_reader_every_address_is_returned():
+    store = StateStore()
+    assert len(store.states("zones")) == 2500
+    assert len(store.states("devices")) == 250 * 128
+    store.update(1, 6002, [0x0010])
+    assert store.active("zones", "alarm")["zone"].tolist() == [2]
+    assert np.count_nonzero(store.bits("zones")) == 1
+
+
+def test_bad_updates_and_flags():
+    store = StateStore()
+    with pytest.raises(ValueError):
+        store.update(4, 6002, [1])
+    with pytest.raises(ValueError):
+        store.update(1, store.registers.shape[1], [1])
+    with pytest.raises(ValueError):
+        store.flag("zones", "open_circuit")
+    assert store.flags("loops")[-1] == "loop_down"
+    assert isinstance(store.states("nodes"), pd.DataFrame)
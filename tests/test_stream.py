@@ -0,0 +1,33 @@
+import pytest
+
+from ffpreader.ffpreader import FFPReader
+from ffpreader.stream import RECORDS, iter_batches, iter_devices, iter_record_batches, iter_records
+
+
+@pytest.mark.parametrize("kind", FFPReader.TABLES)
+def test_records_match_the_reader_tables(reader, sample_path, kind):
+    table = getattr(reader, kind)[list(RECORDS[kind]._fields)]
+    # the reader tables hold NaN where the records hold None
+    rows = table.astype(object).where(table.notna(), None).itertuples(index=False)
+    expected = [RECORDS[kind](*row) for row in rows]
+    assert list(iter_records(sample_path, kind)) == expected
+
+
+def test_batches_and_devices(sample_path):
+    devices = list(iter_devices(sample_path))
+    batches = list(iter_batches(sample_path, "devices", batch_size=1000))
+    assert all(len(batch) == 1000 for batch in batches[:-1])
+    assert 0 < len(batches[-1]) <= 1000
+    assert [device for batch in batches for device in batch] == devices
+
+
+def test_unknown_kind(sample_path):
+    with pytest.raises(ValueError):
+        list(iter_records(sample_path, "panels"))
+
+
+def test_record_batches(sample_path):
+    pytest.importorskip("pyarrow")
+    batches = list(iter_record_batches(sample_path, "zones", batch_size=100))
+    assert batches[0].schema.names == list(RECORDS["zones"]._fields)
+    assert sum(batch.num_rows for batch in batches) == len(list(iter_records(sample_path, "zones")))
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from ffpreader.summary import Summary
+
+
+def _totals(summary):
+    return dict(zip(summary.totals["metric"], summary.totals["value"]))
+
+
+def test_rollups_are_consistent_with_the_tables(reader):
+    summary = reader.summary
+    totals = _totals(summary)
+    devices = reader.devices
+    placeholders = reader.cleaning_rules["placeholder_descriptions"]
+    spare = devices["description"].fillna("").str.strip().isin(placeholders)
+
+    assert totals["devices"] == (~spare).sum() == summary.types["devices"].sum()
+    assert totals["spare"] == spare.sum()
+    assert totals["loops"] == len(summary.loops) == len(reader.loops)
+    assert totals["free_addresses"] == summary.loops["free"].sum()
+
+    # the loop and node rollups are those of the occupancy bitmaps
+    occupancy = reader.occupancy.loop_stats()
+    assert summary.loops[["node", "loop", "devices", "free"]].values.tolist() == (
+        occupancy[["node", "loop", "used", "free"]].values.tolist()
+    )
+    by_node = summary.loops.groupby("node")[["devices", "spare", "free"]].sum()
+    assert summary.nodes.set_index("node")[["devices", "spare", "free"]].equals(by_node)
+    assert totals["nodes"] == len(summary.nodes)
+
+    zone = pd.to_numeric(devices["zone"], errors="coerce")
+    assert summary.zones["devices"].sum() == ((zone > 0) & ~spare).sum()
+    assert totals["zones_without_devices"] == (summary.zones["devices"] == 0).sum()
+    assert list(summary.tables()) == ["summary", "zones", "nodes", "loops", "types"]
+
+
+def test_without_zones_and_loops():
+    devices = pd.DataFrame(
+        {
+            "loop": [1, 1, 1, 2],
+            "device": [1, 2, 3, 1],
+            "zone": ["5", "5", "0", "7"],
+            "description": ["SD A", "SPARE", "SD B", "MCP C"],
+            "type": ["SD", "SD", "SD", "MCP"],
+            "subtype": ["", "", "", ""],
+        }
+    )
+    summary = Summary(devices)
+    assert summary.nodes is None
+    assert "node" not in summary.loops.columns
+    assert summary.loops[["loop", "devices", "spare"]].values.tolist() == [[1, 2, 1], [2, 1, 0]]
+    assert summary.zones.values.tolist() == [[5, 1], [7, 1]]
+    assert summary.types[["type", "devices"]].values.tolist() == [["SD", 2], ["MCP", 1]]
+    totals = _totals(summary)
+    assert "zones" not in totals and "nodes" not in totals
+    assert totals["utilization"] == 3 / (2 * Summary.DEVICES_PER_LOOP)
+    assert list(summary.tables()) == ["summary", "zones", "loops", "types"]
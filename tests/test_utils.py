@@ -0,0 +1,67 @@
+import codecs
+
+from ffpreader.ffpreader import FFPReader
+from ffpreader.utils import (
+    count_non_ascii_fields,
+    decode_span,
+    detect_encoding,
+    find_section_spans,
+    map_file,
+    section_header,
+)
+
+
+def test_find_section_spans_trims_brackets_and_whitespace():
+    buffer = b"title\n[ Z 1 Z 1\nY\tZONE ]\n\n[P 1\n]tail[unclosed"
+    spans = find_section_spans(buffer)
+    assert [buffer[start:end] for start, end in spans] == [b"Z 1 Z 1\nY\tZONE", b"P 1"]
+    assert section_header(buffer, spans[0]) == "Z 1 Z 1"
+
+
+def test_section_spans_of_a_sample_file(sample_path):
+    with map_file(sample_path) as buffer:
+        spans = find_section_spans(buffer)
+        assert len(spans) == buffer[:].count(b"[")
+        assert all(b"[" not in buffer[start:end] and b"]" not in buffer[start:end] for start, end in spans)
+
+
+def test_map_file_of_an_empty_file(tmp_path):
+    path = tmp_path / "empty.ffp"
+    path.write_bytes(b"")
+    with map_file(str(path)) as buffer:
+        assert buffer == b""
+        assert find_section_spans(buffer) == []
+
+
+def test_detect_encoding():
+    assert detect_encoding(b"[Z 1 Z 1\nY\tLOBBY]") == "ascii"
+    assert detect_encoding(codecs.BOM_UTF8 + b"[Z 1 Z 1]") == "utf-8"
+    assert detect_encoding("[Z 1 Z 1\nY\tCAFÉ]".encode("utf-8")) == "utf-8"
+    assert detect_encoding("[Z 1 Z 1\nY\tCAFÉ]".encode("cp1252")) == "cp1252"
+
+
+def test_decode_span_normalises_newlines_and_drops_the_byte_order_mark():
+    buffer = codecs.BOM_UTF8 + b"a\r\nb\rc"
+    assert decode_span(buffer, (0, len(buffer)), "utf-8") == "a\nb\nc"
+    assert decode_span(b"x\x81y", (0, 3), "cp1252") == "x�y"
+
+
+def test_count_non_ascii_fields():
+    assert count_non_ascii_fields("a\tCAFÉ\tb\nNAÏVE ZONE\n".encode("utf-8")) == 2
+
+
+def test_non_ascii_file_is_decoded(sample_path, tmp_path):
+    with open(sample_path, "rb") as f:
+        raw = f.read()
+    reader = FFPReader(sample_path, tables=["zones"])
+    description = reader.zones["description"].iloc[0]
+    # the line of the first zone, 'Y\t{description}\t...'
+    line = f"Y\t{description}\t"
+    edited = raw.replace(line.encode(), f"Y\t{description} É\t".encode("cp1252"), 1)
+    path = tmp_path / "cp1252.ffp"
+    path.write_bytes(edited)
+
+    edited_reader = FFPReader(str(path), tables=["zones"])
+    assert edited_reader.encoding == "cp1252"
+    assert edited_reader.non_ascii_field_count == 1
+    assert (edited_reader.zones["description"] == description + " É").sum() == 1
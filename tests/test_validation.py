@@ -0,0 +1,84 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import INPUT_DIR
+
+from ffpreader.benchmark import write_synthetic_ffp
+from ffpreader.ffpreader import FFPReader
+from ffpreader.validation import ISSUE_COLUMNS, validate
+
+
+@pytest.fixture
+def synthetic(tmp_path):
+    """a reader of a small synthetic panel, its tables can be edited"""
+    path = str(tmp_path / "synthetic.ffp")
+    write_synthetic_ffp(path, nodes=2, loops=4, devices_per_loop=20, zones=50, spare_fraction=0.0)
+    return FFPReader(path)
+
+
+def _checks(issues):
+    return issues["check"].value_counts().to_dict()
+
+
+def test_issues_of_the_sample_files(reader):
+    issues = reader.issues
+    assert list(issues.columns) == ISSUE_COLUMNS
+    assert set(issues["severity"]) <= {"error", "warning"}
+    assert reader.issues is issues
+
+
+def test_nodes_with_several_sections_are_valid():
+    # nodes 13 and 21 have a 'P 1' and a 'P 2' section
+    reader = FFPReader(os.path.join(INPUT_DIR, "QWP 17.02.25 ASE change rev 2 .ffp"))
+    nodes = reader.nodes
+    assert nodes["node"].duplicated().sum() == 2
+    issues = validate(reader)
+    assert (issues["severity"] != "error").all()
+    assert "duplicate_node" not in set(issues["check"])
+
+
+def test_a_consistent_panel_has_no_errors(synthetic):
+    issues = validate(synthetic)
+    assert (issues["severity"] != "error").all()
+
+
+def test_duplicates_are_reported_once_per_number(synthetic):
+    nodes, loops, devices = synthetic.nodes, synthetic.loops, synthetic.devices
+    synthetic.nodes = pd.concat([nodes, nodes.iloc[[0, 0]]], ignore_index=True)
+    synthetic.loops = pd.concat([loops, loops.iloc[[1]]], ignore_index=True)
+    synthetic.devices = pd.concat([devices, devices.iloc[[2, 3]]], ignore_index=True)
+    issues = validate(synthetic)
+    checks = _checks(issues)
+    assert (checks["duplicate_node"], checks["duplicate_loop"], checks["duplicate_device"]) == (1, 1, 2)
+
+    (node_issue,) = issues.loc[issues["check"] == "duplicate_node", "message"]
+    node = nodes["node"].iloc[0]
+    assert node_issue == f"node {node} is defined by 3 'P 1' node sections, rows 0, {len(nodes)}, {len(nodes) + 1}"
+    device_issues = issues.loc[issues["check"] == "duplicate_device", "message"].tolist()
+    assert device_issues[0].endswith(f"is defined 2 times, rows 2, {len(devices)}")
+
+
+def test_references_and_ranges_are_checked(synthetic):
+    devices = synthetic.devices.copy()
+    devices.loc[0, "zone"] = "4999"
+    devices.loc[1, "device"] = 129
+    synthetic.devices = devices
+    loops = synthetic.loops.copy()
+    loops.loc[0, "node"] = 99
+    loops.loc[1, "loop"] = 251
+    synthetic.loops = loops
+    checks = _checks(validate(synthetic))
+    assert checks["device_in_unconfigured_zone"] == 1
+    assert checks["device_address_out_of_range"] == 1
+    assert checks["loop_on_missing_node"] == 1
+    assert checks["loop_without_register"] == 1
+
+
+def test_device_sections_without_a_loop_section(synthetic):
+    synthetic.section_headers = synthetic.section_headers + ["M 999 X 2"]
+    issues = validate(synthetic)
+    assert issues.loc[issues["check"] == "device_section_without_loop", "message"].tolist() == [
+        "device section 'M 999 X 2' has no loop info section 'M 999 X 1', its devices have no loop"
+    ]
@@ -0,0 +1,85 @@
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+
+import pytest
+
+from ffpreader import watcher
+from ffpreader.watcher import FFPWatcher
+
+
+def _touch(path, text=""):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_polling_source_reports_created_modified_and_deleted_files(tmp_path):
+    _touch(tmp_path / "a.ffp")
+    _touch(tmp_path / "b.ffp")
+    source = watcher._PollingSource(str(tmp_path), ".ffp", interval=0.01)
+    _touch(tmp_path / "a.ffp", "changed")
+    os.remove(tmp_path / "b.ffp")
+    _touch(tmp_path / "c.FFP")
+    _touch(tmp_path / "notes.txt")
+    changed = source.wait(0.01)
+    assert {os.path.basename(path) for path in changed} == {"a.ffp", "b.ffp", "c.FFP"}
+    assert source.wait(0.01) == set()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_overflow_rescans_the_directory(tmp_path, monkeypatch):
+    for name in ("a", "b", "c"):
+        _touch(tmp_path / f"{name}.ffp")
+    source = watcher._InotifySource(str(tmp_path), ".ffp")
+    try:
+        os.remove(tmp_path / "a.ffp")
+        _touch(tmp_path / "d.ffp")
+        overflow = struct.pack("iIII", -1, watcher._InotifySource._IN_Q_OVERFLOW, 0, 0)
+        with monkeypatch.context() as patch:
+            patch.setattr(watcher.os, "read", lambda fd, size: overflow)
+            changed = source.wait(1.0)
+        assert {os.path.basename(path) for path in changed} == {"a.ffp", "b.ffp", "c.ffp", "d.ffp"}
+        # the queued events of the removal and creation are read normally
+        changed = source.wait(1.0)
+        assert {os.path.basename(path) for path in changed} == {"a.ffp", "d.ffp"}
+    finally:
+        source.close()
+
+
+def test_watcher_exports_existing_and_changed_files(sample_path, tmp_path):
+    watch_dir, output_dir = tmp_path / "input", tmp_path / "output"
+    watch_dir.mkdir()
+    output_dir.mkdir()
+    path = str(watch_dir / os.path.basename(sample_path))
+    shutil.copyfile(sample_path, path)
+
+    service = FFPWatcher(
+        str(watch_dir),
+        str(output_dir),
+        formats=["csv"],
+        debounce=0.1,
+        workers=1,
+        poll_interval=0.05,
+        use_inotify=False,
+    )
+    thread = threading.Thread(target=service.run)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 30
+        while service.metrics.get(path, {}).get("runs", 0) < 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert service.metrics[path]["runs"] == 1
+        assert os.path.exists(output_dir / (os.path.basename(path) + ".zones.csv"))
+
+        with open(path, "ab") as f:
+            f.write(b"\n")
+        while service.metrics[path]["runs"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert service.metrics[path]["runs"] == 2
+        assert service.metrics[path]["errors"] == 0
+    finally:
+        service.stop()
+        thread.join()
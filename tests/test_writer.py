@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from ffpreader.ffpreader import FFPReader
+from ffpreader.writer import write_ffp
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_unedited_tables_are_written_byte_identical(reader, tmp_path):
+    path = str(tmp_path / "written.ffp")
+    counts = write_ffp(reader, path)
+    assert (counts["sections_rewritten"], counts["lines_rewritten"]) == (0, 0)
+    assert _read_bytes(path) == _read_bytes(reader.ffp_filepath)
+
+
+def test_an_edit_rewrites_only_its_line(sample_path, tmp_path):
+    reader = FFPReader(sample_path)
+    row = len(reader.devices) // 2
+    old = reader.devices.loc[row, "description"]
+    reader.devices.loc[row, "description"] = "RENAMED DETECTOR"
+    reader.zones.loc[3, "description"] = reader.zones.loc[3, "description"] + " EAST"
+    path = str(tmp_path / "written.ffp")
+    counts = write_ffp(reader, path)
+    assert (counts["sections_rewritten"], counts["lines_rewritten"]) == (2, 2)
+
+    original = _read_bytes(sample_path).split(b"\n")
+    written = _read_bytes(path).split(b"\n")
+    assert len(written) == len(original)
+    changed = [number for number, (a, b) in enumerate(zip(original, written)) if a != b]
+    assert len(changed) == 2
+    assert any(old.encode() in original[number] for number in changed)
+    assert any(b"RENAMED DETECTOR" in written[number] for number in changed)
+
+    reparsed = FFPReader(path)
+    for table in FFPReader.TABLES:
+        pd.testing.assert_frame_equal(
+            getattr(reparsed, table).drop(columns="raw", errors="ignore"),
+            getattr(reader, table).drop(columns="raw", errors="ignore"),
+        )
+
+
+def test_integral_floats_are_written_as_integers(sample_path, tmp_path):
+    reader = FFPReader(sample_path)
+    # eg a zone column made numeric for editing
+    reader.devices["zone"] = pd.to_numeric(reader.devices["zone"]).astype(float)
+    reader.devices.loc[0, "zone"] = 179.0
+    path = str(tmp_path / "written.ffp")
+    assert write_ffp(reader, path)["lines_rewritten"] == 1
+    assert FFPReader(path).devices.loc[0, "zone"] == "179"
+
+
+def test_non_ascii_edits_are_written_as_cp1252(sample_path, tmp_path):
+    reader = FFPReader(sample_path)
+    assert reader.encoding == "ascii"
+    reader.devices.loc[0, "description"] = "CAFÉ"
+    path = str(tmp_path / "written.ffp")
+    write_ffp(reader, path)
+    assert b"CAF\xc9\t" in _read_bytes(path)
+    assert FFPReader(path).devices.loc[0, "description"] == "CAFÉ"
+
+
+@pytest.mark.parametrize("value", ["TWO\tFIELDS", "TWO\nLINES", "[SECTION]"])
+def test_reserved_characters_are_rejected(sample_path, tmp_path, value):
+    reader = FFPReader(sample_path, tables=["zones"])
+    reader.zones.loc[0, "description"] = value
+    with pytest.raises(ValueError, match="tab, newline or bracket"):
+        write_ffp(reader, str(tmp_path / "written.ffp"))
+
+
+def test_values_past_the_end_of_a_line_are_rejected(sample_path, tmp_path):
+    reader = FFPReader(sample_path, tables=["devices"])
+    row = reader.devices.index[reader.devices[33].isna()][0]
+    reader.devices.loc[row, 33] = "X"
+    with pytest.raises(ValueError, match=f"\\(row {row}\\) is in field 33"):
+        write_ffp(reader, str(tmp_path / "written.ffp"))
+
+
+def test_added_or_removed_rows_are_rejected(sample_path, tmp_path):
+    reader = FFPReader(sample_path, tables=["zones"])
+    reader.zones = reader.zones.drop(index=0)
+    with pytest.raises(ValueError, match="rows were added or removed"):
+        write_ffp(reader, str(tmp_path / "written.ffp"))
@@ -1,12 +1,123 @@
-from openpyxl import load_workbook
-import pandas as pd
-from openpyxl.worksheet.table import Table, TableStyleInfo
+import codecs
+import logging
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from .instrumentation import Stats
+
+logger = logging.getLogger(__name__)
+
+# bytes treated as whitespace when trimming a section, matches str.strip() for ASCII text
+_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+# runs of non-ASCII bytes, and whole tab/newline delimited fields containing them
+_NON_ASCII_RUN = re.compile(rb"[\x80-\xff]+")
+_NON_ASCII_FIELD = re.compile(rb"[^\t\n]*[\x80-\xff][^\t\n]*")
 
 
 def load_text(filename):
-    """load text file, return as string"""
-    with open(filename, "r") as file:
-        text = file.read()
+    """load text file, return as string decoded with the encoding detected by detect_encoding"""
+    with open(filename, "rb") as file:
+        raw = file.read()
+    return decode_span(raw, (0, len(raw)), detect_encoding(raw))
+
+
+def detect_encoding(buffer):
+    """
+    Detect the encoding of a raw .ffp file, done once per file on the bytes.
+    Checks in order of cost:
+        - a UTF-8 byte order mark: 'utf-8'
+        - no bytes above 0x7F (the common case): 'ascii'
+        - every non-ASCII run is valid UTF-8: 'utf-8'
+        - otherwise the file is an older Windows export: 'cp1252'
+    The regex scans work directly on mmap/bytes buffers without copying the file.
+    """
+    if buffer[: len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+        return "utf-8"
+    if _NON_ASCII_RUN.search(buffer) is None:
+        return "ascii"
+    try:
+        for match in _NON_ASCII_RUN.finditer(buffer):
+            match.group().decode("utf-8")
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8"
+
+
+def count_non_ascii_fields(buffer):
+    """count the tab/newline delimited fields in a raw buffer containing at least one non-ASCII byte"""
+    # a byte order mark is not part of any field
+    start = len(codecs.BOM_UTF8) if buffer[:3] == codecs.BOM_UTF8 else 0
+    return sum(1 for _ in _NON_ASCII_FIELD.finditer(buffer, start))
+
+
+@contextmanager
+def map_file(filename):
+    """
+    Memory-map a file read-only for the duration of a with block.
+    Yields a bytes-like object, slicing it copies only the requested byte range.
+    Empty files yield b"" as they cannot be mapped.
+    """
+    with open(filename, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def find_section_spans(buffer, start_token=b"[", end_token=b"]"):
+    """
+    Locate the sections in a bytes-like buffer without decoding or copying it.
+    Sections are delimited by square brackets [ ], see FFPReader._load_and_separate_sections.
+    Returns a list of (start, end) byte offsets of each section's contents with the brackets removed
+    and leading/trailing whitespace trimmed, ie buffer[start:end] == b"Z 1 Z 1\nY\tTOWER 2 ..."
+    """
+    return list(iter_section_spans(buffer, start_token, end_token))
+
+
+def iter_section_spans(buffer, start_token=b"[", end_token=b"]"):
+    """generator version of find_section_spans, yields each (start, end) span as it is found"""
+    start = 0
+    while True:
+        start = buffer.find(start_token, start)
+        if start == -1:
+            break
+        end = buffer.find(end_token, start)
+        if end == -1:
+            break
+        # trim leading and trailing white space
+        trimmed_start = start + 1
+        trimmed_end = end
+        while trimmed_start < trimmed_end and buffer[trimmed_start] in _WHITESPACE:
+            trimmed_start += 1
+        while trimmed_end > trimmed_start and buffer[trimmed_end - 1] in _WHITESPACE:
+            trimmed_end -= 1
+        yield trimmed_start, trimmed_end
+        start = end + 1
+
+
+def section_header(buffer, span, encoding="utf-8"):
+    """decode and return only the first line of a section span, eg 'M 90102 X 1'"""
+    start, end = span
+    line_end = buffer.find(b"\n", start, end)
+    if line_end == -1:
+        line_end = end
+    return decode_span(buffer, (start, line_end), encoding)
+
+
+def decode_span(buffer, span, encoding="utf-8"):
+    """
+    decode a (start, end) byte range of a buffer to a string, use detect_encoding to pick the encoding
+    newlines are normalised to "\n" as when reading the file in text mode
+    bytes undefined in the encoding (eg 0x81 in cp1252) are replaced rather than raising
+    """
+    start, end = span
+    text = buffer[start:end].decode(encoding, errors="replace")
+    if encoding == "utf-8" and text.startswith("\ufeff"):
+        text = text[1:]
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
     return text
 
 
@@ -56,6 +167,8 @@ def parse_tsvs(sections):
 
 def list_to_df(list_of_lists, col_names=None):
     """convert list of lists to pandas dataframe"""
+    import pandas as pd
+
     if col_names is None:
         df = pd.DataFrame(list_of_lists)
     else:
@@ -76,13 +189,22 @@ def combine_named_dfs_from_list_of_dicts(merged, data_key="devices"):
     Returns:
     pd.DataFrame(...)
     """
+    import pandas as pd
+
     devices_dfs = [loop[data_key] for loop in merged]
     combined = pd.concat(devices_dfs)
     return combined
 
 
 def write_dfs_to_excel_and_format(
-    data, filepath, sheet_name_key="description", data_key="data", as_table=False
+    data,
+    filepath,
+    sheet_name_key="description",
+    data_key="data",
+    as_table=False,
+    stats=None,
+    manifest=None,
+    force=False,
 ):
     """
     Write structured dict or list of dicts of DataFrames to an Excel file and format as a table.
@@ -109,10 +231,21 @@ def write_dfs_to_excel_and_format(
         data_key (str, optional): The key in each dictionary that contains the DataFrame.
             Defaults to 'data'.
         as_table (bool, optional): Whether to format the data as a table in Excel. Defaults to False.
+        stats (Stats, optional): Records the 'excel_write' and 'excel_tables' stage timings and the
+            'excel_sheets', 'excel_rows' and 'excel_skipped' counters. A new Stats is created if not given.
+        manifest (manifest.ExportManifest, optional): Hashes of the sheets of the workbooks written.
+            When given, the workbook is not rewritten if its sheets are unchanged since it was last
+            recorded, otherwise it is written and recorded and the manifest saved.
+        force (bool, optional): Write the workbook even if the manifest shows it unchanged.
+
+    Returns:
+        bool: True if the workbook was written, False if the manifest showed it unchanged.
 
     Raises:
         ValueError: If the input data is not in a supported format.
     """
+    import pandas as pd
+
     # Normalize the input data into a list of dictionaries
     if isinstance(data, dict):
         flattened_data = []
@@ -132,7 +265,40 @@ def write_dfs_to_excel_and_format(
             "Input data must be a dict of lists of dicts, a dict of DataFrames, or a list of dicts."
         )
 
+    if stats is None:
+        stats = Stats("excel")
+
+    digests = None
+    if manifest is not None:
+        digests = manifest.digests(
+            {sheet_data.get(sheet_name_key): sheet_data.get(data_key) for sheet_data in flattened_data},
+            as_table=as_table,
+        )
+        if not force and manifest.unchanged(filepath, digests):
+            stats.count("excel_skipped")
+            logger.debug(f"Skipped Excel '{filepath}', its sheets are unchanged.")
+            return False
+
     # Write the DataFrames to Excel
+    with stats.timer("excel_write"):
+        _write_sheets(flattened_data, filepath, sheet_name_key, data_key, stats)
+
+    # Optionally format the data as Excel tables
+    if as_table:
+        with stats.timer("excel_tables"):
+            _format_sheets_as_tables(flattened_data, filepath, sheet_name_key)
+
+    if manifest is not None:
+        manifest.record(filepath, digests)
+        manifest.save()
+    logger.debug(f"Done writing to Excel '{filepath}'.")
+    return True
+
+
+def _write_sheets(flattened_data, filepath, sheet_name_key, data_key, stats):
+    """write each DataFrame in a normalised list of dicts to its own sheet, see write_dfs_to_excel_and_format"""
+    import pandas as pd
+
     writer = pd.ExcelWriter(filepath, engine="openpyxl")
     for sheet_data in flattened_data:
         sheet_name = sheet_data.get(sheet_name_key)
@@ -147,31 +313,37 @@ def write_dfs_to_excel_and_format(
                 f"Expected a string for key '{sheet_name_key}', but got {type(sheet_name)}."
             )
 
-        print(f"Writing DataFrame to Excel sheet '{sheet_name}' in '{filepath}'...")
+        logger.debug(
+            f"Writing DataFrame to Excel sheet '{sheet_name}' in '{filepath}'..."
+        )
         df.to_excel(writer, index=False, sheet_name=sheet_name)
+        stats.count("excel_sheets")
+        stats.count("excel_rows", len(df))
 
     writer.close()
 
-    # Optionally format the data as Excel tables
-    if as_table:
-        book = load_workbook(filepath)
-        for sheet_data in flattened_data:
-            sheet_name = sheet_data.get(sheet_name_key)
-            sheet = book[sheet_name]
-
-            print(f"Adding Excel table to sheet '{sheet_name}'...")
-            dimensions = sheet.calculate_dimension()
-            table = Table(displayName=sheet_name, ref=dimensions)
-            style = TableStyleInfo(
-                name="TableStyleMedium9",
-                showFirstColumn=False,
-                showLastColumn=False,
-                showRowStripes=True,
-                showColumnStripes=False,
-            )
-            table.tableStyleInfo = style
-            sheet.add_table(table)
 
-        book.save(filepath)
+def _format_sheets_as_tables(flattened_data, filepath, sheet_name_key):
+    """format the data on each sheet written by _write_sheets as an Excel table"""
+    from openpyxl import load_workbook
+    from openpyxl.worksheet.table import Table, TableStyleInfo
+
+    book = load_workbook(filepath)
+    for sheet_data in flattened_data:
+        sheet_name = sheet_data.get(sheet_name_key)
+        sheet = book[sheet_name]
+
+        logger.debug(f"Adding Excel table to sheet '{sheet_name}'...")
+        dimensions = sheet.calculate_dimension()
+        table = Table(displayName=sheet_name, ref=dimensions)
+        style = TableStyleInfo(
+            name="TableStyleMedium9",
+            showFirstColumn=False,
+            showLastColumn=False,
+            showRowStripes=True,
+            showColumnStripes=False,
+        )
+        table.tableStyleInfo = style
+        sheet.add_table(table)
 
-    print("Done writing to Excel.")
+    book.save(filepath)
@@ -0,0 +1,242 @@
+import logging
+from .modbusmapper import ModbusMapper
+
+logger = logging.getLogger(__name__)
+
+# columns of the issues DataFrame returned by validate
+ISSUE_COLUMNS = ["check", "severity", "table", "node", "loop", "device", "zone", "message"]
+
+
+def _configured(df, placeholders):
+    """mask of the rows of a zones/devices/nodes frame whose description is not a placeholder"""
+    return ~df["description"].fillna("").str.strip().isin(placeholders)
+
+
+def _issues(rows, check, severity, table, message):
+    """format the offending rows of one check as issues, message is a format string over the row"""
+    import pandas as pd
+
+    issues = pd.DataFrame(index=rows.index)
+    issues["check"] = check
+    issues["severity"] = severity
+    issues["table"] = table
+    for column in ["node", "loop", "device", "zone"]:
+        issues[column] = rows[column] if column in rows.columns else None
+    # only named columns can be format fields, the raw device setting columns are numbered
+    named = rows[[column for column in rows.columns if isinstance(column, str)]]
+    issues["message"] = [message.format(**row) for row in named.to_dict("records")]
+    return issues
+
+
+def _duplicates(df, keys):
+    """
+    one row per key of df defined by more than one row, its first row, with the number of rows of
+    the key in a count column and their row labels in a rows column, eg '12, 40'
+    """
+    duplicated = df[df.duplicated(keys, keep=False)]
+    # groups numbered in order of first appearance, as the rows kept by drop_duplicates
+    group = duplicated.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+    labels = duplicated.index.to_series().groupby(group).agg(lambda rows: ", ".join(map(str, rows)))
+    return duplicated.drop_duplicates(keys).assign(
+        count=duplicated.groupby(group).size().to_numpy(), rows=labels.to_numpy()
+    )
+
+
+def _out_of_layout(numbers, table):
+    """mask of the numbers that fall outside every gateway block of table in ModbusMapper.REGISTER_LAYOUT"""
+    blocks = ModbusMapper.REGISTER_LAYOUT[table]["blocks"]
+    inside = numbers.isna()
+    for _, first, last, _ in blocks:
+        inside |= numbers.between(first, last)
+    return ~inside
+
+
+def _check_zones(reader, placeholders):
+    zones = reader.zones
+    configured = zones[_configured(zones, placeholders)]
+    return [
+        _issues(
+            configured[_out_of_layout(configured["zone"], "zones")],
+            "zone_without_register",
+            "warning",
+            "zones",
+            "zone {zone} '{description}' is configured but has no Modbus register",
+        )
+    ]
+
+
+def _check_nodes(reader):
+    nodes = reader.nodes
+    # a node can have several sections, eg 'P 130000 P 1' and 'P 130000 P 2', each suffix once
+    if "raw" in nodes.columns:
+        nodes = nodes.assign(section=nodes["raw"].str.split(" ").str[-2:].str.join(" "))
+    else:
+        nodes = nodes.assign(section="P 1")
+    return [
+        _issues(
+            _duplicates(nodes, ["node", "section"]),
+            "duplicate_node",
+            "error",
+            "nodes",
+            "node {node} is defined by {count} '{section}' node sections, rows {rows}",
+        ),
+        _issues(
+            nodes[_out_of_layout(nodes["node"], "nodes")],
+            "node_without_register",
+            "warning",
+            "nodes",
+            "node {node} '{description}' has no Modbus register",
+        ),
+    ]
+
+
+def _check_loops(reader):
+    import pandas as pd
+
+    loops = reader.loops
+    issues = [
+        _issues(
+            _duplicates(loops, ["loop"]),
+            "duplicate_loop",
+            "error",
+            "loops",
+            "loop {loop} is numbered on {count} loop cards, rows {rows}, first on node {node} section '{raw}'",
+        ),
+        _issues(
+            loops[_out_of_layout(loops["loop"], "loops")],
+            "loop_without_register",
+            "warning",
+            "loops",
+            "loop {loop} on node {node} has no Modbus register",
+        ),
+    ]
+    if reader.nodes is not None:
+        issues.append(
+            _issues(
+                loops[~loops["node"].isin(reader.nodes["node"])],
+                "loop_on_missing_node",
+                "error",
+                "loops",
+                "loop {loop} is on node {node}, which has no node section",
+            )
+        )
+
+    # device sections (M id X 2) whose id has no loop info section (M id X 1), their devices get no loop
+    # the section headers are not available on readers loaded with FFPReader.from_database
+    if getattr(reader, "section_headers", None) is None:
+        return issues
+    device_ids = pd.Series(
+        [
+            header.split(" ")[1]
+            for header in reader.section_headers
+            if header.startswith(reader._LOOP_OR_LOOP_DEVICE_SECTION_FLAG)
+            and header.endswith(reader._DEVICE_SECTION_SUFFIX)
+        ],
+        dtype=object,
+    )
+    orphans = device_ids[~device_ids.isin(loops["id"])]
+    issues.append(
+        _issues(
+            pd.DataFrame({"id": orphans}),
+            "device_section_without_loop",
+            "error",
+            "loops",
+            "device section 'M {id} X 2' has no loop info section 'M {id} X 1', its devices have no loop",
+        )
+    )
+    return issues
+
+
+def _check_devices(reader, placeholders):
+    import pandas as pd
+
+    devices = reader.devices
+    configured = devices[_configured(devices, placeholders)]
+    zone = pd.to_numeric(configured["zone"], errors="coerce")
+    issues = [
+        _issues(
+            devices[devices["loop"].isna()],
+            "device_without_loop",
+            "error",
+            "devices",
+            "device {device} '{description}' is in a device section without a loop info section",
+        ),
+        _issues(
+            _duplicates(devices[devices["loop"].notna()], ["loop", "device"]),
+            "duplicate_device",
+            "error",
+            "devices",
+            "loop {loop} device {device} is defined {count} times, rows {rows}",
+        ),
+        _issues(
+            devices[
+                ~devices["device"].between(
+                    1, ModbusMapper.REGISTER_LAYOUT["devices"]["devices_per_loop"]
+                )
+            ],
+            "device_address_out_of_range",
+            "error",
+            "devices",
+            "loop {loop} device {device} is outside the addresses of a loop",
+        ),
+    ]
+    if reader.zones is not None:
+        zones = reader.zones
+        configured_zones = zones.loc[_configured(zones, placeholders), "zone"]
+        issues.append(
+            _issues(
+                configured.assign(zone=zone)[
+                    zone.notna() & (zone > 0) & ~zone.isin(configured_zones)
+                ],
+                "device_in_unconfigured_zone",
+                "error",
+                "devices",
+                "loop {loop} device {device} '{description}' is in zone {zone}, which is not configured",
+            )
+        )
+    return issues
+
+
+def validate(reader):
+    """
+    Run consistency checks over the tables of an FFPReader and return every issue found, see
+    FFPReader.issues. Checks are vectorized over whole tables (anti-joins, duplicate detection and
+    range checks against ModbusMapper.REGISTER_LAYOUT), checks needing a table that was not parsed
+    are skipped. The checks, by severity:
+
+    errors
+        device_in_unconfigured_zone    configured device in a zone without a description
+        device_without_loop            device in an 'M id X 2' section with no 'M id X 1' section
+        device_section_without_loop    each such 'M id X 2' section
+        duplicate_loop                 loop number used by more than one loop info section
+        duplicate_node                 node section suffix (eg P 1) repeated for a node number
+        duplicate_device               (loop, device) defined more than once
+                                       (the duplicate checks report each number once, listing its rows)
+        device_address_out_of_range    device address outside 1-128
+        loop_on_missing_node           loop on a node with no node section
+    warnings
+        zone_without_register          configured zone outside the Modbus zone registers (1-2500)
+        loop_without_register          loop outside the Modbus loop registers (1-250)
+        node_without_register          node outside the Modbus node registers (1-100)
+
+    Returns:
+        pd.DataFrame: One row per issue with columns ISSUE_COLUMNS, eg
+            check                        severity  table    node  loop  device  zone  message
+            device_in_unconfigured_zone  error     devices  None  12    90      4999  loop 12 device 90 ...
+    """
+    import pandas as pd
+
+    placeholders = reader.cleaning_rules["placeholder_descriptions"]
+    issues = []
+    if reader.zones is not None:
+        issues += _check_zones(reader, placeholders)
+    if reader.nodes is not None:
+        issues += _check_nodes(reader)
+    if reader.loops is not None:
+        issues += _check_loops(reader)
+    if reader.devices is not None:
+        issues += _check_devices(reader, placeholders)
+    issues = [df for df in issues if len(df)]
+    if not issues:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(issues, ignore_index=True)[ISSUE_COLUMNS]
@@ -0,0 +1,326 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .exports import EXPORTERS
+from .ffpreader import FFPReader
+
+logger = logging.getLogger(__name__)
+
+
+def _list_files(directory, suffix):
+    """return {path: (mtime_ns, size)} for the files in directory ending with suffix (case insensitive)"""
+    snapshot = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(suffix):
+                stat = entry.stat()
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class _PollingSource:
+    """Detects changed files by comparing (mtime, size) snapshots of a directory every `interval` seconds"""
+
+    def __init__(self, directory, suffix, interval):
+        self.directory = directory
+        self.suffix = suffix
+        self.interval = interval
+        self._snapshot = _list_files(directory, suffix)
+
+    def wait(self, timeout):
+        """block for up to timeout seconds and return the set of paths created, modified or deleted"""
+        time.sleep(min(timeout, self.interval))
+        snapshot = _list_files(self.directory, self.suffix)
+        changed = {
+            path
+            for path, signature in snapshot.items()
+            if self._snapshot.get(path) != signature
+        }
+        changed.update(set(self._snapshot) - set(snapshot))
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class _InotifySource:
+    """Detects changed files with Linux inotify, read through libc so no extra dependency is needed"""
+
+    _IN_MODIFY = 0x00000002
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_FROM = 0x00000040
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    # the kernel's event queue overflowed and events were lost, sent with wd -1 and no name
+    _IN_Q_OVERFLOW = 0x00004000
+    # struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, directory, suffix):
+        self.directory = directory
+        self.suffix = suffix
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = (
+            self._IN_MODIFY
+            | self._IN_CLOSE_WRITE
+            | self._IN_MOVED_FROM
+            | self._IN_MOVED_TO
+            | self._IN_CREATE
+            | self._IN_DELETE
+        )
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"inotify_add_watch failed for '{directory}'")
+        # every file seen, so a rescan after an overflow also reports the files deleted meanwhile
+        self._paths = set(_list_files(directory, suffix))
+
+    def wait(self, timeout):
+        """block for up to timeout seconds and return the set of paths created, modified or deleted"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        overflowed = False
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_length = self._EVENT_HEADER.unpack_from(data, offset)
+            offset += self._EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + name_length].rstrip(b"\0"))
+            offset += name_length
+            if mask & self._IN_Q_OVERFLOW:
+                overflowed = True
+            elif name.lower().endswith(self.suffix):
+                changed.add(os.path.join(self.directory, name))
+        if overflowed:
+            # the changes are unknown, report every file in the directory and every file deleted from it
+            logger.warning(f"inotify queue overflowed, rescanning '{self.directory}'.")
+            paths = set(_list_files(self.directory, self.suffix))
+            changed |= paths | self._paths
+            self._paths = paths
+        else:
+            self._paths |= changed
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class FFPWatcher:
+    """
+    Long-running service that watches a directory of .ffp files and keeps their parsed
+    configurations and exports up to date.
+
+    - Changes are detected with inotify on Linux, or by polling the directory elsewhere.
+    - Bursts of writes to a file are debounced, a file is processed once it has been quiet for `debounce` seconds.
+    - Files are processed on a thread pool so several panels changing at once don't wait on each other,
+      a file is never processed by two workers at the same time.
+    - Each file's FFPReader is kept in memory and updated with FFPReader.refresh, then the
+      requested exports (see exports.EXPORTERS) are regenerated in output_dir.
+    - Per-file metrics are kept in self.metrics, eg
+        {'events': 3, 'runs': 1, 'errors': 0, 'last_latency': 2.61, 'max_latency': 2.61,
+         'mean_latency': 2.61, 'last_parse_seconds': 0.12, 'last_export_seconds': 0.48}
+      where latency is the time from the first change event of a burst to its exports being written.
+
+    Example:
+        watcher = FFPWatcher("./data/input", "./data/output")
+        watcher.run()  # blocks until watcher.stop() is called from another thread
+    """
+
+    _SUFFIX = ".ffp"
+
+    def __init__(
+        self,
+        watch_dir,
+        output_dir,
+        formats=("csv", "xlsx", "modbus"),
+        debounce=2.0,
+        workers=4,
+        poll_interval=1.0,
+        use_inotify=None,
+    ):
+        """
+        Args:
+            watch_dir (str): Directory containing the .ffp files.
+            output_dir (str): Directory the exports are written to.
+            formats (tuple[str], optional): Names of the exports to regenerate, keys of exports.EXPORTERS.
+            debounce (float, optional): Seconds a file must be unchanged before it is processed.
+            workers (int, optional): Number of files processed concurrently.
+            poll_interval (float, optional): Seconds between directory scans when polling.
+            use_inotify (bool, optional): Force (True) or disable (False) inotify. Defaults to
+                inotify on Linux, falling back to polling if it is unavailable.
+        """
+        unknown = set(formats) - set(EXPORTERS)
+        if unknown:
+            raise ValueError(
+                f"Unknown export formats {sorted(unknown)}, expected some of {list(EXPORTERS)}."
+            )
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+        self.debounce = debounce
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        # FFPReader per path, kept hot between changes
+        self.readers = {}
+        self.metrics = {}
+        # path -> (first event, last event) monotonic times of changes waiting to be processed
+        self._pending = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _open_source(self):
+        use_inotify = self.use_inotify
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith("linux")
+        if use_inotify:
+            try:
+                return _InotifySource(self.watch_dir, self._SUFFIX)
+            except (OSError, AttributeError) as error:
+                if self.use_inotify:
+                    raise
+                logger.warning(
+                    f"inotify unavailable ({error}), polling '{self.watch_dir}'."
+                )
+        return _PollingSource(self.watch_dir, self._SUFFIX, self.poll_interval)
+
+    def run(self):
+        """Process every existing file, then watch for changes until stop() is called."""
+        self._stop.clear()
+        source = self._open_source()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                # existing files are due immediately
+                now = time.monotonic()
+                for path in _list_files(self.watch_dir, self._SUFFIX):
+                    self._pending[path] = (now, now - self.debounce)
+                while not self._stop.is_set():
+                    self._dispatch_due(pool)
+                    for path in source.wait(self._next_timeout()):
+                        self._record_event(path)
+        finally:
+            source.close()
+
+    def stop(self):
+        """Stop watching, files already being processed are finished first."""
+        self._stop.set()
+
+    def _record_event(self, path):
+        now = time.monotonic()
+        first_event = self._pending.get(path, (now, now))[0]
+        self._pending[path] = (first_event, now)
+        with self._lock:
+            self._metrics_for(path)["events"] += 1
+
+    def _next_timeout(self):
+        """seconds until the next pending file is due, at most 1 second"""
+        now = time.monotonic()
+        timeout = 1.0
+        for _, last_event in self._pending.values():
+            timeout = min(timeout, last_event + self.debounce - now)
+        return max(timeout, 0.05)
+
+    def _dispatch_due(self, pool):
+        """submit pending files that have been quiet for the debounce period and are not already running"""
+        now = time.monotonic()
+        for path, (first_event, last_event) in list(self._pending.items()):
+            if now - last_event < self.debounce:
+                continue
+            with self._lock:
+                if path in self._running:
+                    continue
+                self._running.add(path)
+            del self._pending[path]
+            pool.submit(self._process, path, first_event)
+
+    def _process(self, path, first_event):
+        """parse (or refresh) a file and regenerate its exports, runs on a worker thread"""
+        started = time.monotonic()
+        try:
+            if not os.path.exists(path):
+                # deleted, stop keeping it hot
+                self.readers.pop(path, None)
+                return
+            reader = self.readers.get(path)
+            if reader is None:
+                reader = FFPReader(path)
+                self.readers[path] = reader
+            else:
+                reader.refresh()
+            parsed = time.monotonic()
+            basename = os.path.basename(path)
+            for export_format in self.formats:
+                EXPORTERS[export_format](reader, self.output_dir, basename)
+            finished = time.monotonic()
+            self._record_run(path, first_event, started, parsed, finished)
+            logger.info(
+                f"Updated exports for '{path}' in {finished - first_event:.2f}s."
+            )
+        except Exception as error:
+            # eg the file was read mid-write, it will be retried on its next change
+            self.readers.pop(path, None)
+            with self._lock:
+                self._metrics_for(path)["errors"] += 1
+            logger.warning(f"Failed to process '{path}': {error}")
+        finally:
+            with self._lock:
+                self._running.discard(path)
+
+    def _metrics_for(self, path):
+        """return the metrics dict for a path, creating it if needed, call with self._lock held"""
+        return self.metrics.setdefault(
+            path,
+            {
+                "events": 0,
+                "runs": 0,
+                "errors": 0,
+                "last_latency": None,
+                "max_latency": None,
+                "mean_latency": None,
+                "last_parse_seconds": None,
+                "last_export_seconds": None,
+            },
+        )
+
+    def _record_run(self, path, first_event, started, parsed, finished):
+        latency = finished - first_event
+        with self._lock:
+            metrics = self._metrics_for(path)
+            metrics["runs"] += 1
+            metrics["last_latency"] = latency
+            metrics["max_latency"] = max(metrics["max_latency"] or 0.0, latency)
+            previous_total = (metrics["mean_latency"] or 0.0) * (metrics["runs"] - 1)
+            metrics["mean_latency"] = (previous_total + latency) / metrics["runs"]
+            metrics["last_parse_seconds"] = parsed - started
+            metrics["last_export_seconds"] = finished - parsed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    input_dir = "./data/input"
+    output_dir = "./data/output"
+
+    watcher = FFPWatcher(input_dir, output_dir)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    print(watcher.metrics)
@@ -0,0 +1,180 @@
+"""
+Write the tables of an FFPReader, after editing them, back to a .ffp file for Config Manager PLUS.
+
+Only the lines whose values changed are regenerated. Every other byte, including the fields the tables
+don't keep (eg the zone flags) and unchanged lines and sections, is copied verbatim from the
+original file, so the output differs from it only in the edited lines.
+
+    reader = FFPReader("site.ffp")
+    reader.devices["description"] = reader.devices["description"].str.replace("MGF", "MEZZ")
+    write_ffp(reader, "site (renamed).ffp")
+
+Rows are matched to the lines of the file by the index of each table, which is the row position
+assigned by the parser, so rows can be edited and reordered but not added or removed. The columns
+written are the field columns of each table (see _FIELDS and the numbered raw columns of devices).
+The derived columns, eg device, loop, node, id and raw, are not written.
+"""
+import os
+import time
+from .utils import map_file, find_section_spans, section_header
+
+# field position in a section line of each named table column written back, devices also write
+# their numbered raw columns (4, 5, ...) to the field of the same number
+_FIELDS = {
+    "zones": {"description": 1},
+    "nodes": {"description": 0},
+    "loops": {"loop": 0, "description": 1},
+    "devices": {"zone": 0, "description": 1, "subtype": 2, "type": 3},
+}
+# characters that would change the structure of the file if written in a field
+_RESERVED_CHARACTERS = "\t\r\n[]"
+
+
+def _section_table(header, reader):
+    """name of the table parsed from a section with this header, or None"""
+    if header.startswith(reader._ZONE_SECTION_FLAG):
+        return "zones"
+    if header.startswith(reader._NODE_SECTION_FLAG):
+        return "nodes"
+    if header.startswith(reader._LOOP_OR_LOOP_DEVICE_SECTION_FLAG):
+        if header.endswith(reader._LOOP_INFO_SECTION_SUFFIX):
+            return "loops"
+        if header.endswith(reader._DEVICE_SECTION_SUFFIX):
+            return "devices"
+    return None
+
+
+def _field_values(df, table):
+    """{field position: list of values by row position} of the columns of a table written back"""
+    import pandas as pd
+
+    fields = {position: column for column, position in _FIELDS[table].items() if column in df.columns}
+    if table == "devices":
+        fields.update({column: column for column in df.columns if isinstance(column, int)})
+    if not df.index.sort_values().equals(pd.RangeIndex(len(df))):
+        raise ValueError(
+            f"The {table} rows can't be matched to the file, rows were added or removed or the index was reset."
+        )
+    df = df.sort_index()
+    return {position: df[column].tolist() for position, column in fields.items()}
+
+
+def _format(value):
+    """
+    the text of a field value, None and NaN are written as an empty field and integral floats (eg the
+    zone of a column holding NaN) as integers, so 179.0 is written as 179
+    """
+    if value is None or value != value:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _splice_lines(lines, rows, start, values, encoding, table):
+    """
+    Rewrite, in place, those of the first rows lines after the header of a section's lines (bytes)
+    whose fields differ from values, which holds the values of the rows of the section by field
+    position from row position start. Returns the number of lines rewritten.
+    """
+    rewritten = 0
+    for row, line in enumerate(lines[1 : rows + 1]):
+        ending = b"\r" if line.endswith(b"\r") else b""
+        text = line[: len(line) - len(ending)].decode(encoding, errors="replace")
+        fields = text.split("\t")
+        new_fields = list(fields)
+        for position, column_values in values.items():
+            value = _format(column_values[start + row])
+            if position >= len(fields):
+                # past the end of this line, only the empty padding of a shorter row can't be written
+                if value:
+                    raise ValueError(
+                        f"The {table} value {value!r} (row {start + row}) is in field {position} "
+                        f"but the line has {len(fields)} fields."
+                    )
+                continue
+            new_fields[position] = value
+        if new_fields == fields:
+            continue
+        new_text = "\t".join(new_fields)
+        for field in new_fields:
+            if any(character in field for character in _RESERVED_CHARACTERS):
+                raise ValueError(
+                    f"The {table} value {field!r} (row {start + row}) contains a tab, newline or bracket."
+                )
+        try:
+            lines[row + 1] = new_text.encode(encoding) + ending
+        except UnicodeEncodeError:
+            raise ValueError(
+                f"The {table} value in row {start + row} can't be written in the file's encoding '{encoding}': {new_text!r}"
+            ) from None
+        rewritten += 1
+    return rewritten
+
+
+def write_ffp(reader, path):
+    """
+    Write the zones, nodes, loops and devices of a reader to a .ffp file, splicing the changed lines
+    into the bytes of the file the reader parsed (reader.ffp_filepath), see the module docstring.
+    The file is written to a temporary file that then replaces path, so path may be the original file.
+
+    Returns:
+        dict: eg {'sections': 1432, 'sections_rewritten': 3, 'lines_rewritten': 17, 'seconds': 0.04}
+    """
+    started = time.perf_counter()
+    # an edit may add the first non-ASCII character to a file detected as ASCII, it is written in the
+    # encoding of the Windows exports, of which ASCII is a subset
+    encoding = "cp1252" if reader.encoding == "ascii" else reader.encoding
+    values = {
+        table: _field_values(getattr(reader, table), table)
+        for table in reader.TABLES
+        if getattr(reader, table) is not None
+    }
+    # row position of the first row of the next section of each table
+    positions = {table: 0 for table in values}
+    chunks = []
+    sections_rewritten = 0
+    lines_rewritten = 0
+    with map_file(reader.ffp_filepath) as buffer:
+        spans = find_section_spans(buffer)
+        copied_to = 0
+        for span in spans:
+            header = section_header(buffer, span, reader.encoding)
+            table = _section_table(header, reader)
+            if table not in values:
+                continue
+            start, end = span
+            lines = buffer[start:end].split(b"\n")
+            # nodes and loops are one row per section, zones and devices one row per line
+            rows = 1 if table in ("nodes", "loops") else len(lines) - 1
+            rewritten = _splice_lines(
+                lines, rows, positions[table], values[table], encoding, table
+            )
+            positions[table] += rows
+            if not rewritten:
+                continue
+            chunks.append(buffer[copied_to:start])
+            chunks.append(b"\n".join(lines))
+            copied_to = end
+            sections_rewritten += 1
+            lines_rewritten += rewritten
+        chunks.append(buffer[copied_to:])
+        for table, position in positions.items():
+            expected = len(next(iter(values[table].values()), []))
+            if values[table] and position != expected:
+                raise ValueError(
+                    f"The {table} table has {expected} rows but the file has {position}, "
+                    "it was parsed from a different file."
+                )
+
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    os.replace(temporary_path, path)
+    return {
+        "sections": len(spans),
+        "sections_rewritten": sections_rewritten,
+        "lines_rewritten": lines_rewritten,
+        "seconds": time.perf_counter() - started,
+    }